@@ -1,121 +1,880 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import boto3
+import base64
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 import time
-import traceback
+from botocore.exceptions import ClientError
 
 # Import your check modules
-from core import discovery, compliance, war_mapper, advanced_checks
+from core import war_mapper, client_pool, registry, instrumentation
+from core.orchestrator import run_task_graph
+from core.result_store import FINDING_SORT_KEYS, create_result_store
+from core.incremental import IncrementalScan
+from core.findings import count_findings
+from core.streaming import parse_event_id, stream_job_events, stream_stored_scan
+from core.jobs import ScanJobManager, JobQueueFull, DEFAULT_JOB_WORKERS, DEFAULT_JOB_QUEUE_SIZE
+from core.fleet import FleetScanner, DEFAULT_FLEET_MAX_WORKERS, DEFAULT_ACCOUNT_TIMEOUT_SEC
+from core.regions import (
+    DEFAULT_REGION_CONCURRENCY, list_enabled_regions, regional_session, run_per_region, merge_regional_results
+)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# In-memory cache to store scan results
-scan_cache = {}
+# Scan results are persisted in the result store (RESULT_STORE, SQLite by default), so they
+# survive restarts and are shared between workers. Stored check results are served for
+# their TTL (registry.CHECK_TTLS, CACHE_TTL by default).
+result_store = create_result_store(os.environ.get('RESULT_STORE'))
 CACHE_TTL = 3600  # 1 hour
+# Once a stored scan expires it is still served, while a single background scan refreshes
+# its expired checks, until it has been expired for CACHE_MAX_STALE. Past that, requests
+# wait for the refresh.
+CACHE_MAX_STALE = int(os.environ.get('CACHE_MAX_STALE', 24 * 3600))
+# Decoded copy of the latest stored scan per scope, reused while it is still the newest
+scan_cache = {}
+
+# Upper bound on discovery calls and checks running at the same time during a scan
+SCAN_MAX_WORKERS = int(os.environ.get('SCAN_MAX_WORKERS', 8))
+# Upper bound on regions scanned at the same time in multi-region mode (?regions=)
+REGION_MAX_CONCURRENCY = int(os.environ.get('REGION_MAX_CONCURRENCY', DEFAULT_REGION_CONCURRENCY))
+# Multi-account scans: accounts scanned at the same time, and the default per-account timeout
+FLEET_MAX_WORKERS = int(os.environ.get('FLEET_MAX_WORKERS', DEFAULT_FLEET_MAX_WORKERS))
+FLEET_ACCOUNT_TIMEOUT_SEC = int(os.environ.get('FLEET_ACCOUNT_TIMEOUT_SEC', DEFAULT_ACCOUNT_TIMEOUT_SEC))
+# Findings per page of /api/checks/<check_name>/findings, by default and at most
+FINDINGS_PAGE_SIZE = 100
+FINDINGS_PAGE_MAX = 1000
+# Background scan jobs: scans running at once, and how many more may wait in the queue
+SCAN_JOB_WORKERS = int(os.environ.get('SCAN_JOB_WORKERS', DEFAULT_JOB_WORKERS))
+SCAN_JOB_QUEUE_SIZE = int(os.environ.get('SCAN_JOB_QUEUE_SIZE', DEFAULT_JOB_QUEUE_SIZE))
 
 def get_aws_session():
-    """Creates and returns a Boto3 session."""
-    return boto3.Session()
+    """Returns a session that hands out clients from the shared client pool."""
+    return client_pool.get_session()
 
-def run_pillar_checks(check_function, *args):
-    """Safely runs a check function and handles exceptions."""
+def get_account_id(session):
+    """Returns the AWS account ID of a session's credentials, or None if it cannot be determined."""
     try:
-        return check_function(*args)
-    except Exception as e:
-        print(f"Error running check {check_function.__name__}: {e}")
-        print(traceback.format_exc())
-        return {"error": f"Failed to run check: {check_function.__name__}", "details": str(e)}
+        return session.client('sts').get_caller_identity()['Account']
+    except ClientError as e:
+        print(f"Could not get AWS Account ID: {e}")
+        return None
+
+def build_global_tasks(session, incremental=None, checks=None):
+    """
+    Declares the discovery calls and checks for global services (IAM, the S3 bucket
+    list, CloudTrail, Compute Optimizer enrollment). These run once per scan.
+
+    With an IncrementalScan, the per-resource IAM and S3 checks only re-evaluate users
+    and buckets that are new or changed since the last scan.
+    The S3 checks share one BucketConfigSnapshot, so each bucket's configuration is
+    read once per scan.
+    """
+    return registry.build_tasks(session, registry.GLOBAL, checks, incremental)
+
+def build_regional_tasks(session, checks=None, incremental=None):
+    """
+    Declares the discovery calls and checks for regional services, scoped to the
+    region of the given session.
+
+    Each check lists the discovery results it consumes, so the orchestrator
+    can run independent calls concurrently. Checks that are the only ones to
+    loop over a listing are handed a discovery generator instead, so they process
+    pages as they arrive rather than waiting for (and holding) the full list.
+
+    With an IncrementalScan, the backup check only re-evaluates volumes and the drift
+    check only re-detects drift on stacks that are new or changed since the last scan
+    of the region.
+    """
+    return registry.build_tasks(session, registry.REGIONAL, checks, incremental)
+
+# Which check results are reported under each pillar of the response (see core/registry.py).
+PILLAR_CHECKS = registry.pillar_checks()
+
+def api_call_delta(before, after):
+    """Returns the per-service call counters accumulated between two client_pool.call_stats() readings."""
+    delta = {}
+    for service, counts in after.items():
+        previous = before.get(service, {})
+        service_delta = {field: value - previous.get(field, 0) for field, value in counts.items()}
+        if any(service_delta.values()):
+            delta[service] = service_delta
+    return delta
+
+def run_scan(session, regions=None, region_concurrency=None, deadline=None, progress=None, full=False, checks=None):
+    """
+    Runs the full scan and assembles the API response.
+
+    Args:
+        session: The session to scan with.
+        regions: Optional list of regions to fan out to. Regional checks run once per
+            region and their findings are tagged with a 'Region' key; global checks
+            still run exactly once. Without it only the session's region is scanned.
+        region_concurrency: How many regions are scanned at once (capped by REGION_MAX_CONCURRENCY).
+        deadline: Optional time.time() value after which no further checks are started.
+        progress: Optional ScanProgress that is told about planned and finished tasks.
+        full: Re-evaluate every resource instead of reusing the stored per-resource
+            findings of unchanged IAM users, S3 buckets, EBS volumes and stacks.
+        checks: Optional list of registered checks to run (see registry.select_checks).
+            Only the discovery they need is performed, and only they are reported.
+    """
+    def task_callback(region=None):
+        # Counts finished tasks and streams each check's result to the job's event log.
+        if not progress:
+            return None
+        def on_task_done(name, timing, result):
+            progress.task_done(name, timing)
+            check = registry.CHECKS.get(name)
+            if check is not None:
+                progress.events.publish_check(check.pillar, name, result,
+                                              region if check.scope == registry.REGIONAL else None)
+        return on_task_done
+
+    start_time = time.time()
+    role_arn = getattr(session, 'role_arn', None)
+    calls_before = client_pool.call_stats(role_arn)
+    profile = instrumentation.ScanProfile(trace=bool(instrumentation.SCAN_TRACE_DIR))
+    with profile.task(instrumentation.UNATTRIBUTED):
+        account_id = get_account_id(session)
+    scan_metadata = {
+        "status": "Healthy",
+        "throttled_requests": 0,
+        "account_id": account_id,
+        "region": ",".join(regions) if regions else session.region_name,
+        "started_at": start_time
+    }
+    incremental = IncrementalScan(result_store, scan_metadata["account_id"], force_full=full)
+
+    if not regions:
+        tasks = build_global_tasks(session, incremental, checks) + build_regional_tasks(session, checks, incremental)
+        if progress:
+            progress.plan(len(tasks))
+        results, timings = run_task_graph(
+            tasks, max_workers=SCAN_MAX_WORKERS, deadline=deadline, on_task_done=task_callback(), profile=profile
+        )
+    else:
+        concurrency = min(region_concurrency or REGION_MAX_CONCURRENCY, REGION_MAX_CONCURRENCY)
+        global_tasks = build_global_tasks(session, incremental, checks)
+        regional_tasks = {region: build_regional_tasks(regional_session(session, region), checks, incremental)
+                          for region in regions}
+        if progress:
+            progress.plan(len(global_tasks) + sum(len(tasks) for tasks in regional_tasks.values()))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # Global services run once, alongside the regional fan-out.
+            global_scan = executor.submit(
+                run_task_graph, global_tasks,
+                max_workers=SCAN_MAX_WORKERS, deadline=deadline, on_task_done=task_callback(), profile=profile
+            )
+            regional_scans = run_per_region(
+                regions,
+                lambda region: run_task_graph(
+                    regional_tasks[region],
+                    max_workers=SCAN_MAX_WORKERS, deadline=deadline, on_task_done=task_callback(region),
+                    profile=profile
+                ),
+                max_concurrency=concurrency
+            )
+            results, timings = global_scan.result()
+
+        merged, region_errors = merge_regional_results(
+            {region: region_results for region, (region_results, _) in regional_scans.items()}
+        )
+        results.update(merged)
+        scan_metadata["regions"] = {
+            region: {"task_timings": region_timings}
+            for region, (_, region_timings) in regional_scans.items()
+        }
+        scan_metadata["region_errors"] = region_errors
+
+    finished_at = time.time()
+    scan_duration = round(finished_at - start_time, 2)
+    print(f"Scan completed in {scan_duration} seconds.")
+    scan_metadata["finished_at"] = finished_at
+    scan_metadata["last_scan_duration_sec"] = scan_duration
+    scan_metadata["task_timings"] = timings
+    # Counted per account, so scans of the same account running at the same time share them.
+    api_calls = api_call_delta(calls_before, client_pool.call_stats(role_arn))
+    scan_metadata["api_calls"] = api_calls
+    scan_metadata["throttled_requests"] = sum(counts["throttles"] for counts in api_calls.values())
+    # Latency histograms of the scan's own AWS calls, per check and per operation.
+    scan_metadata["api_profile"] = profile.as_dict()
+    trace_file = instrumentation.trace_path(account_id, start_time)
+    if trace_file:
+        try:
+            profile.write_trace(trace_file)
+            scan_metadata["trace_file"] = trace_file
+        except OSError as e:
+            print(f"Could not write the scan trace to {trace_file}: {e}")
+    scan_metadata["incremental"] = incremental.metadata()
+    incremental.save()
+
+    if checks is not None:
+        scan_metadata["checks"] = [check.name for check in checks]
+    # When each check's result was produced; a refresh (see run_scan_job) only re-runs expired checks.
+    scan_metadata["check_refreshed_at"] = {
+        name: finished_at for names in registry.pillar_checks(checks).values() for name in names
+    }
+
+    response_data = {"scan_metadata": scan_metadata}
+    for pillar, check_names in registry.pillar_checks(checks).items():
+        response_data[pillar] = {name: results[name] for name in check_names}
+    return response_data
+
+def scan_scope(regions_param=None, check_names=None):
+    """Returns the result store scope (and job coalescing key) for a ?regions= value and check selection."""
+    scope = f"all_findings:{regions_param}" if regions_param else 'all_findings'
+    return f"{scope}|checks={','.join(check_names)}" if check_names else scope
+
+def parse_check_selection(checks_param=None, pillars_param=None):
+    """
+    Turns the ?checks= and ?pillars= parameters (comma-separated names, or lists from a
+    JSON body) into the sorted names of the selected checks, or None for every check.
+
+    Raises:
+        ValueError: If a check or pillar name is unknown.
+    """
+    def names(value):
+        if isinstance(value, str):
+            value = value.split(',')
+        return [name.strip() for name in value or [] if name.strip()]
+
+    selected = registry.select_checks(names(checks_param), names(pillars_param))
+    if len(selected) == len(registry.CHECKS):
+        return None
+    return sorted(check.name for check in selected)
+
+def save_scan(scope, response_data):
+    """Persists a finished scan to the result store and returns its scan ID."""
+    metadata = response_data["scan_metadata"]
+    scan_id = result_store.save_scan(
+        response_data, scope,
+        account_id=metadata.get("account_id"),
+        region=metadata.get("region"),
+        started_at=metadata.get("started_at"),
+        finished_at=metadata.get("finished_at")
+    )
+    scan_cache.pop(scope, None)
+    return scan_id
+
+def load_latest_scan(scope):
+    """
+    Returns the latest stored scan for a scope, or None. The decoded scan is kept in
+    scan_cache and reused until another scan (possibly from another worker) replaces it.
+    """
+    newest = result_store.list_scans(scope=scope, limit=1)
+    if not newest:
+        return None
+    cached = scan_cache.get(scope)
+    if cached is None or cached['scan_id'] != newest[0]['scan_id']:
+        cached = result_store.get_scan(newest[0]['scan_id'])
+        scan_cache[scope] = cached
+    return cached
+
+def check_expiry(stored):
+    """
+    Returns {check name: time its stored result expires} for a stored scan. A result
+    expires its check's TTL (see registry.CHECK_TTLS) after it was produced; error
+    results and checks without their own TTL use CACHE_TTL.
+    """
+    data = stored['data']
+    refreshed_at = data['scan_metadata'].get('check_refreshed_at', {})
+    expiry = {}
+    for pillar in registry.PILLARS:
+        for name, result in data.get(pillar, {}).items():
+            check = registry.CHECKS.get(name)
+            failed = isinstance(result, dict) and 'error' in result
+            ttl = check.ttl if check is not None and check.ttl and not failed else CACHE_TTL
+            expiry[name] = refreshed_at.get(name, stored['finished_at']) + ttl
+    return expiry
+
+def scan_expires_at(stored):
+    """Returns when a stored scan stops being fresh: when its first check result expires."""
+    return min(check_expiry(stored).values(), default=stored['finished_at'] + CACHE_TTL)
+
+def merge_refresh(previous, refreshed, check_names=None):
+    """
+    Combines a stored scan with a scan of only its expired checks: the refreshed checks'
+    results replace the stored ones and the other results are carried over, keeping the
+    time they were produced.
+
+    Args:
+        previous: The data of the stored scan.
+        refreshed: The response of run_scan for the expired checks.
+        check_names: The check selection of the scope (None for every check).
+    """
+    metadata = refreshed['scan_metadata']
+    metadata['refreshed_checks'] = metadata.pop('checks', [])
+    if check_names is not None:
+        metadata['checks'] = list(check_names)
+    metadata['check_refreshed_at'] = {
+        **previous['scan_metadata'].get('check_refreshed_at', {}),
+        **metadata['check_refreshed_at'],
+    }
+    merged = {'scan_metadata': metadata}
+    selected = registry.select_checks(check_names) if check_names else None
+    for pillar, names in registry.pillar_checks(selected).items():
+        results = {}
+        for name in names:
+            if name in refreshed.get(pillar, {}):
+                results[name] = refreshed[pillar][name]
+            elif name in previous.get(pillar, {}):
+                results[name] = previous[pillar][name]
+        merged[pillar] = results
+    return merged
+
+def scan_response(stored, cache_status):
+    """
+    Returns the response for a stored scan, with its ID as the ETag and its finish time as
+    Last-Modified. A conditional GET (If-None-Match / If-Modified-Since) for the same scan
+    gets a 304, and a matching ETag skips serializing the findings altogether.
+
+    Args:
+        stored: A stored scan from the result store.
+        cache_status: 'fresh', 'stale' or 'miss', reported in the X-Cache header.
+    """
+    etag = f"scan-{stored['scan_id']}"
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(stored['data'])
+    response.set_etag(etag)
+    response.last_modified = stored['finished_at']
+    # Clients keep the body but revalidate every time, so a refreshed scan shows up at once.
+    response.cache_control.no_cache = True
+    response.headers['X-Cache'] = cache_status
+    return response.make_conditional(request) if response.status_code == 200 else response
+
+def scan_summary(data):
+    """Returns the summary event of a streamed scan: its metadata and the finding count of every check."""
+    return {
+        "scan_metadata": data["scan_metadata"],
+        "finding_counts": {
+            pillar: {name: count_findings(name, result) for name, result in data[pillar].items()}
+            for pillar in registry.PILLARS if pillar in data
+        },
+    }
+
+def resolve_scan_regions(session, regions_param):
+    """
+    Turns the ?regions= query parameter into a list of regions: 'all' means every
+    enabled region, otherwise a comma-separated list. None means single-region mode.
+    """
+    if not regions_param:
+        return None
+    if regions_param == 'all':
+        return list_enabled_regions(session)
+    return sorted({r.strip() for r in regions_param.split(',') if r.strip()})
 
 @app.route('/api/scan/all', methods=['GET'])
 def get_all_findings():
     """
     Main endpoint to trigger a comprehensive scan of the AWS account.
     It combines findings from all pillars with enhanced error handling.
+
+    Query parameters:
+        regions: 'all' for every enabled region, or a comma-separated list of regions.
+        region_concurrency: How many regions to scan at once.
+        full: 'true' to skip the stored scan and re-evaluate every resource.
+        checks: Comma-separated check names to run (see /api/checks); only the discovery
+            they need is performed. Partial scans are stored separately.
+        pillars: Comma-separated pillars whose checks to run, e.g. 'security'.
     """
-    cache_key = 'all_findings'
+    regions_param = request.args.get('regions')
+    full = request.args.get('full', 'false').lower() == 'true'
+    try:
+        check_names = parse_check_selection(request.args.get('checks'), request.args.get('pillars'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    cache_key = scan_scope(regions_param, check_names)
     current_time = time.time()
 
-    if cache_key in scan_cache and (current_time - scan_cache[cache_key]['timestamp']) < CACHE_TTL:
-        print("Returning cached data for /api/scan/all")
-        return jsonify(scan_cache[cache_key]['data'])
+    job_options = dict(
+        regions=regions_param,
+        region_concurrency=request.args.get('region_concurrency', type=int),
+        full=full,
+        checks=check_names,
+        refresh=not full
+    )
+
+    latest = None if full else load_latest_scan(cache_key)
+    if latest:
+        expires_at = scan_expires_at(latest)
+        if current_time < expires_at:
+            print("Returning stored scan for /api/scan/all")
+            return scan_response(latest, 'fresh')
+        if current_time - expires_at < CACHE_MAX_STALE:
+            # Stale-while-revalidate: concurrent requests coalesce on one refresh job.
+            try:
+                scan_jobs.submit(cache_key, **job_options)
+            except JobQueueFull as e:
+                print(f"Could not queue a refresh of {cache_key}: {e}")
+            print("Returning stale stored scan for /api/scan/all while it is refreshed")
+            return scan_response(latest, 'stale')
 
     print("No valid cache found, performing a new scan...")
-    start_time = time.time()
-    
+
     try:
-        session = get_aws_session()
-        
-        # --- Basic Discovery (Run these first as they are dependencies) ---
-        iam_users = discovery.list_iam_users()
-        s3_buckets = discovery.list_s3_buckets()
-        ec2_instances = discovery.list_ec2_instances()
-        rds_instances = discovery.list_rds_instances()
-        vpcs = discovery.list_vpcs()
-        cloudtrails = discovery.list_cloudtrails()
-        security_groups = discovery.list_security_groups()
-        ebs_volumes = discovery.list_ebs_volumes()
-        cfn_stacks = discovery.list_cloudformation_stacks()
-
-        # --- Compliance and Pillar-Specific Checks (with individual error handling) ---
-        security_findings = {
-            "users_without_mfa": run_pillar_checks(compliance.check_mfa, iam_users),
-            "public_s3_buckets": run_pillar_checks(compliance.check_public_s3_buckets, s3_buckets, session),
-            "aged_iam_keys": run_pillar_checks(compliance.check_iam_key_age, iam_users, session),
-            "unrestricted_security_groups": run_pillar_checks(compliance.check_unrestricted_security_groups, security_groups),
-            "vpcs_without_flow_logs": run_pillar_checks(compliance.check_vpc_flow_logs, vpcs, session),
-            "cloudtrail_status": run_pillar_checks(compliance.check_cloudtrail_status, cloudtrails)
-        }
+        # Concurrent requests for the same scope wait on one shared scan job.
+        job, _ = scan_jobs.submit(cache_key, **job_options)
+        job = scan_jobs.wait(job['job_id'])
+        if job['status'] != 'complete':
+            return jsonify({"error": "Failed to complete the scan due to a critical error.",
+                            "details": job.get('error')}), 500
+        return scan_response(result_store.get_scan(job['scan_id']), 'miss')
 
-        cost_optimization_findings = {
-            "s3_buckets_without_lifecycle": run_pillar_checks(compliance.check_s3_lifecycle, s3_buckets, session),
-            "compute_optimizer_status": run_pillar_checks(compliance.check_compute_optimizer, session),
-            **run_pillar_checks(advanced_checks.run_all_advanced_checks, session).get('cost_optimization', {})
-        }
-        
-        reliability_findings = {
-            "rds_multi_az_status": run_pillar_checks(compliance.check_rds_multi_az, rds_instances),
-            "ebs_volumes_without_backup": run_pillar_checks(compliance.check_ebs_backups, ebs_volumes, session)
-        }
-        
-        performance_efficiency_findings = {
-             "ec2_without_detailed_monitoring": run_pillar_checks(compliance.check_ec2_detailed_monitoring, ec2_instances)
-        }
+    except JobQueueFull as e:
+        return jsonify({"error": "Too many scans are queued. Try again later.", "details": str(e)}), 429
 
-        operational_excellence_findings = {
-            "cloudformation_drift_status": run_pillar_checks(compliance.check_cloudformation_drift, cfn_stacks, session)
-        }
-        
-        end_time = time.time()
-        scan_duration = round(end_time - start_time, 2)
-        print(f"Scan completed in {scan_duration} seconds.")
-
-        # --- Assemble Final Response ---
-        response_data = {
-            "scan_metadata": {
-                "status": "Healthy",
-                "last_scan_duration_sec": scan_duration,
-                "throttled_requests": 0
-            },
-            "security": security_findings,
-            "cost_optimization": cost_optimization_findings,
-            "reliability": reliability_findings,
-            "performance_efficiency": performance_efficiency_findings,
-            "operational_excellence": operational_excellence_findings
-        }
-        
-        # Cache the new results
-        scan_cache[cache_key] = {
-            'timestamp': current_time,
-            'data': response_data
-        }
 
-        return jsonify(response_data)
+def sse_response(events):
+    """Returns a streamed text/event-stream response for a generator of Server-Sent Events."""
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Tells nginx not to buffer the stream.
+        'X-Accel-Buffering': 'no',
+    })
+
+@app.route('/api/scan/stream', methods=['GET'])
+def stream_scan():
+    """
+    Streams a scan as Server-Sent Events: a 'check' event with each check's result as soon
+    as the check finishes, then a 'summary' event with the scan metadata and finding counts
+    (or an 'error' event). Check events carry 'pillar', 'check', 'region' (for a regional
+    check in one region of a multi-region scan, otherwise null) and 'result'.
+
+    A fresh stored scan of the scope is streamed from the result store one check at a time.
+    Otherwise a scan job is started, or joined if one is already running for the scope, as
+    for /api/scan/all; still-fresh stored results are sent before the refreshed ones.
+
+    Clients resume with the Last-Event-ID header, which EventSource sends when it
+    reconnects (or ?last_event_id=). Events they already received are not sent again.
+
+    Query parameters:
+        regions, region_concurrency, full, checks, pillars: As for /api/scan/all.
+    """
+    regions_param = request.args.get('regions')
+    full = request.args.get('full', 'false').lower() == 'true'
+    try:
+        check_names = parse_check_selection(request.args.get('checks'), request.args.get('pillars'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    scope = scan_scope(regions_param, check_names)
+    load_results = result_store.iter_check_results
+
+    stream, position = parse_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    if stream and stream.startswith('job-'):
+        log = scan_jobs.events(stream[len('job-'):])
+        if log is not None:
+            return sse_response(stream_job_events(stream, log, position, load_results))
+    elif stream and stream.startswith('scan-') and stream[len('scan-'):].isdigit():
+        scan = result_store.get_scan_metadata(int(stream[len('scan-'):]))
+        if scan is not None:
+            return sse_response(stream_stored_scan(stream, scan, position, load_results))
+    # Unknown (or pruned) stream: start over.
+
+    latest = None if full else load_latest_scan(scope)
+    if latest and time.time() < scan_expires_at(latest):
+        scan = result_store.get_scan_metadata(latest['scan_id'])
+        return sse_response(stream_stored_scan(f"scan-{latest['scan_id']}", scan, 0, load_results))
+
+    try:
+        job, _ = scan_jobs.submit(
+            scope,
+            regions=regions_param,
+            region_concurrency=request.args.get('region_concurrency', type=int),
+            full=full,
+            checks=check_names,
+            refresh=not full
+        )
+    except JobQueueFull as e:
+        return jsonify({"error": "Too many scans are queued. Try again later.", "details": str(e)}), 429
+    log = scan_jobs.events(job['job_id'])
+    return sse_response(stream_job_events(f"job-{job['job_id']}", log, 0, load_results))
+
+
+def run_scan_job(scope, progress, regions=None, region_concurrency=None, full=False, checks=None, refresh=False):
+    """
+    Runs a scan in a job worker, stores it and returns its scan ID.
+
+    With refresh, only the checks whose stored result expired (see check_expiry) are run,
+    and the other results of the scope's latest stored scan are carried over.
+    """
+    selected = registry.select_checks(checks) if checks else None
+    previous = load_latest_scan(scope) if refresh else None
+    if previous:
+        expiry = check_expiry(previous)
+        now = time.time()
+        carried = [check for check in selected or registry.CHECKS.values()
+                   if expiry.get(check.name, now) > now and check.name in previous['data'].get(check.pillar, {})]
+        selected = [check for check in selected or registry.CHECKS.values() if check not in carried]
+        # Results that are still fresh are streamed before the refresh starts.
+        for check in carried:
+            progress.events.publish_check(check.pillar, check.name, previous['data'][check.pillar][check.name])
+        if not selected:
+            # Already refreshed by another worker.
+            progress.events.finish(previous['scan_id'], scan_summary(previous['data']))
+            return previous['scan_id']
+
+    session = get_aws_session()
+    response_data = run_scan(
+        session,
+        regions=resolve_scan_regions(session, regions),
+        region_concurrency=region_concurrency,
+        progress=progress,
+        full=full,
+        checks=selected
+    )
+    if previous:
+        response_data = merge_refresh(previous['data'], response_data, checks)
+    scan_id = save_scan(scope, response_data)
+    progress.events.finish(scan_id, scan_summary(response_data))
+    return scan_id
+
+def scan_job_params(body, args):
+    """
+    Reads the parameters of a scan job request from its JSON body, falling back to the
+    query string for any the body does not set. A body value given as a string is parsed
+    as the query parameter is ('true' for full, digits for region_concurrency, comma-separated
+    names for regions, checks and pillars); lists of names are also accepted.
+
+    Returns:
+        A dictionary with the regions, region_concurrency, full, checks and pillars values.
+
+    Raises:
+        ValueError: If the body is not a JSON object or one of its values has the wrong type.
+    """
+    body = {} if body is None else body
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object.")
+
+    def names(name):
+        value = body.get(name, args.get(name))
+        if value is None or isinstance(value, str):
+            return value
+        if isinstance(value, list) and all(isinstance(item, str) for item in value):
+            return ','.join(value)
+        raise ValueError(f"'{name}' must be a comma-separated string or a list of strings.")
+
+    if 'full' not in body:
+        full = args.get('full', 'false').lower() == 'true'
+    elif isinstance(body['full'], bool):
+        full = body['full']
+    elif isinstance(body['full'], str):
+        full = body['full'].lower() == 'true'
+    else:
+        raise ValueError("'full' must be a boolean.")
+
+    region_concurrency = body.get('region_concurrency', args.get('region_concurrency', type=int))
+    if isinstance(region_concurrency, str) and region_concurrency.strip().isdigit():
+        region_concurrency = int(region_concurrency)
+    if region_concurrency is not None and (isinstance(region_concurrency, bool)
+                                           or not isinstance(region_concurrency, int)):
+        raise ValueError("'region_concurrency' must be an integer.")
+
+    return {'regions': names('regions'), 'region_concurrency': region_concurrency, 'full': full,
+            'checks': names('checks'), 'pillars': names('pillars')}
+
+scan_jobs = ScanJobManager(run_scan_job, max_workers=SCAN_JOB_WORKERS, queue_size=SCAN_JOB_QUEUE_SIZE)
+
+@app.route('/api/scan/jobs', methods=['POST'])
+def start_scan_job():
+    """
+    Starts a scan in the background and returns its job immediately (202). If a scan of
+    the same scope and kind (full or not) is already queued or running, that job is
+    returned instead.
+
+    Query parameters (or JSON body, see scan_job_params):
+        regions, region_concurrency, full, checks, pillars: As for /api/scan/all.
+
+    Returns 400 if a check or pillar is unknown or a body value has the wrong type.
+    """
+    try:
+        params = scan_job_params(request.get_json(silent=True), request.args)
+        check_names = parse_check_selection(params['checks'], params['pillars'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    regions_param = params['regions']
+    scope = scan_scope(regions_param, check_names)
+    try:
+        job, created = scan_jobs.submit(scope, regions=regions_param, region_concurrency=params['region_concurrency'],
+                                        full=params['full'], checks=check_names)
+    except JobQueueFull as e:
+        return jsonify({"error": "Too many scans are queued. Try again later.", "details": str(e)}), 429
+    job['coalesced'] = not created
+    response = jsonify(job)
+    response.status_code = 202
+    response.headers['Location'] = f"/api/scan/jobs/{job['job_id']}"
+    return response
+
+@app.route('/api/scan/jobs/<job_id>', methods=['GET'])
+def get_scan_job(job_id):
+    """Returns the status and progress of a scan job."""
+    job = scan_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown scan job: {job_id}"}), 404
+    return jsonify(job)
+
+@app.route('/api/scan/jobs/<job_id>/result', methods=['GET'])
+def get_scan_job_result(job_id):
+    """Returns the findings of a finished scan job, or its status (202) while it is still running."""
+    job = scan_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown scan job: {job_id}"}), 404
+    if job['status'] == 'failed':
+        return jsonify({"error": "The scan failed.", "details": job.get('error')}), 500
+    if job['status'] != 'complete':
+        return jsonify(job), 202
+    return scan_response(result_store.get_scan(job['scan_id']), 'miss')
+
+
+def scan_fleet_account(session, deadline, regions=None):
+    """Scans one member account of a fleet scan."""
+    return run_scan(session, regions=resolve_scan_regions(session, regions), deadline=deadline)
+
+fleet_scanner = FleetScanner(
+    scan_fleet_account,
+    PILLAR_CHECKS,
+    result_store,
+    max_workers=FLEET_MAX_WORKERS,
+    timeout_sec=FLEET_ACCOUNT_TIMEOUT_SEC
+)
+
+@app.route('/api/fleet/scans', methods=['POST'])
+def start_fleet_scan():
+    """
+    Starts scanning a list of member accounts in the background by assuming a role in each.
+
+    JSON body:
+        role_arns: List of IAM role ARNs, one per account.
+        timeout_sec: Optional per-account timeout.
+        regions: Optional 'all' or comma-separated list of regions, as for /api/scan/all.
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        fleet = fleet_scanner.submit(body.get('role_arns'), body.get('timeout_sec'), regions=body.get('regions'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(fleet), 202
+
+@app.route('/api/fleet/scans/<fleet_id>', methods=['GET'])
+def get_fleet_scan(fleet_id):
+    """Returns the per-account status of a fleet scan."""
+    fleet = fleet_scanner.get_fleet(fleet_id)
+    if fleet is None:
+        return jsonify({"error": f"Unknown fleet scan: {fleet_id}"}), 404
+    return jsonify(fleet)
+
+@app.route('/api/fleet/accounts/<account_id>', methods=['GET'])
+def get_fleet_account(account_id):
+    """Returns the latest stored scan of a member account."""
+    record = fleet_scanner.get_account(account_id)
+    if record is None:
+        return jsonify({"error": f"No scan stored for account {account_id}"}), 404
+    return jsonify(record)
+
+@app.route('/api/fleet/summary', methods=['GET'])
+def get_fleet_summary():
+    """Returns fleet-wide finding counts from the stored account results, without rescanning."""
+    return jsonify(fleet_scanner.summary())
+
+
+@app.route('/api/scans', methods=['GET'])
+def list_stored_scans():
+    """Lists stored scans, newest first. Filters: ?account_id=, ?scope=, ?limit=."""
+    return jsonify(result_store.list_scans(
+        scope=request.args.get('scope'),
+        account_id=request.args.get('account_id'),
+        limit=request.args.get('limit', 20, type=int)
+    ))
+
+@app.route('/api/scans/<int:scan_id>', methods=['GET'])
+def get_stored_scan(scan_id):
+    """Returns a stored scan with all of its findings."""
+    scan = result_store.get_scan(scan_id)
+    if scan is None:
+        return jsonify({"error": f"Unknown scan: {scan_id}"}), 404
+    return jsonify(scan)
+
+@app.route('/api/scans/latest', methods=['GET'])
+def get_latest_scans():
+    """Returns the latest finding count of every check of every account, from the last scan that ran it (?scope= to filter)."""
+    return jsonify(result_store.latest_finding_counts(scope=request.args.get('scope')))
+
+@app.route('/api/checks', methods=['GET'])
+def list_checks():
+    """Lists the registered checks with their pillar, scope, datasets and API cost."""
+    return jsonify([check.describe() for check in registry.CHECKS.values()])
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Exposes the AWS API call latency, retry, error and byte counters since startup, in Prometheus text format."""
+    return Response(instrumentation.api_metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/checks/<check_name>/history', methods=['GET'])
+def get_check_history(check_name):
+    """Returns the finding count of one check across stored scans, newest first."""
+    return jsonify(result_store.check_history(
+        check_name,
+        scope=request.args.get('scope'),
+        account_id=request.args.get('account_id'),
+        limit=request.args.get('limit', 50, type=int)
+    ))
+
+def encode_cursor(sort, descending, position):
+    """Returns an opaque page cursor for the row position [sort value, scan_id, position] of a sort order."""
+    raw = json.dumps([sort, descending, *position]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, sort, descending):
+    """
+    Returns the row position encoded in a cursor from encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another sort order.
+    """
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(decoded, list) or len(decoded) != 5 or decoded[:2] != [sort, descending]:
+        raise ValueError("The cursor belongs to another sort order")
+    return decoded[2:]
+
+def comma_list(value):
+    """Splits a comma-separated query parameter into its non-empty values."""
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+@app.route('/api/checks/<check_name>/findings', methods=['GET'])
+def get_check_findings(check_name):
+    """
+    Returns one page of a check's findings from the latest stored scan that ran it, per account
+    (or of one scan), served from the per-finding index rather than the whole stored result.
+
+    Every finding is a dictionary with its 'AccountId' and 'Region' added (a finding that
+    is only a name, e.g. a bucket, becomes {'ResourceId': name}).
+
+    Query parameters:
+        scan_id: Read this stored scan instead of the latest ones.
+        scope: Only consider scans of this scope (e.g. 'all_findings').
+        account_id, region: Comma-separated accounts / regions to keep.
+        tag: 'Key=Value' (or just 'Key') the resource must be tagged with; repeatable.
+        min_age_days: Only resources created at least this many days ago.
+        sort: One of position (default, as reported), resource_id, region, created_at;
+            prefix with '-' for descending order.
+        fields: Comma-separated finding fields to return (all by default).
+        limit: Page size (default FINDINGS_PAGE_SIZE, at most FINDINGS_PAGE_MAX).
+        cursor: The 'next_cursor' of the previous page.
+    """
+    check = registry.CHECKS.get(check_name)
+    if check is None:
+        return jsonify({"error": f"Unknown check: {check_name}"}), 404
+
+    sort = request.args.get('sort', 'position')
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    if sort not in FINDING_SORT_KEYS:
+        return jsonify({"error": f"Unknown sort key: {sort}", "sort_keys": list(FINDING_SORT_KEYS)}), 400
+    try:
+        after = decode_cursor(request.args['cursor'], sort, descending) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    limit = max(1, min(request.args.get('limit', FINDINGS_PAGE_SIZE, type=int), FINDINGS_PAGE_MAX))
+    tags = {}
+    for tag in request.args.getlist('tag'):
+        key, sep, value = tag.partition('=')
+        tags[key] = value if sep else None
+    min_age_days = request.args.get('min_age_days', type=float)
+    fields = comma_list(request.args.get('fields'))
+
+    scan_id = request.args.get('scan_id', type=int)
+    if scan_id is not None:
+        scan = result_store.get_scan_metadata(scan_id)
+        if scan is None:
+            return jsonify({"error": f"Unknown scan: {scan_id}"}), 404
+        scans = {scan_id: scan['account_id']}
+    else:
+        scans = result_store.latest_check_scans(
+            check_name, scope=request.args.get('scope'), account_ids=comma_list(request.args.get('account_id'))
+        )
+
+    rows, total = result_store.query_finding_items(
+        check_name, scans,
+        regions=comma_list(request.args.get('region')),
+        tags=tags,
+        created_before=time.time() - min_age_days * 86400 if min_age_days is not None else None,
+        sort=sort,
+        descending=descending,
+        after=after,
+        limit=limit
+    )
+
+    items = []
+    for row in rows:
+        item = row['item'] if isinstance(row['item'], dict) else {'ResourceId': row['item']}
+        item = {**item, 'AccountId': scans.get(row['scan_id']), 'Region': item.get('Region', row['region'])}
+        items.append({field: item[field] for field in fields if field in item} if fields else item)
+    return jsonify({
+        "check": check_name,
+        "pillar": check.pillar,
+        "severity": check.severity,
+        "scans": [{"scan_id": scan, "account_id": account} for scan, account in scans.items()],
+        "total": total,
+        "items": items,
+        "next_cursor": encode_cursor(sort, descending, rows[-1]['cursor']) if len(rows) == limit else None,
+    })
+
+@app.route('/api/findings/summary', methods=['GET'])
+def get_findings_summary():
+    """
+    Returns the finding count and severity of every check, and totals per severity and
+    pillar, without loading any findings. Each check's count comes from the latest stored
+    scan that ran it, per account (or from one scan), so a partial scan only replaces the
+    checks it ran. 'scan_metadata' is that of the newest stored scan (or of the one scan).
+    Use /api/checks/<check_name>/findings to page through the findings themselves.
+
+    Query parameters:
+        scan_id: Summarize this stored scan instead of the latest ones.
+        scope: Only consider scans of this scope.
+        account_id: Comma-separated accounts to include.
+    """
+    scan_id = request.args.get('scan_id', type=int)
+    if scan_id is not None:
+        scan = result_store.get_scan_metadata(scan_id)
+        if scan is None:
+            return jsonify({"error": f"Unknown scan: {scan_id}"}), 404
+        counts_per_scan = [result_store.get_finding_counts(scan_id)]
+    else:
+        accounts = comma_list(request.args.get('account_id'))
+        counts_per_scan = [
+            counts for account_id, counts in result_store.latest_finding_counts(scope=request.args.get('scope')).items()
+            if not accounts or account_id in accounts
+        ]
+        newest = result_store.list_scans(scope=request.args.get('scope'), limit=1)
+        scan = result_store.get_scan_metadata(newest[0]['scan_id']) if newest else None
+
+    checks = {}
+    for counts in counts_per_scan:
+        for pillar, check_counts in counts.items():
+            for name, count in check_counts.items():
+                check = registry.CHECKS.get(name)
+                entry = checks.setdefault(name, {
+                    "pillar": pillar,
+                    "severity": check.severity if check else None,
+                    "finding_count": None,
+                })
+                if count is not None:
+                    entry["finding_count"] = (entry["finding_count"] or 0) + count
 
-    except Exception as e:
-        print(f"A critical error occurred during the discovery phase: {e}")
-        print(traceback.format_exc())
-        return jsonify({"error": "Failed to complete the scan due to a critical error.", "details": str(e)}), 500
+    by_severity = {severity: 0 for severity in registry.SEVERITIES}
+    by_pillar = {}
+    for entry in checks.values():
+        count = entry["finding_count"] or 0
+        if entry["severity"]:
+            by_severity[entry["severity"]] += count
+        by_pillar[entry["pillar"]] = by_pillar.get(entry["pillar"], 0) + count
+    return jsonify({"checks": checks, "by_severity": by_severity, "by_pillar": by_pillar,
+                    "scan_metadata": scan['scan_metadata'] if scan else None})
 
 
 if __name__ == '__main__':
@@ -0,0 +1,156 @@
+"""
+Benchmarks writing, loading and querying a resource inventory (core.inventory) in each
+format, with synthetic boto3-shaped resources.
+
+Run from the backend directory:
+
+    python -m benchmarks.inventory_benchmark --resources 1000000
+
+Resources are generated one at a time while the inventory is written, like discovery
+pages are, so the peak RSS reflects what the writer itself holds.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from core import inventory
+
+REGIONS = ['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-2']
+# Share of the synthetic resources per type.
+RESOURCE_MIX = {
+    'ec2_instance': 0.40,
+    'ebs_volume': 0.30,
+    'security_group': 0.10,
+    'iam_user': 0.08,
+    's3_bucket': 0.05,
+    'rds_instance': 0.03,
+    'cloudformation_stack': 0.03,
+    'vpc': 0.01,
+}
+_EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def _tags(rng, i):
+    return [{'Key': 'Name', 'Value': f"resource-{i}"}, {'Key': 'env', 'Value': rng.choice(['prod', 'staging', 'dev'])}]
+
+
+def synthetic_resource(resource_type, i, rng):
+    """Returns one resource shaped like the discovery module's boto3 responses."""
+    created = _EPOCH + timedelta(seconds=rng.randrange(5 * 365 * 86400))
+    vpc_id = f"vpc-{rng.randrange(50):08x}"
+    if resource_type == 'ec2_instance':
+        return {'InstanceId': f"i-{i:017x}", 'InstanceType': rng.choice(['t3.micro', 'm5.large', 'c6g.xlarge']),
+                'State': {'Code': 16, 'Name': rng.choice(['running', 'stopped'])}, 'VpcId': vpc_id,
+                'LaunchTime': created, 'Tags': _tags(rng, i), 'Monitoring': {'State': 'disabled'},
+                'BlockDeviceMappings': [{'DeviceName': '/dev/xvda', 'Ebs': {'VolumeId': f"vol-{i:017x}"}}]}
+    if resource_type == 'ebs_volume':
+        return {'VolumeId': f"vol-{i:017x}", 'Size': rng.choice([8, 20, 100, 500]), 'VolumeType': rng.choice(['gp2', 'gp3']),
+                'State': rng.choice(['in-use', 'available']), 'CreateTime': created, 'Tags': _tags(rng, i),
+                'Attachments': []}
+    if resource_type == 'security_group':
+        return {'GroupId': f"sg-{i:017x}", 'GroupName': f"group-{i}", 'VpcId': vpc_id,
+                'IpPermissions': [{'IpProtocol': 'tcp', 'FromPort': 443, 'ToPort': 443,
+                                   'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}]}
+    if resource_type == 'iam_user':
+        return {'UserName': f"user-{i}", 'UserId': f"AIDA{i:016X}", 'Path': '/',
+                'Arn': f"arn:aws:iam::123456789012:user/user-{i}", 'CreateDate': created}
+    if resource_type == 's3_bucket':
+        return {'Name': f"bucket-{i}", 'CreationDate': created, 'BucketRegion': rng.choice(REGIONS)}
+    if resource_type == 'rds_instance':
+        return {'DBInstanceIdentifier': f"db-{i}", 'DBInstanceClass': 'db.t3.micro', 'DBInstanceStatus': 'available',
+                'AllocatedStorage': 20, 'InstanceCreateTime': created, 'DBSubnetGroup': {'VpcId': vpc_id},
+                'DBInstanceArn': f"arn:aws:rds:us-east-1:123456789012:db:db-{i}", 'TagList': _tags(rng, i)}
+    if resource_type == 'cloudformation_stack':
+        return {'StackName': f"stack-{i}", 'StackStatus': 'CREATE_COMPLETE', 'CreationTime': created,
+                'StackId': f"arn:aws:cloudformation:us-east-1:123456789012:stack/stack-{i}/{i:08x}"}
+    return {'VpcId': f"vpc-{i:08x}", 'CidrBlock': '10.0.0.0/16', 'State': 'available', 'Tags': _tags(rng, i)}
+
+
+def synthetic_resources(total, seed=0):
+    """Yields (resource_type, region, item) tuples for a synthetic account of about `total` resources."""
+    rng = random.Random(seed)
+    i = 0
+    for resource_type, share in RESOURCE_MIX.items():
+        regional = inventory.RESOURCE_TYPES[resource_type][1] == 'regional'
+        for _ in range(max(1, int(total * share))):
+            i += 1
+            yield resource_type, rng.choice(REGIONS) if regional else None, synthetic_resource(resource_type, i, rng)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class _TimedResources:
+    """Iterates over synthetic resources, adding up the time spent generating them."""
+    def __init__(self, resources):
+        self._resources = iter(resources)
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return next(self._resources)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+def run_format(total, path, seed):
+    """Writes, loads and queries one inventory file."""
+    rss_before = _peak_rss_mb()
+    resources = _TimedResources(synthetic_resources(total, seed))
+    started = time.perf_counter()
+    result = inventory.write_inventory(resources, path)
+    # The writer's own time, without building the synthetic resources.
+    write_sec = time.perf_counter() - started - resources.seconds
+    report = {
+        'format': result['format'],
+        'resources': sum(result['resources'].values()),
+        'generate_sec': round(resources.seconds, 3),
+        'write_sec': round(write_sec, 3),
+        'resources_per_sec': round(sum(result['resources'].values()) / write_sec),
+        'file_mb': round(os.path.getsize(path) / (1024 * 1024), 1),
+        'peak_rss_growth_mb': round(_peak_rss_mb() - rss_before, 1),
+    }
+    if result['format'] != inventory.JSONL:
+        started = time.perf_counter()
+        table = inventory.open_inventory(path)
+        report['load_sec'] = round(time.perf_counter() - started, 3)
+        report['rows_loaded'] = table.num_rows
+        del table
+    started = time.perf_counter()
+    frame = inventory.query_inventory(path, resource_type='rds_instance', region=REGIONS[0])
+    report['query_sec'] = round(time.perf_counter() - started, 3)
+    report['rows_matched'] = len(frame)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--resources', type=int, default=1_000_000, help='Synthetic resources to write')
+    parser.add_argument('--formats', default='arrow,parquet,jsonl.gz', help='Comma-separated formats')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in [name.strip() for name in args.formats.split(',') if name.strip()]:
+            path = os.path.join(tmp, 'inventory' + inventory.FORMAT_SUFFIXES[name][0])
+            results.append(run_format(args.resources, path, args.seed))
+            print(f"{name}: wrote {results[-1]['resources']} resources in {results[-1]['write_sec']}s", file=sys.stderr)
+    print(json.dumps({'resources': args.resources, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
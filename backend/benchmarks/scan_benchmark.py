@@ -0,0 +1,272 @@
+"""
+Benchmarks a full /api/scan/all scan against moto's in-process AWS stand-in, seeded with
+a synthetic account of each requested size, with injected API latency and throttling.
+
+Run from the backend directory, with requirements-dev.txt installed (for moto):
+
+    python -m benchmarks.scan_benchmark --sizes 100,10000,100000 --latency-ms 20 --throttle-rate 0.02 --output scan.json
+
+Each size runs in a fresh process, so its peak RSS is its own. Seeding is done through
+the moto API and is not timed; for 100000 resources it takes around ten minutes. Compare the JSON of two commits to spot regressions in wall time,
+API calls per service, peak RSS and throughput.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+REGION = 'us-east-1'
+
+# Share of the seeded resources per kind. The sizes on the command line are totals.
+RESOURCE_MIX = {
+    'ec2_instances': 0.35,
+    'ebs_volumes': 0.20,
+    'ebs_snapshots': 0.10,
+    'security_groups': 0.10,
+    'iam_users': 0.10,
+    's3_buckets': 0.05,
+    'secrets': 0.05,
+    'load_balancers': 0.02,
+    'rds_instances': 0.02,
+    'vpcs': 0.01,
+}
+# run_instances creates at most this many instances per call.
+INSTANCE_BATCH = 1000
+
+# Error bodies of an injected throttling response, per protocol. JSON and CBOR protocols
+# parse an empty body; the error code is then taken from the customized response.
+_THROTTLE_BODIES = {
+    'query': b'<ErrorResponse><Error><Code>Throttling</Code><Message>Rate exceeded</Message></Error></ErrorResponse>',
+    'ec2': b'<Response><Errors><Error><Code>RequestLimitExceeded</Code><Message>Rate exceeded</Message></Error></Errors></Response>',
+    'rest-xml': b'<Error><Code>SlowDown</Code><Message>Rate exceeded</Message></Error>',
+}
+_THROTTLE_CODES = {'query': 'Throttling', 'ec2': 'RequestLimitExceeded', 'rest-xml': 'SlowDown'}
+
+
+class FaultInjector:
+    """
+    Adds latency to every AWS request and turns a share of the responses into throttling
+    errors, through botocore events, so the retry, rate limiting and adaptive concurrency
+    code runs as it would against AWS.
+
+    install() must be called before any botocore session is created: the handlers are
+    added to botocore's built-in handlers, which every new session copies.
+
+    Args:
+        latency_ms: Added to every request (including retries).
+        throttle_rate: Share of responses replaced by a throttling error (0 to 1).
+        seed: Seed of the random choice of throttled responses.
+    """
+    def __init__(self, latency_ms=0, throttle_rate=0.0, seed=0):
+        self.latency_sec = latency_ms / 1000
+        self.throttle_rate = throttle_rate
+        self.enabled = False
+        self.requests = {}
+        self.throttled = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def install(self):
+        from botocore.handlers import BUILTIN_HANDLERS
+        # Ahead of moto's own before-send handler, which answers the request.
+        BUILTIN_HANDLERS.insert(0, ('before-send', self._before_send))
+        BUILTIN_HANDLERS.append(('before-parse', self._before_parse))
+
+    def _before_send(self, request, **kwargs):
+        if self.enabled and self.latency_sec:
+            time.sleep(self.latency_sec)
+
+    def _before_parse(self, operation_model, response_dict, customized_response_dict, **kwargs):
+        if not self.enabled:
+            return
+        service = operation_model.service_model.service_name
+        with self._lock:
+            self.requests[service] = self.requests.get(service, 0) + 1
+            throttle = self._random.random() < self.throttle_rate
+            if throttle:
+                self.throttled[service] = self.throttled.get(service, 0) + 1
+        if throttle:
+            protocol = operation_model.service_model.resolved_protocol
+            response_dict['status_code'] = 503 if protocol == 'rest-xml' else 400
+            response_dict['body'] = _THROTTLE_BODIES.get(protocol, b'')
+            customized_response_dict['Error'] = {
+                'Code': _THROTTLE_CODES.get(protocol, 'ThrottlingException'), 'Message': 'Rate exceeded'
+            }
+
+
+def resource_counts(size):
+    """Splits a total size into per-kind counts following RESOURCE_MIX (at least one of each)."""
+    return {kind: max(1, int(size * share)) for kind, share in RESOURCE_MIX.items()}
+
+
+def seed_account(counts, rng):
+    """Creates the synthetic resources in the mocked account. Some are non-compliant on purpose."""
+    import boto3
+
+    ec2 = boto3.client('ec2', region_name=REGION)
+    iam = boto3.client('iam', region_name=REGION)
+    s3 = boto3.client('s3', region_name=REGION)
+
+    for i in range(counts['vpcs']):
+        ec2.create_vpc(CidrBlock=f"10.{i % 256}.0.0/16")
+    default_vpc = ec2.describe_vpcs(Filters=[{'Name': 'isDefault', 'Values': ['true']}])['Vpcs'][0]['VpcId']
+    subnets = [subnet['SubnetId'] for subnet in ec2.describe_subnets(
+        Filters=[{'Name': 'vpc-id', 'Values': [default_vpc]}])['Subnets']]
+
+    for i in range(counts['security_groups']):
+        group_id = ec2.create_security_group(GroupName=f"bench-sg-{i}", Description='benchmark', VpcId=default_vpc)['GroupId']
+        if i % 10 == 0:
+            ec2.authorize_security_group_ingress(GroupId=group_id, IpPermissions=[{
+                'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]
+            }])
+
+    remaining = counts['ec2_instances']
+    while remaining:
+        batch = min(remaining, INSTANCE_BATCH)
+        ec2.run_instances(ImageId='ami-12c6146b', InstanceType='t3.micro', MinCount=batch, MaxCount=batch,
+                          Monitoring={'Enabled': rng.random() < 0.5})
+        remaining -= batch
+
+    volume_ids = [ec2.create_volume(AvailabilityZone=f"{REGION}a", Size=rng.choice([8, 20, 100]))['VolumeId']
+                  for _ in range(counts['ebs_volumes'])]
+    for i in range(counts['ebs_snapshots']):
+        ec2.create_snapshot(VolumeId=volume_ids[i % len(volume_ids)])
+
+    for i in range(counts['iam_users']):
+        iam.create_user(UserName=f"bench-user-{i}")
+        if i % 10 == 0:
+            iam.create_access_key(UserName=f"bench-user-{i}")
+
+    for i in range(counts['s3_buckets']):
+        s3.create_bucket(Bucket=f"bench-bucket-{i}", ACL='public-read' if i % 20 == 0 else 'private')
+
+    secrets = boto3.client('secretsmanager', region_name=REGION)
+    for i in range(counts['secrets']):
+        secrets.create_secret(Name=f"bench-secret-{i}", SecretString='benchmark')
+
+    elbv2 = boto3.client('elbv2', region_name=REGION)
+    for i in range(counts['load_balancers']):
+        elbv2.create_load_balancer(Name=f"bench-lb-{i}", Subnets=subnets[:2])
+
+    rds = boto3.client('rds', region_name=REGION)
+    for i in range(counts['rds_instances']):
+        rds.create_db_instance(DBInstanceIdentifier=f"bench-db-{i}", DBInstanceClass='db.t3.micro', Engine='postgres',
+                               MasterUsername='bench', MasterUserPassword='benchmark', AllocatedStorage=20,
+                               MultiAZ=rng.random() < 0.5)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_size(size, latency_ms, throttle_rate, query, seed=0):
+    """Seeds an account of the given size and times one full scan of it. Runs in a fresh process."""
+    injector = FaultInjector(latency_ms, throttle_rate, seed)
+    injector.install()
+    os.environ.setdefault('AWS_DEFAULT_REGION', REGION)
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+        os.environ[name] = 'testing'
+
+    from moto import mock_aws
+
+    # The scan logs with print(); keep stdout for the JSON report.
+    with contextlib.redirect_stdout(sys.stderr), tempfile.TemporaryDirectory() as tmp, mock_aws():
+        os.environ['RESULT_STORE'] = f"sqlite:///{os.path.join(tmp, 'results.db')}"
+        counts = resource_counts(size)
+        seed_started = time.perf_counter()
+        seed_account(counts, random.Random(seed))
+        seed_sec = time.perf_counter() - seed_started
+        rss_before_scan = _peak_rss_mb()
+
+        import app
+        from core.findings import count_findings
+
+        client = app.app.test_client()
+        injector.enabled = True
+        started = time.perf_counter()
+        response = client.get(f"/api/scan/all?full=true{'&' + query if query else ''}")
+        wall_sec = time.perf_counter() - started
+        injector.enabled = False
+        data = response.get_json() or {}
+
+    metadata = data.get('scan_metadata', {})
+    api_calls = metadata.get('api_calls', {})
+    total_calls = sum(counts['calls'] for counts in api_calls.values())
+    total_resources = sum(counts.values())
+    return {
+        'size': size,
+        'status_code': response.status_code,
+        'resources': counts,
+        'seed_sec': round(seed_sec, 2),
+        'wall_sec': round(wall_sec, 3),
+        'api_calls': api_calls,
+        'api_calls_total': total_calls,
+        'requests_sent': injector.requests,
+        'injected_throttles': injector.throttled,
+        'throttled_requests': metadata.get('throttled_requests'),
+        'peak_rss_mb': _peak_rss_mb(),
+        'peak_rss_before_scan_mb': rss_before_scan,
+        'resources_per_sec': round(total_resources / wall_sec, 1) if wall_sec else None,
+        'api_calls_per_sec': round(total_calls / wall_sec, 1) if wall_sec else None,
+        'task_timings': metadata.get('task_timings'),
+        'findings': {
+            check_name: count_findings(check_name, result)
+            for pillar, checks in data.items() if pillar != 'scan_metadata' and isinstance(checks, dict)
+            for check_name, result in checks.items()
+        },
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100,10000', help='Comma-separated account sizes (total resources)')
+    parser.add_argument('--latency-ms', type=float, default=10, help='Latency added to every AWS request')
+    parser.add_argument('--throttle-rate', type=float, default=0.02, help='Share of responses turned into throttling errors')
+    parser.add_argument('--query', default='', help="Extra /api/scan/all parameters, e.g. 'pillars=security'")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON here as well as to stdout')
+    args = parser.parse_args()
+
+    results = []
+    for size in [int(size) for size in args.sizes.split(',') if size.strip()]:
+        # One process per size: fresh moto state, client pool and peak RSS.
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            results.append(executor.submit(
+                run_size, size, args.latency_ms, args.throttle_rate, args.query, args.seed
+            ).result())
+        print(f"size={size}: {results[-1]['wall_sec']}s, {results[-1]['api_calls_total']} API calls", file=sys.stderr)
+
+    report = json.dumps({
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'settings': {'latency_ms': args.latency_ms, 'throttle_rate': args.throttle_rate,
+                     'query': args.query, 'seed': args.seed},
+        'results': results,
+    }, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
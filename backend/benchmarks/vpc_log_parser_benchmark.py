@@ -0,0 +1,104 @@
+"""
+Benchmarks cost.vpc_log_parser against the previous row-by-row implementation on
+synthetic gzip flow logs.
+
+Run from the backend directory:
+
+    python -m benchmarks.vpc_log_parser_benchmark --rows 2000000 --files 4
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+
+from cost import vpc_log_parser
+
+_DESTINATIONS = ['3.{}.{}.{}', '13.{}.{}.{}', '10.0.{}.{}', '172.20.{}.{}', '192.168.{}.{}', '54.{}.{}.{}']
+
+
+def legacy_analyze_vpc_transfer_cost(flowlog_path):
+    """The implementation this benchmark compares against, kept verbatim apart from its name."""
+    PUBLIC_PREFIXES = ['3.', '13.', '15.']
+    PRIVATE_PREFIXES = ['10.', '172.16.', '192.168.']
+    summary = defaultdict(int)
+    with gzip.open(flowlog_path, 'rt') as f:
+        reader = csv.reader(f, delimiter=' ')
+        for row in reader:
+            try:
+                dstaddr = row[4]
+                bytes_sent = int(row[10])
+                if any(dstaddr.startswith(p) for p in PUBLIC_PREFIXES):
+                    summary['internet'] += bytes_sent
+                elif any(dstaddr.startswith(p) for p in PRIVATE_PREFIXES):
+                    summary['intra_vpc'] += bytes_sent
+                else:
+                    summary['inter_az'] += bytes_sent
+            except:
+                continue
+    return {k: round(v / (1024 ** 3) * vpc_log_parser.COST_PER_GB[k], 2) for k, v in summary.items()}
+
+
+def write_synthetic_log(path, rows, distinct_destinations=50_000, seed=0):
+    """Writes a gzip flow log in the default format, with a header line and some NODATA records."""
+    rng = random.Random(seed)
+    destinations = [rng.choice(_DESTINATIONS).format(*(rng.randrange(256) for _ in range(3)))
+                    for _ in range(distinct_destinations)]
+    with gzip.open(path, 'wt', compresslevel=1) as f:
+        f.write(' '.join(vpc_log_parser.DEFAULT_LOG_FORMAT) + '\n')
+        for i in range(rows):
+            if i % 1000 == 999:
+                f.write(f"2 123456789012 eni-0abc - - - - - - - 1700000000 1700000060 - NODATA\n")
+                continue
+            f.write(f"2 123456789012 eni-0abc 10.0.1.{i % 250} {rng.choice(destinations)} "
+                    f"{rng.randrange(1024, 65535)} 443 6 {rng.randrange(1, 100)} {rng.randrange(40, 1_000_000)} "
+                    f"1700000000 1700000060 ACCEPT OK\n")
+
+
+def _timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, round(time.perf_counter() - started, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Rows per synthetic file')
+    parser.add_argument('--files', type=int, default=os.cpu_count() or 1, help='Files for the parallel run')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for the parallel run')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f'flowlog-{i}.log.gz') for i in range(args.files)]
+        for i, path in enumerate(paths):
+            write_synthetic_log(path, args.rows, seed=i)
+
+        _, legacy_sec = _timed(legacy_analyze_vpc_transfer_cost, paths[0])
+        single, single_sec = _timed(vpc_log_parser.summarize_flow_log, paths[0])
+        legacy_all_sec = round(legacy_sec * len(paths), 3)
+        merged, parallel_sec = _timed(vpc_log_parser.analyze_vpc_transfer_costs, paths, max_workers=args.workers)
+
+    print(json.dumps({
+        'rows_per_file': args.rows,
+        'files': args.files,
+        'single_file': {
+            'legacy_sec': legacy_sec,
+            'columnar_sec': single_sec,
+            'speedup': round(legacy_sec / single_sec, 1) if single_sec else None,
+            'rows_per_sec': int(single['rows'] / single_sec) if single_sec else None,
+        },
+        'all_files': {
+            'legacy_sequential_sec_estimate': legacy_all_sec,
+            'parallel_sec': parallel_sec,
+            'speedup': round(legacy_all_sec / parallel_sec, 1) if parallel_sec else None,
+            'summary': merged,
+        },
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,23 @@
 # core/additional_checks.py
-import boto3
-from datetime import datetime, timedelta, timezone
+from core.bucket_configs import BucketConfigSnapshot
+from core.snapshot_index import build_snapshot_index
 
-def check_public_s3_buckets():
-    s3 = boto3.client('s3')
+def check_public_s3_buckets(session, bucket_configs=None):
+    s3 = session.client('s3')
     public_buckets = []
     try:
         buckets = s3.list_buckets().get('Buckets', [])
-        for bucket in buckets:
-            bucket_name = bucket['Name']
-            try:
-                policy_status = s3.get_bucket_policy_status(Bucket=bucket_name)
-                if policy_status['PolicyStatus']['IsPublic']:
-                    public_buckets.append({"Bucket": bucket_name, "Reason": "Bucket Policy"})
-                    continue 
-            except s3.exceptions.ClientError as e:
-                if e.response['Error']['Code'] != 'NoSuchBucketPolicy':
-                    pass
-            try:
-                acl = s3.get_bucket_acl(Bucket=bucket_name)
-                for grant in acl['Grants']:
-                    if 'URI' in grant.get('Grantee', {}) and 'AllUsers' in grant['Grantee']['URI']:
-                        public_buckets.append({"Bucket": bucket_name, "Reason": "ACL Grant"})
-                        break
-            except Exception:
-                continue
+        for bucket_name, config in (bucket_configs or BucketConfigSnapshot(session)).fetch(buckets).items():
+            if config.public_via_policy():
+                public_buckets.append({"Bucket": bucket_name, "Reason": "Bucket Policy"})
+            elif config.public_via_acl():
+                public_buckets.append({"Bucket": bucket_name, "Reason": "ACL Grant"})
     except Exception as e:
         return {"error": f"Could not check S3 buckets. Error: {e}"}
     return public_buckets
 
-def check_unrestricted_security_groups():
-    ec2 = boto3.client('ec2')
+def check_unrestricted_security_groups(session):
+    ec2 = session.client('ec2')
     risky_rules = []
     try:
         sgs = ec2.describe_security_groups().get('SecurityGroups', [])
@@ -46,8 +33,8 @@ def check_unrestricted_security_groups():
         return {"error": f"Could not check security groups. Error: {e}"}
     return risky_rules
 
-def check_cloudtrail_status():
-    ct = boto3.client('cloudtrail')
+def check_cloudtrail_status(session):
+    ct = session.client('cloudtrail')
     trails_status = []
     try:
         trails = ct.describe_trails().get('trailList', [])
@@ -60,25 +47,26 @@ def check_cloudtrail_status():
         return {"error": f"Could not check CloudTrail status. Error: {e}"}
     return trails_status
 
-def check_ebs_backup_status():
-    ec2 = boto3.client('ec2')
+def check_ebs_backup_status(session, snapshot_index=None):
+    ec2 = session.client('ec2')
     volumes_without_backup = []
-    seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
     try:
+        if snapshot_index is None:
+            snapshot_index = build_snapshot_index(session)
         volumes = ec2.describe_volumes(Filters=[{'Name': 'status', 'Values': ['in-use']}]).get('Volumes', [])
         for vol in volumes:
-            snapshots = ec2.describe_snapshots(Filters=[{'Name': 'volume-id', 'Values': [vol['VolumeId']]}]).get('Snapshots', [])
-            if not snapshots or max(snap['StartTime'] for snap in snapshots) < seven_days_ago:
+            if not snapshot_index.has_recent_snapshot(vol['VolumeId'], 7):
+                last_snapshot = snapshot_index.latest_snapshot_time(vol['VolumeId'])
                 volumes_without_backup.append({
                     "VolumeId": vol['VolumeId'], "SizeGiB": vol['Size'],
-                    "LastSnapshot": max(snap['StartTime'] for snap in snapshots).isoformat() if snapshots else "None"
+                    "LastSnapshot": last_snapshot.isoformat() if last_snapshot else "None"
                 })
     except Exception as e:
         return {"error": f"Could not check EBS backups. Error: {e}"}
     return volumes_without_backup
 
-def check_ec2_detailed_monitoring():
-    ec2 = boto3.client('ec2')
+def check_ec2_detailed_monitoring(session):
+    ec2 = session.client('ec2')
     instances_without_detailed_monitoring = []
     try:
         reservations = ec2.describe_instances(Filters=[{'Name': 'instance-state-name', 'Values': ['running']}]).get('Reservations', [])
@@ -93,18 +81,11 @@ def check_ec2_detailed_monitoring():
         return {"error": f"Could not check EC2 monitoring. Error: {e}"}
     return instances_without_detailed_monitoring
 
-def check_s3_lifecycle_policies():
-    s3 = boto3.client('s3')
-    buckets_without_lifecycle = []
+def check_s3_lifecycle_policies(session, bucket_configs=None):
+    s3 = session.client('s3')
     try:
         buckets = s3.list_buckets().get('Buckets', [])
-        for bucket in buckets:
-            bucket_name = bucket['Name']
-            try:
-                s3.get_bucket_lifecycle_configuration(Bucket=bucket_name)
-            except s3.exceptions.ClientError as e:
-                if e.response['Error']['Code'] == 'NoSuchLifecycleConfiguration':
-                    buckets_without_lifecycle.append(bucket_name)
+        configs = (bucket_configs or BucketConfigSnapshot(session)).fetch(buckets)
     except Exception as e:
         return {"error": f"Could not list S3 buckets. Error: {e}"}
-    return buckets_without_lifecycle
+    return [bucket_name for bucket_name, config in configs.items() if config.missing_lifecycle()]
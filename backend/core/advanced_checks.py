@@ -1,6 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
 from botocore.exceptions import ClientError
-from datetime import datetime, timedelta, timezone
+
+from core import instrumentation
+from core.findings import tag_map
+from core.snapshot_index import build_snapshot_index
+
+# describe_target_health calls in flight at once while checking for idle load balancers
+TARGET_HEALTH_CONCURRENCY = 8
 
 def get_unattached_ebs_volumes(session):
     """
@@ -16,24 +24,33 @@ def get_unattached_ebs_volumes(session):
     unattached_volumes = []
     try:
         # CORRECTED: 'Value' should be 'Values' and it should be a list.
-        volumes = ec2.describe_volumes(Filters=[{'Name': 'status', 'Values': ['available']}])
-        for volume in volumes.get('Volumes', []):
-            unattached_volumes.append({
-                'VolumeId': volume.get('VolumeId'),
-                'Size': volume.get('Size'),
-                'CreateTime': volume.get('CreateTime').isoformat() if volume.get('CreateTime') else None
-            })
+        paginator = ec2.get_paginator('describe_volumes')
+        for page in paginator.paginate(Filters=[{'Name': 'status', 'Values': ['available']}]):
+            for volume in page.get('Volumes', []):
+                unattached_volumes.append({
+                    'VolumeId': volume.get('VolumeId'),
+                    'Size': volume.get('Size'),
+                    'CreateTime': volume.get('CreateTime').isoformat() if volume.get('CreateTime') else None
+                })
     except ClientError as e:
         print(f"Error checking for unattached EBS volumes: {e}")
     return unattached_volumes
 
-def get_idle_load_balancers(session):
+def _has_healthy_target(elbv2, target_group_arn):
+    health_descriptions = elbv2.describe_target_health(TargetGroupArn=target_group_arn).get('TargetHealthDescriptions', [])
+    return any(target.get('TargetHealth', {}).get('State') == 'healthy' for target in health_descriptions)
+
+def get_idle_load_balancers(session, load_balancers=None):
     """
     Identifies and returns a list of idle Application and Network Load Balancers.
     An ELB is considered idle if it has no registered instances/targets.
 
+    The target groups of every load balancer are listed in one paginated call, and the
+    health of the target groups is described concurrently.
+
     Args:
         session: A Boto3 session object.
+        load_balancers: The scan's discovered load balancers. Listed here if not given.
 
     Returns:
         A list of dictionaries, where each dictionary represents an idle load balancer.
@@ -41,33 +58,33 @@ def get_idle_load_balancers(session):
     elbv2 = session.client('elbv2')
     idle_lbs = []
     try:
-        load_balancers = elbv2.describe_load_balancers().get('LoadBalancers', [])
+        if load_balancers is None:
+            load_balancers = [
+                lb for page in elbv2.get_paginator('describe_load_balancers').paginate()
+                for lb in page.get('LoadBalancers', [])
+            ]
+        target_groups_by_lb = {}
+        for page in elbv2.get_paginator('describe_target_groups').paginate():
+            for tg in page.get('TargetGroups', []):
+                for lb_arn in tg.get('LoadBalancerArns', []):
+                    target_groups_by_lb.setdefault(lb_arn, []).append(tg['TargetGroupArn'])
+
+        target_group_arns = {arn for lb in load_balancers for arn in target_groups_by_lb.get(lb.get('LoadBalancerArn'), [])}
+        has_healthy_target = instrumentation.bind(_has_healthy_target)
+        with ThreadPoolExecutor(max_workers=TARGET_HEALTH_CONCURRENCY, thread_name_prefix='target-health') as executor:
+            futures = {arn: executor.submit(has_healthy_target, elbv2, arn) for arn in target_group_arns}
+            healthy = {arn: future.result() for arn, future in futures.items()}
+
         for lb in load_balancers:
-            lb_arn = lb.get('LoadBalancerArn')
-            if not lb_arn:
-                continue
-                
-            target_groups = elbv2.describe_target_groups(LoadBalancerArn=lb_arn).get('TargetGroups', [])
+            target_groups = target_groups_by_lb.get(lb.get('LoadBalancerArn'), [])
             if not target_groups:
-                 idle_lbs.append({
+                idle_lbs.append({
                     'Name': lb.get('LoadBalancerName'),
                     'Type': lb.get('Type'),
                     'Reason': 'No target groups associated.'
                 })
-                 continue
-            
-            has_healthy_targets = False
-            for tg in target_groups:
-                tg_arn = tg.get('TargetGroupArn')
-                if not tg_arn:
-                    continue
-                health_descriptions = elbv2.describe_target_health(TargetGroupArn=tg_arn).get('TargetHealthDescriptions', [])
-                if any(target.get('TargetHealth', {}).get('State') == 'healthy' for target in health_descriptions):
-                    has_healthy_targets = True
-                    break
-            
-            if not has_healthy_targets:
-                 idle_lbs.append({
+            elif not any(healthy[arn] for arn in target_groups):
+                idle_lbs.append({
                     'Name': lb.get('LoadBalancerName'),
                     'Type': lb.get('Type'),
                     'Reason': 'No healthy targets registered.'
@@ -77,42 +94,37 @@ def get_idle_load_balancers(session):
         print(f"Error checking for idle load balancers: {e}")
     return idle_lbs
 
-def get_old_ebs_snapshots(session):
+def get_old_ebs_snapshots(session, snapshot_index=None):
     """
     Identifies and returns a list of EBS snapshots older than one year.
 
     Args:
         session: A Boto3 session object.
+        snapshot_index: The scan's SnapshotIndex. Built here (one paginated read) if not given.
 
     Returns:
-        A list of dictionaries, where each dictionary represents an old EBS snapshot.
+        A list of dictionaries, where each dictionary represents an old EBS snapshot, or an
+        error dictionary if the snapshots could not be read.
     """
-    ec2 = session.client('ec2')
-    sts = session.client('sts')
-    old_snapshots = []
-    one_year_ago = datetime.now(timezone.utc) - timedelta(days=365)
-    
-    try:
-        owner_id = sts.get_caller_identity().get('Account')
-        paginator = ec2.get_paginator('describe_snapshots')
-        
-        for page in paginator.paginate(OwnerIds=[owner_id]):
-            for snapshot in page.get('Snapshots', []):
-                if snapshot.get('StartTime') and snapshot.get('StartTime') < one_year_ago:
-                    old_snapshots.append({
-                        'SnapshotId': snapshot.get('SnapshotId'),
-                        'VolumeId': snapshot.get('VolumeId', 'N/A'),
-                        'StartTime': snapshot.get('StartTime').isoformat(),
-                        'VolumeSize': snapshot.get('VolumeSize', 'N/A')
-                    })
-    except ClientError as e:
-        print(f"Error checking for old EBS snapshots: {e}")
-        if "AuthFailure" in str(e):
-            print("Could not check snapshots due to authentication failure. You may not be the owner.")
-        else:
-            # Don't raise, just return what we have
-            pass
-    return old_snapshots
+    if snapshot_index is None:
+        try:
+            snapshot_index = build_snapshot_index(session)
+        except ClientError as e:
+            print(f"Error checking for old EBS snapshots: {e}")
+            if "AuthFailure" in str(e):
+                print("Could not check snapshots due to authentication failure. You may not be the owner.")
+            return {"error": "Failed to read EBS snapshots", "details": str(e)}
+
+    return [
+        {
+            'SnapshotId': snapshot['SnapshotId'],
+            'VolumeId': snapshot['VolumeId'],
+            'StartTime': snapshot['StartTime'].isoformat(),
+            'VolumeSize': snapshot['VolumeSize'],
+            'Tags': tag_map(snapshot['Tags'])
+        }
+        for snapshot in snapshot_index.snapshots_older_than(365)
+    ]
 
 def run_all_advanced_checks(session):
     """
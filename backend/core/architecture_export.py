@@ -2,6 +2,8 @@
 import json
 import boto3
 
+from core import inventory
+
 def export_architecture_json(s3_client, filename='architecture.json'):
     """
     Performs a basic discovery action (listing S3 buckets) using the provided
@@ -32,3 +34,27 @@ def export_architecture_json(s3_client, filename='architecture.json'):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+
+def export_inventory(session, filename=None, regions=None, resource_types=None):
+    """
+    Discovers every resource (EC2, EBS, RDS, security groups, VPCs, CloudFormation stacks,
+    S3 buckets and IAM users) and exports them to a columnar inventory file.
+
+    Resources are streamed page by page from discovery into the file (see
+    core.inventory.InventoryWriter), so only one page of responses and one batch of
+    column values are held at a time.
+
+    Args:
+        session: The session to discover with.
+        filename: The inventory file. Its suffix selects the format: '.arrow' (memory-mapped
+            on load), '.parquet' or '.jsonl.gz'. Defaults to inventory.arrow, or
+            inventory.jsonl.gz without pyarrow.
+        regions: Regions to list regional resources in. Defaults to the session's region.
+        resource_types: Optional subset of inventory.RESOURCE_TYPES to export.
+    """
+    filename = filename or inventory.default_inventory_path()
+    try:
+        result = inventory.write_inventory(inventory.iter_resources(session, regions, resource_types), filename)
+        return {"status": "success", **result}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
@@ -1,39 +1,23 @@
 # backend/core/auth_manager.py
-import boto3
-import uuid
+from core.client_pool import get_client
 
-def get_boto3_client(service_name, role_arn=None):
+def get_boto3_client(service_name, role_arn=None, region_name=None):
     """
-    Creates a boto3 client for a given service.
-    If a role_arn is provided, it assumes that role first.
+    Returns a boto3 client for a given service from the shared client pool.
+    If a role_arn is provided, the client uses that role's credentials. The role is
+    assumed once and its temporary credentials are reused (and refreshed shortly
+    before they expire) by every client built for it.
     Otherwise, it uses the local environment's default credentials.
     """
     if not role_arn:
         # This is used for local testing without assuming a role.
         # In the production app, role_arn will always be provided.
         print("Warning: No Role ARN provided. Using default credentials.")
-        return boto3.client(service_name)
-        
+        return get_client(service_name, region_name=region_name)
+
     try:
-        sts_client = boto3.client('sts')
-        
-        # Generate a unique session name for each assume role call
-        session_name = f"cloudguard-scan-{uuid.uuid4()}"
-        
-        assumed_role_object = sts_client.assume_role(
-            RoleArn=role_arn,
-            RoleSessionName=session_name
-        )
-        
-        credentials = assumed_role_object['Credentials']
-        
-        # Create the service client using the temporary credentials from the assumed role
-        return boto3.client(
-            service_name,
-            aws_access_key_id=credentials['AccessKeyId'],
-            aws_secret_access_key=credentials['SecretAccessKey'],
-            aws_session_token=credentials['SessionToken'],
-        )
+        # Building the first client for a role triggers the AssumeRole call.
+        return get_client(service_name, role_arn=role_arn, region_name=region_name)
     except Exception as e:
         print(f"FATAL: Error assuming role {role_arn}: {e}")
         # This error is critical, so we return it to be handled by the API caller.
@@ -0,0 +1,161 @@
+# core/bucket_configs.py
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from core import instrumentation
+from core.client_pool import get_session
+
+# Buckets whose configuration is fetched at the same time. Each bucket's calls go to the
+# S3 endpoint of its own region, so they are spread over one pooled client per region.
+BUCKET_CONFIG_CONCURRENCY = 16
+
+# Error codes meaning "not configured" rather than "could not be read".
+_NOT_CONFIGURED = {
+    'policy_status': 'NoSuchBucketPolicy',
+    'public_access_block': 'NoSuchPublicAccessBlockConfiguration',
+    'lifecycle_rules': 'NoSuchLifecycleConfiguration',
+    'encryption_rules': 'ServerSideEncryptionConfigurationNotFoundError',
+}
+
+
+def _bucket_region(location_constraint):
+    """Maps a get_bucket_location LocationConstraint to a region name."""
+    if not location_constraint:
+        return 'us-east-1'
+    if location_constraint == 'EU':
+        return 'eu-west-1'
+    return location_constraint
+
+
+class BucketConfig:
+    """
+    The configuration of one bucket, as read by BucketConfigSnapshot.
+
+    A setting that is not configured is None. A setting that could not be read is also
+    None and has its error in errors, so checks can tell the two apart.
+    """
+    __slots__ = ('name', 'region', 'acl_grants', 'policy_status', 'public_access_block',
+                 'lifecycle_rules', 'encryption_rules', 'versioning_status', 'errors')
+
+    def __init__(self, name, region=None):
+        self.name = name
+        self.region = region
+        self.acl_grants = None
+        self.policy_status = None
+        self.public_access_block = None
+        self.lifecycle_rules = None
+        self.encryption_rules = None
+        self.versioning_status = None
+        self.errors = {}
+
+    def _blocks(self, setting):
+        return bool((self.public_access_block or {}).get(setting))
+
+    def public_via_acl(self):
+        """Returns True if an ACL grant gives everyone access and the public access block does not ignore it."""
+        if self._blocks('IgnorePublicAcls'):
+            return False
+        return any('AllUsers' in grant.get('Grantee', {}).get('URI', '') for grant in self.acl_grants or [])
+
+    def public_via_policy(self):
+        """Returns True if the bucket policy is public and the public access block does not restrict it."""
+        if self._blocks('RestrictPublicBuckets'):
+            return False
+        return bool((self.policy_status or {}).get('IsPublic'))
+
+    def missing_lifecycle(self):
+        """Returns True if the bucket is known to have no lifecycle configuration."""
+        return self.lifecycle_rules is None and 'lifecycle_rules' not in self.errors
+
+
+class BucketConfigSnapshot:
+    """
+    The ACL, policy status, public access block, lifecycle, encryption and versioning
+    configuration of S3 buckets, read once per scan.
+
+    fetch() reads the buckets it has not seen yet concurrently, each through a client of
+    the bucket's own region (so no call is redirected), and keeps the results. Checks
+    sharing a snapshot never read the same bucket twice, even when they ask at the same
+    time: the later caller waits for the fetch already in flight.
+
+    Args:
+        session: Optional session whose credentials are used (the pooled ambient session otherwise).
+        max_workers: Buckets fetched at the same time.
+    """
+    def __init__(self, session=None, max_workers=BUCKET_CONFIG_CONCURRENCY):
+        self._session = session or get_session()
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+        self._configs = {}
+
+    def __contains__(self, bucket_name):
+        with self._lock:
+            return bucket_name in self._configs
+
+    def get(self, bucket_name):
+        """Returns the BucketConfig of an already fetched bucket, or None."""
+        with self._lock:
+            future = self._configs.get(bucket_name)
+        return future.result() if future is not None else None
+
+    def fetch(self, buckets):
+        """
+        Returns {bucket name: BucketConfig} for bucket dictionaries from list_buckets,
+        fetching the buckets not read yet.
+
+        Raises:
+            Exception: Anything other than a ClientError raised while fetching.
+        """
+        buckets = list(buckets)
+        owned = []
+        with self._lock:
+            for bucket in buckets:
+                name = bucket.get('Name')
+                if name and name not in self._configs:
+                    self._configs[name] = Future()
+                    owned.append(bucket)
+            futures = {bucket['Name']: self._configs[bucket['Name']] for bucket in buckets if bucket.get('Name')}
+
+        if owned:
+            with ThreadPoolExecutor(max_workers=min(self._max_workers, len(owned)), thread_name_prefix='s3-config') as executor:
+                fill = instrumentation.bind(self._fill)
+                for bucket in owned:
+                    executor.submit(fill, bucket, futures[bucket['Name']])
+        return {name: future.result() for name, future in futures.items()}
+
+    def _fill(self, bucket, future):
+        try:
+            future.set_result(self._fetch_bucket(bucket))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _fetch_bucket(self, bucket):
+        name = bucket['Name']
+        # Recent list_buckets responses include the region; older ones need a lookup.
+        region = bucket.get('BucketRegion')
+        if not region:
+            try:
+                region = _bucket_region(self._session.client('s3').get_bucket_location(Bucket=name).get('LocationConstraint'))
+            except ClientError as e:
+                print(f"Could not get the region of S3 bucket {name}: {e}")
+        config = BucketConfig(name, region)
+        s3 = self._session.client('s3', region_name=region) if region else self._session.client('s3')
+
+        calls = {
+            'acl_grants': lambda: s3.get_bucket_acl(Bucket=name).get('Grants', []),
+            'policy_status': lambda: s3.get_bucket_policy_status(Bucket=name).get('PolicyStatus'),
+            'public_access_block': lambda: s3.get_public_access_block(Bucket=name).get('PublicAccessBlockConfiguration'),
+            'lifecycle_rules': lambda: s3.get_bucket_lifecycle_configuration(Bucket=name).get('Rules'),
+            'encryption_rules': lambda: s3.get_bucket_encryption(Bucket=name)
+                .get('ServerSideEncryptionConfiguration', {}).get('Rules'),
+            'versioning_status': lambda: s3.get_bucket_versioning(Bucket=name).get('Status'),
+        }
+        for field, call in calls.items():
+            try:
+                setattr(config, field, call())
+            except ClientError as e:
+                if e.response['Error']['Code'] != _NOT_CONFIGURED.get(field):
+                    config.errors[field] = str(e)
+        return config
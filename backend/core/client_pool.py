@@ -0,0 +1,204 @@
+# core/client_pool.py
+import os
+import threading
+import uuid
+
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import CredentialProvider, CredentialResolver, RefreshableCredentials
+
+from core.instrumentation import CallRecorder
+from core.throttling import MAX_ATTEMPTS, ServiceCallStats, ThrottleGuard
+
+# Building a boto3 client costs hundreds of milliseconds of botocore loader work, and
+# every client carries its own HTTP connection pool. Clients are thread-safe once built,
+# so this module keeps one client per (role_arn, region, service) for the whole process.
+
+# Enough connections per client for every scan worker to hit the same service at once.
+MAX_POOL_CONNECTIONS = 50
+# Throttled calls are retried by core.throttling; botocore's standard mode retries the
+# other transient errors within the same attempt budget.
+DEFAULT_CLIENT_CONFIG = Config(
+    max_pool_connections=MAX_POOL_CONNECTIONS,
+    retries={'mode': 'standard', 'total_max_attempts': MAX_ATTEMPTS}
+)
+
+# Maximum in-flight calls per client, i.e. per (account, region, service). IAM, STS and
+# CloudFormation have low per-account rate limits, so adding scan workers past these limits
+# only queues calls instead of getting them throttled. Services not listed may use every
+# pooled connection. The limit adapts downwards while a service throttles.
+# Override with e.g. API_CONCURRENCY_LIMITS="iam=2,ec2=20".
+DEFAULT_API_CONCURRENCY_LIMITS = {'iam': 4, 'sts': 4, 'cloudformation': 4}
+
+# Requests per second per client. Services not listed are not rate limited.
+# Override with e.g. API_RATE_LIMITS="iam=5,ec2=40".
+DEFAULT_API_RATE_LIMITS = {'iam': 10, 'sts': 10, 'cloudformation': 5}
+
+
+def _parse_limits(value):
+    limits = {}
+    for item in value.split(','):
+        service, _, limit = item.partition('=')
+        if service.strip() and limit.strip():
+            limits[service.strip()] = int(limit)
+    return limits
+
+API_CONCURRENCY_LIMITS = {
+    **DEFAULT_API_CONCURRENCY_LIMITS,
+    **_parse_limits(os.environ.get('API_CONCURRENCY_LIMITS', ''))
+}
+API_RATE_LIMITS = {
+    **DEFAULT_API_RATE_LIMITS,
+    **_parse_limits(os.environ.get('API_RATE_LIMITS', ''))
+}
+
+
+class _AssumeRoleProvider(CredentialProvider):
+    """
+    Credential provider that assumes a role and refreshes the temporary credentials
+    shortly before their Expiration (botocore's RefreshableCredentials refreshes them
+    inside its advisory window), so a role is only assumed once per credential lifetime.
+    """
+    METHOD = 'cloudguard-assume-role'
+
+    def __init__(self, role_arn, sts_client):
+        super().__init__()
+        self._role_arn = role_arn
+        self._sts = sts_client
+
+    def _fetch_credentials(self):
+        credentials = self._sts.assume_role(
+            RoleArn=self._role_arn,
+            RoleSessionName=f"cloudguard-scan-{uuid.uuid4()}"
+        )['Credentials']
+        return {
+            'access_key': credentials['AccessKeyId'],
+            'secret_key': credentials['SecretAccessKey'],
+            'token': credentials['SessionToken'],
+            'expiry_time': credentials['Expiration'].isoformat(),
+        }
+
+    def load(self):
+        return RefreshableCredentials.create_from_metadata(
+            metadata=self._fetch_credentials(),
+            refresh_using=self._fetch_credentials,
+            method=self.METHOD,
+        )
+
+
+class ClientPool:
+    """
+    A thread-safe, process-wide cache of boto3 sessions and clients.
+
+    One boto3 session is kept per role ARN (None for the ambient credentials) and one
+    client per (role_arn, region, service). Assumed-role sessions share a single
+    refreshable credential object, so AssumeRole is not repeated per client. Every client
+    gets a ThrottleGuard (adaptive concurrency, rate limit, throttling retries) whose calls
+    are counted per (role_arn, service), and a CallRecorder that times every call.
+    """
+    def __init__(self, config=DEFAULT_CLIENT_CONFIG):
+        self._config = config
+        self._lock = threading.RLock()
+        self._sessions = {}
+        self._clients = {}
+        self._stats = {}
+
+    def _get_session_locked(self, role_arn):
+        session = self._sessions.get(role_arn)
+        if session is None:
+            if role_arn is None:
+                session = boto3.Session()
+            else:
+                botocore_session = botocore.session.get_session()
+                sts = self._get_client_locked('sts', None, None)
+                botocore_session.register_component(
+                    'credential_provider',
+                    CredentialResolver([_AssumeRoleProvider(role_arn, sts)])
+                )
+                session = boto3.Session(botocore_session=botocore_session)
+            self._sessions[role_arn] = session
+        return session
+
+    def _get_client_locked(self, service_name, role_arn, region_name):
+        key = (role_arn, region_name, service_name)
+        client = self._clients.get(key)
+        if client is None:
+            session = self._get_session_locked(role_arn)
+            client = session.client(service_name, region_name=region_name, config=self._config)
+            stats = self._stats.setdefault((role_arn, service_name), ServiceCallStats())
+            ThrottleGuard(
+                stats,
+                max_concurrency=API_CONCURRENCY_LIMITS.get(service_name, MAX_POOL_CONNECTIONS),
+                rate=API_RATE_LIMITS.get(service_name)
+            ).attach(client)
+            CallRecorder().attach(client)
+            self._clients[key] = client
+        return client
+
+    def get_client(self, service_name, role_arn=None, region_name=None):
+        """Returns the shared client for a service, building it on first use."""
+        client = self._clients.get((role_arn, region_name, service_name))
+        if client is not None:
+            return client
+        # boto3 sessions are not thread-safe, so clients are only ever built under the lock.
+        with self._lock:
+            return self._get_client_locked(service_name, role_arn, region_name)
+
+    def get_default_region(self, role_arn=None):
+        """Returns the region configured for the session of a role (or the ambient session)."""
+        with self._lock:
+            return self._get_session_locked(role_arn).region_name
+
+    def call_stats(self, role_arn=None):
+        """
+        Returns the call counters of a role's clients (all regions) as
+        {service: {'calls': ..., 'retries': ..., 'throttles': ...}}, counted since the pool started.
+        """
+        with self._lock:
+            stats = {service: counter for (role, service), counter in self._stats.items() if role == role_arn}
+        return {service: counter.as_dict() for service, counter in stats.items()}
+
+    def clear(self, role_arn=None):
+        """Drops cached clients and sessions, for one role or (with no argument) all of them."""
+        with self._lock:
+            if role_arn is None:
+                self._sessions.clear()
+                self._clients.clear()
+                return
+            self._sessions.pop(role_arn, None)
+            for key in [k for k in self._clients if k[0] == role_arn]:
+                del self._clients[key]
+
+
+class PooledSession:
+    """
+    A stand-in for boto3.Session that hands out pooled clients. The checks only call
+    session.client(service_name), so they can take either object.
+    """
+    def __init__(self, role_arn=None, region_name=None, pool=None):
+        self.role_arn = role_arn
+        self._region_name = region_name
+        self._pool = pool or _default_pool
+
+    @property
+    def region_name(self):
+        return self._region_name or self._pool.get_default_region(self.role_arn)
+
+    def client(self, service_name, region_name=None):
+        return self._pool.get_client(service_name, self.role_arn, region_name or self._region_name)
+
+
+_default_pool = ClientPool()
+
+def get_client(service_name, role_arn=None, region_name=None):
+    """Returns a client for a service from the process-wide pool."""
+    return _default_pool.get_client(service_name, role_arn, region_name)
+
+def call_stats(role_arn=None):
+    """Returns the call counters of a role's clients in the process-wide pool."""
+    return _default_pool.call_stats(role_arn)
+
+def get_session(role_arn=None, region_name=None):
+    """Returns a PooledSession bound to a role and region, backed by the process-wide pool."""
+    return PooledSession(role_arn, region_name)
@@ -1,20 +1,48 @@
-import boto3
 from botocore.exceptions import ClientError
 from datetime import datetime, timedelta, timezone
 import time
 
-def check_mfa(users):
+from core.bucket_configs import BucketConfigSnapshot
+from core.client_pool import get_client
+from core.findings import tag_map
+from core.snapshot_index import build_snapshot_index
+from core.throttling import is_throttling_response
+
+# CloudFormation drift detection: overall time budget, detect_stack_drift calls per second,
+# and the bounds of the adaptive interval between status polls.
+DRIFT_DETECTION_TIMEOUT_SEC = 300
+DRIFT_START_RATE_PER_SEC = 2
+DRIFT_POLL_MIN_INTERVAL_SEC = 2
+DRIFT_POLL_MAX_INTERVAL_SEC = 30
+
+def check_mfa(users, session=None, credential_report=None):
     """
     Checks for IAM users without MFA enabled from a given list of users.
 
     Args:
         users: A list of user dictionaries from the boto3.client('iam').list_users() call.
+        session: Optional boto3 session object. Defaults to the ambient credentials.
+        credential_report: Optional CredentialReport. Users found in it are answered from
+            the report; only users missing from it are checked with list_mfa_devices.
 
     Returns:
         A list of usernames that do not have MFA enabled.
     """
-    iam = boto3.client('iam')
     non_compliant = []
+    if credential_report is not None:
+        unreported = []
+        for user in users:
+            record = credential_report.get(user['UserName'])
+            if record is None:
+                # Created after the report was generated.
+                unreported.append(user)
+            elif not record['MfaActive']:
+                non_compliant.append(user['UserName'])
+        users = unreported
+        if not users:
+            return non_compliant
+
+    iam = session.client('iam') if session is not None else get_client('iam')
     for user in users:
         try:
             mfa_devices = iam.list_mfa_devices(UserName=user['UserName'])
@@ -24,47 +52,33 @@ def check_mfa(users):
             print(f"Could not check MFA for user {user['UserName']}: {e}")
     return non_compliant
 
-def check_public_s3_buckets(buckets, session):
+def check_public_s3_buckets(buckets, session, bucket_configs=None):
     """
     Checks for S3 buckets that are publicly accessible.
     
     Args:
         buckets: A list of bucket dictionaries from list_buckets().
         session: A boto3 session object.
+        bucket_configs: The scan's BucketConfigSnapshot. Buckets it has not read yet are
+            fetched into it (a private snapshot is used if not given).
     
     Returns:
         A list of dictionaries for each public bucket with its name and reason.
     """
-    s3 = session.client('s3')
+    bucket_configs = bucket_configs or BucketConfigSnapshot(session)
     public_buckets = []
-    for bucket in buckets:
-        bucket_name = bucket['Name']
-        try:
-            # Check bucket ACLs
-            acl = s3.get_bucket_acl(Bucket=bucket_name)
-            for grant in acl['Grants']:
-                if 'URI' in grant['Grantee'] and 'AllUsers' in grant['Grantee']['URI']:
-                     public_buckets.append({'Bucket': bucket_name, 'Reason': 'Public via ACL'})
-                     continue
-
-            # Check bucket policies
-            try:
-                policy_status = s3.get_bucket_policy_status(Bucket=bucket_name)
-                if policy_status.get('PolicyStatus', {}).get('IsPublic'):
-                    public_buckets.append({'Bucket': bucket_name, 'Reason': 'Public via Bucket Policy'})
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'NoSuchBucketPolicy':
-                    pass # No policy means not public via policy
-                else:
-                    raise
-        except ClientError as e:
-            print(f"Could not check S3 bucket {bucket_name}: {e}")
-    
-    # Remove duplicates
-    return [dict(t) for t in {tuple(d.items()) for d in public_buckets}]
+    for bucket_name, config in bucket_configs.fetch(buckets).items():
+        for field in ('acl_grants', 'policy_status'):
+            if field in config.errors:
+                print(f"Could not check S3 bucket {bucket_name}: {config.errors[field]}")
+        if config.public_via_acl():
+            public_buckets.append({'Bucket': bucket_name, 'Reason': 'Public via ACL'})
+        if config.public_via_policy():
+            public_buckets.append({'Bucket': bucket_name, 'Reason': 'Public via Bucket Policy'})
+    return public_buckets
 
 
-def check_iam_key_age(users, session, max_age_days=90):
+def check_iam_key_age(users, session, max_age_days=90, credential_report=None):
     """
     Checks for IAM user access keys older than a specified number of days.
     
@@ -72,10 +86,20 @@ def check_iam_key_age(users, session, max_age_days=90):
         users: A list of user dictionaries.
         session: A boto3 session object.
         max_age_days: The maximum allowed age for access keys.
+        credential_report: Optional CredentialReport. Key ages are read from the report, and
+            list_access_keys is only called for users that have an aged key (the report
+            does not contain key IDs) or that are missing from the report.
     
     Returns:
         A list of dictionaries for each aged key.
     """
+    if credential_report is not None:
+        users = [user for user in users
+                 if user['UserName'] not in credential_report
+                 or credential_report.access_keys_older_than(user['UserName'], max_age_days)]
+        if not users:
+            return []
+
     iam = session.client('iam')
     aged_keys = []
     age_limit = datetime.now(timezone.utc) - timedelta(days=max_age_days)
@@ -99,7 +123,8 @@ def check_unrestricted_security_groups(security_groups):
     Checks for security groups with unrestricted inbound rules (0.0.0.0/0).
     
     Args:
-        security_groups: A list of security group dictionaries.
+        security_groups: An iterable of security group dictionaries. A generator such as
+            discovery.iter_security_groups() is consumed page by page.
     
     Returns:
         A list of dictionaries for each unrestricted rule found.
@@ -113,7 +138,8 @@ def check_unrestricted_security_groups(security_groups):
                     unrestricted_groups.append({
                         'GroupId': sg['GroupId'],
                         'GroupName': sg['GroupName'],
-                        'PortRange': port_range
+                        'PortRange': port_range,
+                        'Tags': tag_map(sg.get('Tags'))
                     })
     return unrestricted_groups
 
@@ -153,30 +179,25 @@ def check_cloudtrail_status(trails):
     """
     return [{'Name': t.get('Name'), 'IsLogging': t.get('is_logging', False)} for t in trails if t.get('Name')]
 
-def check_s3_lifecycle(buckets, session):
+def check_s3_lifecycle(buckets, session, bucket_configs=None):
     """
     Checks for S3 buckets that do not have a lifecycle policy.
     
     Args:
         buckets: A list of bucket dictionaries.
         session: A boto3 session object.
+        bucket_configs: The scan's BucketConfigSnapshot (a private snapshot is used if not given).
     
     Returns:
         A list of bucket names without lifecycle policies.
     """
-    s3 = session.client('s3')
+    bucket_configs = bucket_configs or BucketConfigSnapshot(session)
     no_lifecycle_buckets = []
-    for bucket in buckets:
-        bucket_name = bucket.get('Name')
-        if not bucket_name:
-            continue
-        try:
-            s3.get_bucket_lifecycle_configuration(Bucket=bucket_name)
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'NoSuchLifecycleConfiguration':
-                no_lifecycle_buckets.append(bucket_name)
-            else:
-                print(f"Could not get lifecycle config for {bucket_name}: {e}")
+    for bucket_name, config in bucket_configs.fetch(buckets).items():
+        if 'lifecycle_rules' in config.errors:
+            print(f"Could not get lifecycle config for {bucket_name}: {config.errors['lifecycle_rules']}")
+        elif config.missing_lifecycle():
+            no_lifecycle_buckets.append(bucket_name)
     return no_lifecycle_buckets
 
 def check_compute_optimizer(session):
@@ -201,7 +222,7 @@ def check_rds_multi_az(rds_instances):
     Checks if RDS instances are configured for Multi-AZ deployment.
     
     Args:
-        rds_instances: A list of RDS instance dictionaries.
+        rds_instances: An iterable of RDS instance dictionaries.
     
     Returns:
         A list of dictionaries with Multi-AZ status for each instance.
@@ -214,7 +235,7 @@ def check_rds_multi_az(rds_instances):
         } for i in rds_instances
     ]
 
-def check_ebs_backups(ebs_volumes, session, backup_age_days=7):
+def check_ebs_backups(ebs_volumes, session, backup_age_days=7, snapshot_index=None):
     """
     Checks if EBS volumes have a recent snapshot.
     
@@ -222,39 +243,29 @@ def check_ebs_backups(ebs_volumes, session, backup_age_days=7):
         ebs_volumes: A list of EBS volume dictionaries.
         session: A boto3 session object.
         backup_age_days: The maximum age for a backup to be considered recent.
+        snapshot_index: The scan's SnapshotIndex. Built here (one paginated read) if not given.
     
     Returns:
         A list of volume dictionaries that do not have recent backups.
     """
-    ec2 = session.client('ec2')
-    sts = session.client('sts')
-    no_backup_volumes = []
-    recent_date = datetime.now(timezone.utc) - timedelta(days=backup_age_days)
-    
-    try:
-        account_id = sts.get_caller_identity()['Account']
-    except ClientError as e:
-        print(f"Could not get AWS Account ID: {e}")
-        return {"error": "Could not determine AWS Account ID to check snapshots."}
+    if snapshot_index is None:
+        try:
+            snapshot_index = build_snapshot_index(session)
+        except ClientError as e:
+            print(f"Error listing EBS snapshots: {e}")
+            return {"error": "Could not list EBS snapshots to check backups."}
 
+    no_backup_volumes = []
     for vol in ebs_volumes:
         vol_id = vol.get('VolumeId')
         if not vol_id:
             continue
-        try:
-            snapshots = ec2.describe_snapshots(
-                OwnerIds=[account_id],
-                Filters=[{'Name': 'volume-id', 'Values': [vol_id]}]
-            )['Snapshots']
-            
-            if not any(snap.get('StartTime') > recent_date for snap in snapshots):
-                 no_backup_volumes.append({
-                     'VolumeId': vol_id,
-                     'SizeGiB': vol.get('Size')
-                 })
-        except ClientError as e:
-            print(f"Error checking snapshots for volume {vol_id}: {e}")
-            
+        if not snapshot_index.has_recent_snapshot(vol_id, backup_age_days):
+            no_backup_volumes.append({
+                'VolumeId': vol_id,
+                'SizeGiB': vol.get('Size'),
+                'Tags': tag_map(vol.get('Tags'))
+            })
     return no_backup_volumes
 
 def check_ec2_detailed_monitoring(ec2_instances):
@@ -262,7 +273,8 @@ def check_ec2_detailed_monitoring(ec2_instances):
     Checks if EC2 instances have detailed monitoring enabled.
     
     Args:
-        ec2_instances: A list of EC2 instance dictionaries.
+        ec2_instances: An iterable of EC2 instance dictionaries. A generator such as
+            discovery.iter_ec2_instances() is consumed page by page.
     
     Returns:
         A list of instance dictionaries without detailed monitoring.
@@ -276,44 +288,106 @@ def check_ec2_detailed_monitoring(ec2_instances):
              })
     return no_detailed_monitoring
 
-def check_cloudformation_drift(cfn_stacks, session):
+def _is_throttling_error(e):
+    return is_throttling_response(e.response)
+
+def _start_drift_detection(cfn, stack_name, min_interval, last_call):
+    """
+    Calls detect_stack_drift for one stack, spacing calls at least min_interval apart and
+    backing off on throttling. Returns the detection ID, or None if drift cannot be detected.
+    """
+    backoff = 1
+    for _ in range(5):
+        wait = last_call[0] + min_interval - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        last_call[0] = time.time()
+        try:
+            return cfn.detect_stack_drift(StackName=stack_name)['StackDriftDetectionId']
+        except ClientError as e:
+            if _is_throttling_error(e):
+                time.sleep(backoff)
+                backoff *= 2
+                continue
+            if "Drift detection is not supported" not in str(e):
+                print(f"Could not check drift for stack {stack_name}: {e}")
+            return None
+    print(f"Could not start drift detection for stack {stack_name}: throttled")
+    return None
+
+def check_cloudformation_drift(cfn_stacks, session, max_wait_sec=DRIFT_DETECTION_TIMEOUT_SEC,
+                               start_rate_per_sec=DRIFT_START_RATE_PER_SEC):
     """
     Checks for drift in CloudFormation stacks.
-    
+
+    Drift detection is started for every stack up front (at most start_rate_per_sec
+    detect_stack_drift calls per second), then all outstanding detections are polled
+    together, with the poll interval backing off while nothing completes. Stacks whose
+    detection has not finished by the deadline are reported as pending instead of
+    holding up the scan.
+
     Args:
         cfn_stacks: A list of stack summary dictionaries.
         session: A boto3 session object.
-    
+        max_wait_sec: The overall time budget for starting and polling drift detection.
+        start_rate_per_sec: The maximum rate of detect_stack_drift calls.
+
     Returns:
-        A list of stacks that have drifted.
+        A list of stacks that have drifted, plus any stack whose detection was still
+        pending at the deadline (with DriftStatus 'DETECTION_PENDING').
     """
     cfn = session.client('cloudformation')
-    drifted_stacks = []
+    deadline = time.time() + max_wait_sec
+    min_interval = 1.0 / start_rate_per_sec
+    last_call = [0.0]
+
+    # --- Start detection for every stack ---
+    outstanding = {}
+    pending_stacks = []
     for stack in cfn_stacks:
         stack_name = stack.get('StackName')
         if not stack_name:
             continue
-        try:
-            drift_status_response = cfn.detect_stack_drift(StackName=stack_name)
-            drift_detection_id = drift_status_response['StackDriftDetectionId']
-            
-            # Manual polling loop to wait for drift detection to complete
-            while True:
-                status = cfn.describe_stack_drift_detection_status(
-                    StackDriftDetectionId=drift_detection_id
-                )
-                if status['DetectionStatus'] in ['DETECTION_COMPLETE', 'DETECTION_FAILED']:
+        if time.time() > deadline:
+            pending_stacks.append(stack_name)
+            continue
+        detection_id = _start_drift_detection(cfn, stack_name, min_interval, last_call)
+        if detection_id:
+            outstanding[detection_id] = stack_name
+
+    # --- Poll all outstanding detections together ---
+    drifted_stacks = []
+    poll_interval = DRIFT_POLL_MIN_INTERVAL_SEC
+    while outstanding and time.time() < deadline:
+        time.sleep(min(poll_interval, max(0, deadline - time.time())))
+        completed = 0
+        throttled = False
+        for detection_id, stack_name in list(outstanding.items()):
+            try:
+                status = cfn.describe_stack_drift_detection_status(StackDriftDetectionId=detection_id)
+            except ClientError as e:
+                if _is_throttling_error(e):
+                    throttled = True
                     break
-                time.sleep(5) # Wait for 5 seconds before checking again
+                print(f"Could not check drift for stack {stack_name}: {e}")
+                del outstanding[detection_id]
+                continue
+            if status['DetectionStatus'] in ['DETECTION_COMPLETE', 'DETECTION_FAILED']:
+                del outstanding[detection_id]
+                completed += 1
+                if status.get('StackDriftStatus') == 'DRIFTED':
+                    drifted_stacks.append({
+                        'StackName': stack_name,
+                        'DriftStatus': status.get('StackDriftStatus')
+                    })
+        # Poll quickly while detections are finishing, back off while they are not (or when throttled).
+        if completed and not throttled:
+            poll_interval = DRIFT_POLL_MIN_INTERVAL_SEC
+        else:
+            poll_interval = min(poll_interval * 2, DRIFT_POLL_MAX_INTERVAL_SEC)
 
-            if status.get('StackDriftStatus') == 'DRIFTED':
-                drifted_stacks.append({
-                    'StackName': stack_name,
-                    'DriftStatus': status.get('StackDriftStatus')
-                })
-        except ClientError as e:
-            if "Drift detection is not supported" in str(e):
-                pass
-            else:
-                 print(f"Could not check drift for stack {stack_name}: {e}")
+    pending_stacks.extend(outstanding.values())
+    if pending_stacks:
+        print(f"Drift detection still pending for {len(pending_stacks)} stacks after {max_wait_sec} seconds.")
+    drifted_stacks.extend({'StackName': name, 'DriftStatus': 'DETECTION_PENDING'} for name in pending_stacks)
     return drifted_stacks
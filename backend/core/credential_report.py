@@ -0,0 +1,129 @@
+# core/credential_report.py
+import csv
+import io
+import time
+from datetime import datetime, timedelta, timezone
+
+
+# The credential report is generated asynchronously; it usually takes a few seconds.
+REPORT_GENERATION_TIMEOUT_SEC = 60
+REPORT_POLL_INTERVAL_SEC = 2
+
+_ACCESS_KEY_SLOTS = (1, 2)
+
+
+def _parse_time(value):
+    """Returns a datetime for a report timestamp, or None for 'N/A', 'no_information', etc."""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _parse_row(row):
+    """Turns one CSV row into the compact per-user record kept by CredentialReport."""
+    access_keys = []
+    for slot in _ACCESS_KEY_SLOTS:
+        prefix = f'access_key_{slot}_'
+        if row.get(prefix + 'active') != 'true':
+            continue
+        access_keys.append({
+            'Slot': slot,
+            'LastRotated': _parse_time(row.get(prefix + 'last_rotated')),
+            'LastUsedDate': _parse_time(row.get(prefix + 'last_used_date')),
+            'LastUsedService': row.get(prefix + 'last_used_service'),
+        })
+    password_last_used = _parse_time(row.get('password_last_used'))
+    last_used = [t for t in [password_last_used] + [key['LastUsedDate'] for key in access_keys] if t]
+    return {
+        'UserName': row.get('user'),
+        'Arn': row.get('arn'),
+        'UserCreationTime': _parse_time(row.get('user_creation_time')),
+        'MfaActive': row.get('mfa_active') == 'true',
+        'PasswordEnabled': row.get('password_enabled') == 'true',
+        'PasswordLastChanged': _parse_time(row.get('password_last_changed')),
+        'PasswordLastUsed': password_last_used,
+        'ActiveAccessKeys': access_keys,
+        'LastUsed': max(last_used) if last_used else None,
+    }
+
+
+class CredentialReport:
+    """
+    The account's IAM credential report, read once per scan.
+
+    One record per IAM user (the root account row is kept as '<root_account>') with MFA
+    status, password age, active access keys and last activity, so IAM checks answer
+    without per-user API calls.
+
+    Args:
+        rows: An iterable of CSV row dictionaries (as produced by csv.DictReader).
+        now: The reference time for ages (defaults to the current time).
+        generated_at: When AWS generated the report.
+    """
+    def __init__(self, rows, now=None, generated_at=None):
+        self.now = now or datetime.now(timezone.utc)
+        self.generated_at = generated_at
+        self._users = {}
+        for row in rows:
+            record = _parse_row(row)
+            self._users[record['UserName']] = record
+
+    def __len__(self):
+        return len(self._users)
+
+    def __contains__(self, user_name):
+        return user_name in self._users
+
+    def get(self, user_name):
+        """Returns the record of a user, or None if the user is not in the report."""
+        return self._users.get(user_name)
+
+    def users(self):
+        """Returns every user record (including the root account row)."""
+        return list(self._users.values())
+
+    def password_age_days(self, user_name):
+        """Returns the days since the user's password was last changed, or None."""
+        record = self._users.get(user_name)
+        if not record or not record['PasswordEnabled'] or not record['PasswordLastChanged']:
+            return None
+        return (self.now - record['PasswordLastChanged']).days
+
+    def access_keys_older_than(self, user_name, days):
+        """Returns the user's active access keys last rotated more than the given number of days ago."""
+        record = self._users.get(user_name)
+        if not record:
+            return []
+        age_limit = self.now - timedelta(days=days)
+        return [key for key in record['ActiveAccessKeys'] if key['LastRotated'] and key['LastRotated'] < age_limit]
+
+
+def build_credential_report(session, timeout_sec=REPORT_GENERATION_TIMEOUT_SEC):
+    """
+    Generates the account's credential report, downloads it once and parses it row by row.
+
+    Args:
+        session: A boto3 session object.
+        timeout_sec: How long to wait for AWS to generate the report.
+
+    Returns:
+        A CredentialReport, or None if the report could not be generated, downloaded or
+        parsed (e.g. missing iam:GenerateCredentialReport permission, a connection error or
+        a malformed report). Checks then fall back to per-user API calls, so a failure here
+        never fails the checks that use the report.
+    """
+    iam = session.client('iam')
+    deadline = time.time() + timeout_sec
+    try:
+        while iam.generate_credential_report().get('State') != 'COMPLETE':
+            if time.time() >= deadline:
+                print(f"IAM credential report was not generated within {timeout_sec} seconds")
+                return None
+            time.sleep(REPORT_POLL_INTERVAL_SEC)
+        response = iam.get_credential_report()
+        content = io.TextIOWrapper(io.BytesIO(response['Content']), encoding='utf-8', newline='')
+        return CredentialReport(csv.DictReader(content), generated_at=response.get('GeneratedTime'))
+    except Exception as e:
+        print(f"Could not get IAM credential report, falling back to per-user calls: {e}")
+        return None
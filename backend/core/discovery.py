@@ -1,100 +1,136 @@
-import boto3
 from botocore.exceptions import ClientError
 
+from core.client_pool import get_client
+
 # This file contains functions to discover resources in the AWS account.
-# Each function creates its own boto3 client and does not require a session object to be passed in.
+# Each function takes its boto3 client from the shared client pool and does not require a session object
+# to be passed in. Passing a session (e.g. a PooledSession bound to another region) scopes the listing to it.
+#
+# Every listing is paginated. The iter_* functions are generators that fetch one page at a
+# time, so a consumer that only loops over the results never holds more than a single page
+# in memory. The list_* functions materialise the same results for checks that need them twice.
 
-def list_iam_users():
-    """Lists all IAM users."""
-    iam = boto3.client('iam')
+def _client(service_name, session=None):
+    return session.client(service_name) if session is not None else get_client(service_name)
+
+def _iter_pages(service_name, operation_name, result_key, description, session=None, **kwargs):
+    """
+    Yields the result list of each page of a paginated operation as it arrives.
+
+    A ClientError on the first page is logged and yields nothing, as for an empty listing.
+    A ClientError on a later page is logged and re-raised: a listing cut short must not
+    pass for a complete one, so the task reading it is reported as failed instead.
+    """
+    client = _client(service_name, session)
+    pages = 0
     try:
-        # The list_users operation returns a paginator, but for most accounts,
-        # a single call is sufficient. For very large accounts, you might implement pagination.
-        return iam.list_users()['Users']
+        for page in client.get_paginator(operation_name).paginate(**kwargs):
+            pages += 1
+            yield page.get(result_key, [])
     except ClientError as e:
-        print(f"Error listing IAM users: {e}")
-        return []
+        if pages:
+            print(f"Error listing {description} after {pages} pages: {e}")
+            raise
+        print(f"Error listing {description}: {e}")
+
+def _iter_items(service_name, operation_name, result_key, description, session=None, **kwargs):
+    """Yields individual items across every page of a paginated operation."""
+    for page_items in _iter_pages(service_name, operation_name, result_key, description, session, **kwargs):
+        yield from page_items
+
+def iter_iam_users(session=None):
+    """Yields all IAM users, page by page."""
+    return _iter_items('iam', 'list_users', 'Users', 'IAM users', session)
+
+def iter_s3_buckets(session=None):
+    """Yields all S3 buckets, page by page."""
+    return _iter_items('s3', 'list_buckets', 'Buckets', 'S3 buckets', session)
+
+def iter_ec2_instances(session=None):
+    """Yields all EC2 instances, page by page."""
+    # describe_instances returns a nested structure. We extract the instances.
+    for reservation in _iter_items('ec2', 'describe_instances', 'Reservations', 'EC2 instances', session):
+        yield from reservation['Instances']
+
+def iter_rds_instances(session=None):
+    """Yields all RDS DB instances, page by page."""
+    return _iter_items('rds', 'describe_db_instances', 'DBInstances', 'RDS instances', session)
+
+def iter_vpcs(session=None):
+    """Yields all VPCs, page by page."""
+    return _iter_items('ec2', 'describe_vpcs', 'Vpcs', 'VPCs', session)
 
-def list_s3_buckets():
+def iter_subnets(session=None):
+    """Yields all subnets, page by page."""
+    return _iter_items('ec2', 'describe_subnets', 'Subnets', 'subnets', session)
+
+def iter_security_groups(session=None):
+    """Yields all security groups, page by page."""
+    return _iter_items('ec2', 'describe_security_groups', 'SecurityGroups', 'security groups', session)
+
+def iter_ebs_volumes(session=None):
+    """Yields all EBS volumes, page by page."""
+    return _iter_items('ec2', 'describe_volumes', 'Volumes', 'EBS volumes', session)
+
+def iter_load_balancers(session=None):
+    """Yields all Application, Network and Gateway Load Balancers, page by page."""
+    return _iter_items('elbv2', 'describe_load_balancers', 'LoadBalancers', 'load balancers', session)
+
+def iter_cloudformation_stacks(session=None):
+    """Yields all CloudFormation stacks in a final state, page by page."""
+    # We only care about stacks that are in a final state, not DELETED.
+    return _iter_items('cloudformation', 'list_stacks', 'StackSummaries', 'CloudFormation stacks', session,
+                       StackStatusFilter=[
+                           'CREATE_COMPLETE', 'UPDATE_COMPLETE', 'UPDATE_ROLLBACK_COMPLETE',
+                           'IMPORT_COMPLETE', 'IMPORT_ROLLBACK_COMPLETE'
+                       ])
+
+def list_iam_users(session=None):
+    """Lists all IAM users."""
+    return list(iter_iam_users(session))
+
+def list_s3_buckets(session=None):
     """Lists all S3 buckets."""
-    s3 = boto3.client('s3')
-    try:
-        return s3.list_buckets()['Buckets']
-    except ClientError as e:
-        print(f"Error listing S3 buckets: {e}")
-        return []
+    return list(iter_s3_buckets(session))
 
-def list_ec2_instances():
+def list_ec2_instances(session=None):
     """Lists all EC2 instances."""
-    ec2 = boto3.client('ec2')
-    try:
-        # describe_instances returns a nested structure. We extract the instances.
-        reservations = ec2.describe_instances()['Reservations']
-        instances = [instance for reservation in reservations for instance in reservation['Instances']]
-        return instances
-    except ClientError as e:
-        print(f"Error listing EC2 instances: {e}")
-        return []
+    return list(iter_ec2_instances(session))
 
-def list_rds_instances():
+def list_rds_instances(session=None):
     """Lists all RDS DB instances."""
-    rds = boto3.client('rds')
-    try:
-        return rds.describe_db_instances()['DBInstances']
-    except ClientError as e:
-        print(f"Error listing RDS instances: {e}")
-        return []
+    return list(iter_rds_instances(session))
 
-def list_vpcs():
+def list_vpcs(session=None):
     """Lists all VPCs."""
-    ec2 = boto3.client('ec2')
-    try:
-        return ec2.describe_vpcs()['Vpcs']
-    except ClientError as e:
-        print(f"Error listing VPCs: {e}")
-        return []
+    return list(iter_vpcs(session))
 
-def list_cloudtrails():
+def list_subnets(session=None):
+    """Lists all subnets."""
+    return list(iter_subnets(session))
+
+def list_cloudtrails(session=None):
     """Lists all CloudTrail trails."""
-    cloudtrail = boto3.client('cloudtrail')
+    cloudtrail = _client('cloudtrail', session)
     try:
+        # describe_trails is not paginated; it returns every trail in one response.
         return cloudtrail.describe_trails()['trailList']
     except ClientError as e:
         print(f"Error listing CloudTrails: {e}")
         return []
 
-def list_security_groups():
+def list_security_groups(session=None):
     """Lists all security groups."""
-    ec2 = boto3.client('ec2')
-    try:
-        return ec2.describe_security_groups()['SecurityGroups']
-    except ClientError as e:
-        print(f"Error listing security groups: {e}")
-        return []
+    return list(iter_security_groups(session))
 
-def list_ebs_volumes():
+def list_ebs_volumes(session=None):
     """Lists all EBS volumes."""
-    ec2 = boto3.client('ec2')
-    try:
-        return ec2.describe_volumes()['Volumes']
-    except ClientError as e:
-        print(f"Error listing EBS volumes: {e}")
-        return []
+    return list(iter_ebs_volumes(session))
 
-def list_cloudformation_stacks():
-    """Lists all CloudFormation stacks."""
-    cfn = boto3.client('cloudformation')
-    try:
-        # We only care about stacks that are in a final state, not DELETED.
-        all_stacks = []
-        paginator = cfn.get_paginator('list_stacks')
-        for page in paginator.paginate(StackStatusFilter=[
-            'CREATE_COMPLETE', 'UPDATE_COMPLETE', 'UPDATE_ROLLBACK_COMPLETE', 
-            'IMPORT_COMPLETE', 'IMPORT_ROLLBACK_COMPLETE'
-        ]):
-            all_stacks.extend(page['StackSummaries'])
-        return all_stacks
-    except ClientError as e:
-        print(f"Error listing CloudFormation stacks: {e}")
-        return []
+def list_load_balancers(session=None):
+    """Lists all Application, Network and Gateway Load Balancers."""
+    return list(iter_load_balancers(session))
 
+def list_cloudformation_stacks(session=None):
+    """Lists all CloudFormation stacks."""
+    return list(iter_cloudformation_stacks(session))
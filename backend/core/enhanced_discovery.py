@@ -1,25 +1,33 @@
 # core/enhanced_discovery.py
-import boto3
 import datetime
 
-def get_ec2_rightsizing_recommendations():
-    co = boto3.client('compute-optimizer')
+from core.client_pool import get_client
+
+def _client(service_name, session=None):
+    return session.client(service_name) if session is not None else get_client(service_name)
+
+def get_ec2_rightsizing_recommendations(session=None):
+    co = _client('compute-optimizer', session)
     try:
-        response = co.get_ec2_instance_recommendations()
         recommendations = []
-        for rec in response.get('instanceRecommendations', []):
-            if rec.get('finding') == 'OVER_PROVISIONED':
-                recommendations.append({
-                    "instanceArn": rec['instanceArn'],
-                    "current_instance_type": rec['currentInstanceType'],
-                    "recommended_instance_type": rec['recommendationOptions'][0]['instanceType'],
-                })
-        return recommendations
+        kwargs = {}
+        while True:
+            response = co.get_ec2_instance_recommendations(**kwargs)
+            for rec in response.get('instanceRecommendations', []):
+                if rec.get('finding') == 'OVER_PROVISIONED' and rec.get('recommendationOptions'):
+                    recommendations.append({
+                        "instanceArn": rec['instanceArn'],
+                        "current_instance_type": rec['currentInstanceType'],
+                        "recommended_instance_type": rec['recommendationOptions'][0]['instanceType'],
+                    })
+            if not response.get('nextToken'):
+                return recommendations
+            kwargs['nextToken'] = response['nextToken']
     except Exception as e:
         return {"error": f"Could not retrieve Compute Optimizer data. Error: {e}"}
 
-def get_unattached_volumes():
-    ec2 = boto3.client('ec2')
+def get_unattached_volumes(session=None):
+    ec2 = _client('ec2', session)
     try:
         response = ec2.describe_volumes(Filters=[{'Name': 'status', 'Values': ['available']}])
         unattached = []
@@ -32,8 +40,8 @@ def get_unattached_volumes():
     except Exception as e:
         return {"error": f"Could not retrieve EBS Volume data. Error: {e}"}
 
-def get_rds_instance_status():
-    rds = boto3.client('rds')
+def get_rds_instance_status(session=None):
+    rds = _client('rds', session)
     try:
         response = rds.describe_db_instances()
         status = []
@@ -46,16 +54,16 @@ def get_rds_instance_status():
     except Exception as e:
         return {"error": f"Could not retrieve RDS data. Error: {e}"}
 
-def check_secrets_rotation():
-    sm = boto3.client('secretsmanager')
+def check_secrets_rotation(session=None):
+    sm = _client('secretsmanager', session)
     try:
-        response = sm.list_secrets()
         secrets_status = []
-        for secret in response.get('SecretList', []):
-            secrets_status.append({
-                "Name": secret['Name'],
-                "RotationEnabled": secret.get('RotationEnabled', False)
-            })
+        for page in sm.get_paginator('list_secrets').paginate():
+            for secret in page.get('SecretList', []):
+                secrets_status.append({
+                    "Name": secret['Name'],
+                    "RotationEnabled": secret.get('RotationEnabled', False)
+                })
         return secrets_status
     except Exception as e:
         return {"error": f"Could not retrieve Secrets Manager data. Error: {e}"}
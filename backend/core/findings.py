@@ -0,0 +1,101 @@
+# core/findings.py
+from datetime import datetime
+
+# Some checks report every resource along with its status rather than only the
+# non-compliant ones. These predicates pick out the entries that are actual findings.
+_FINDING_FILTERS = {
+    'rds_multi_az_status': lambda item: not item.get('IsMultiAZ'),
+    'cloudtrail_status': lambda item: not item.get('IsLogging'),
+    'cloudformation_drift_status': lambda item: item.get('DriftStatus') == 'DRIFTED',
+    'secrets_rotation_status': lambda item: not item.get('RotationEnabled'),
+}
+
+# Keys naming the resource of a finding item, most specific first (a snapshot finding
+# also has the VolumeId of its volume).
+RESOURCE_ID_KEYS = ('SnapshotId', 'AccessKeyId', 'GroupId', 'InstanceId', 'VolumeId', 'DBInstanceIdentifier',
+                    'LoadBalancerArn', 'ResourceId', 'StackName', 'VpcId', 'Bucket', 'UserName', 'Name')
+# Keys holding when the resource of a finding item was created (ISO 8601).
+CREATED_AT_KEYS = ('StartTime', 'CreateTime', 'CreateDate', 'LaunchTime', 'CreatedTime')
+
+
+def tag_map(tags):
+    """Turns a list of {'Key': ..., 'Value': ...} tags from the AWS APIs into a dictionary."""
+    return {tag['Key']: tag.get('Value') for tag in tags or [] if 'Key' in tag}
+
+
+def is_finding(check_name, item):
+    """Returns True if an item of a check's list result is a finding (see _FINDING_FILTERS)."""
+    keep = _FINDING_FILTERS.get(check_name)
+    return keep is None or bool(keep(item))
+
+
+def is_error(result):
+    """Returns True if a check result is an error dictionary rather than findings."""
+    return isinstance(result, dict) and 'error' in result and 'status' not in result
+
+
+def count_findings(check_name, result):
+    """
+    Counts the findings in a single check result.
+
+    Args:
+        check_name: The check's key in the scan response (e.g. 'users_without_mfa').
+        result: The check's result.
+
+    Returns:
+        The number of findings, or None if the check failed.
+    """
+    if check_name == 'compute_optimizer_status':
+        if not isinstance(result, dict):
+            return None
+        return 0 if result.get('status') == 'Active' else 1
+    if is_error(result):
+        return None
+    if isinstance(result, list):
+        return sum(1 for item in result if is_finding(check_name, item))
+    if isinstance(result, dict):
+        # Per-region results from a multi-region scan.
+        counts = [count_findings(check_name, value) for value in result.values()]
+        return sum(c for c in counts if c is not None)
+    return 0
+
+
+
+def iter_finding_items(check_name, result):
+    """
+    Yields (region, item) for every finding in a check result: the items count_findings
+    counts. Per-region results of a multi-region scan are flattened with their region.
+    """
+    if check_name == 'compute_optimizer_status' or is_error(result):
+        return
+    if isinstance(result, list):
+        for item in result:
+            if is_finding(check_name, item):
+                yield (item.get('Region') if isinstance(item, dict) else None), item
+    elif isinstance(result, dict):
+        for region, value in result.items():
+            for item_region, item in iter_finding_items(check_name, value):
+                yield item_region or region, item
+
+
+def finding_index_fields(item):
+    """
+    Returns (resource_id, created_at, tags) of a finding item for indexing: created_at as
+    a POSIX timestamp, or None if unknown.
+    """
+    if not isinstance(item, dict):
+        return str(item), None, {}
+    resource_id = next((str(item[key]) for key in RESOURCE_ID_KEYS if item.get(key)), None)
+    created_at = None
+    for key in CREATED_AT_KEYS:
+        value = item.get(key)
+        if isinstance(value, str):
+            try:
+                created_at = datetime.fromisoformat(value).timestamp()
+                break
+            except ValueError:
+                continue
+    tags = item.get('Tags')
+    if isinstance(tags, list):
+        tags = tag_map(tags)
+    return resource_id, created_at, tags if isinstance(tags, dict) else {}
@@ -0,0 +1,173 @@
+# core/fleet.py
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from core.client_pool import get_session
+
+# Accounts scanned at the same time. Every account brings its own clients (and so its own
+# per-API concurrency limits, see client_pool.API_CONCURRENCY_LIMITS), so throughput grows
+# with this until the scanner host itself becomes the bottleneck.
+DEFAULT_FLEET_MAX_WORKERS = 4
+# Tasks that have not started once an account's scan runs this long are reported as timed out.
+DEFAULT_ACCOUNT_TIMEOUT_SEC = 900
+
+
+def account_id_from_role_arn(role_arn):
+    """
+    Extracts the account ID from a role ARN (arn:aws:iam::<account-id>:role/<name>).
+    Raises ValueError for anything that is not an IAM role ARN.
+    """
+    parts = role_arn.split(':') if isinstance(role_arn, str) else []
+    if len(parts) != 6 or parts[0] != 'arn' or parts[2] != 'iam' or not parts[5].startswith('role/'):
+        raise ValueError(f"Not an IAM role ARN: {role_arn}")
+    return parts[4]
+
+
+class FleetScanner:
+    """
+    Scans many AWS accounts in parallel by assuming a role in each one.
+
+    Every account is scanned with its own pooled session, so credentials, clients and
+    failures are isolated per account. Each account's result is saved to the result store
+    under the 'fleet' scope, and fleet-wide counts are computed from the latest stored
+    result of every account without re-running any scan.
+
+    Args:
+        scan_account: Callable invoked as scan_account(session, deadline, **scan_options)
+            that returns a scan response dictionary (see app.run_scan).
+        pillars: A dictionary of {pillar: [check names]} used for the aggregate counts.
+        max_workers: How many accounts are scanned at once.
+        timeout_sec: Default per-account timeout.
+        result_store: The ResultStore that account results are saved to.
+    """
+    SCOPE = 'fleet'
+
+    def __init__(self, scan_account, pillars, result_store, max_workers=DEFAULT_FLEET_MAX_WORKERS,
+                 timeout_sec=DEFAULT_ACCOUNT_TIMEOUT_SEC):
+        self._scan_account = scan_account
+        self._pillars = pillars
+        self._store = result_store
+        self._timeout_sec = timeout_sec
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fleet')
+        self._lock = threading.Lock()
+        self._fleets = {}
+        self._accounts = {}
+
+    def submit(self, role_arns, timeout_sec=None, **scan_options):
+        """
+        Queues a scan of every account in role_arns and returns the new fleet scan record.
+        scan_options are passed through to scan_account.
+        Raises ValueError if role_arns is empty or contains an invalid ARN.
+        """
+        if not role_arns:
+            raise ValueError("At least one role ARN is required")
+        accounts = {account_id_from_role_arn(arn): arn for arn in role_arns}
+        timeout_sec = timeout_sec or self._timeout_sec
+
+        fleet_id = str(uuid.uuid4())
+        with self._lock:
+            self._fleets[fleet_id] = {
+                'fleet_id': fleet_id,
+                'submitted_at': time.time(),
+                'account_ids': sorted(accounts)
+            }
+            for account_id, role_arn in accounts.items():
+                self._accounts[account_id] = {
+                    'account_id': account_id,
+                    'role_arn': role_arn,
+                    'fleet_id': fleet_id,
+                    'status': 'queued',
+                    'submitted_at': time.time(),
+                }
+        for account_id, role_arn in accounts.items():
+            self._executor.submit(self._scan, account_id, role_arn, fleet_id, timeout_sec, scan_options)
+        return self.get_fleet(fleet_id)
+
+    def _update(self, account_id, fleet_id, **fields):
+        with self._lock:
+            record = self._accounts.get(account_id)
+            # A newer fleet scan of the same account owns the record now.
+            if record is not None and record['fleet_id'] == fleet_id:
+                record.update(fields)
+
+    def _scan(self, account_id, role_arn, fleet_id, timeout_sec, scan_options):
+        started = time.time()
+        deadline = started + timeout_sec
+        self._update(account_id, fleet_id, status='running', started_at=started)
+        try:
+            session = get_session(role_arn)
+            # Fail fast on a bad role: discovery treats AccessDenied as "no resources".
+            session.client('sts').get_caller_identity()
+            result = self._scan_account(session, deadline, **scan_options)
+            status = 'timeout' if time.time() > deadline else 'complete'
+            scan_id = self._store.save_scan(
+                result, self.SCOPE, account_id=account_id,
+                region=result['scan_metadata'].get('region'), started_at=started
+            )
+            self._update(account_id, fleet_id, status=status, scan_id=scan_id)
+        except Exception as e:
+            print(f"Error scanning account {account_id} ({role_arn}): {e}")
+            print(traceback.format_exc())
+            self._update(account_id, fleet_id, status='failed', error=str(e))
+        finished = time.time()
+        self._update(account_id, fleet_id, finished_at=finished, duration_sec=round(finished - started, 2))
+
+    def get_fleet(self, fleet_id):
+        """Returns a fleet scan with the status of each of its accounts, or None."""
+        with self._lock:
+            fleet = self._fleets.get(fleet_id)
+            if fleet is None:
+                return None
+            accounts = []
+            for account_id in fleet['account_ids']:
+                record = self._accounts.get(account_id)
+                if record is not None and record['fleet_id'] == fleet_id:
+                    accounts.append(dict(record))
+                else:
+                    accounts.append({'account_id': account_id, 'status': 'superseded'})
+        return dict(fleet, accounts=accounts)
+
+    def get_account(self, account_id):
+        """
+        Returns the status of an account's latest fleet scan together with its latest stored
+        result (which may come from an earlier scan, e.g. before a restart), or None.
+        """
+        with self._lock:
+            record = self._accounts.get(account_id)
+            record = dict(record) if record is not None else {}
+        stored = self._store.latest_scan(scope=self.SCOPE, account_id=account_id)
+        if not record and stored is None:
+            return None
+        record.setdefault('account_id', account_id)
+        record.setdefault('status', 'stored')
+        record['result'] = stored['data'] if stored else None
+        record['result_finished_at'] = stored['finished_at'] if stored else None
+        return record
+
+    def summary(self):
+        """
+        Aggregates the latest stored result of every account into fleet-wide counts.
+        No AWS calls are made.
+        """
+        with self._lock:
+            statuses = {}
+            for record in self._accounts.values():
+                statuses[record['status']] = statuses.get(record['status'], 0) + 1
+        latest = self._store.latest_finding_counts(scope=self.SCOPE)
+
+        findings = {pillar: {name: 0 for name in names} for pillar, names in self._pillars.items()}
+        accounts_affected = {pillar: {name: 0 for name in names} for pillar, names in self._pillars.items()}
+        for account_counts in latest.values():
+            for pillar, counts in account_counts.items():
+                for name, count in counts.items():
+                    if count and name in findings.get(pillar, {}):
+                        findings[pillar][name] += count
+                        accounts_affected[pillar][name] += 1
+        return {
+            'accounts': {'with_results': len(latest), **statuses},
+            'findings': findings,
+            'accounts_with_findings': accounts_affected,
+        }
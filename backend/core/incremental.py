@@ -0,0 +1,264 @@
+# core/incremental.py
+import hashlib
+import json
+import threading
+import time
+
+# Per-resource checks evaluate each discovered resource independently, so a rescan only
+# needs to re-run them on resources that are new or whose inputs changed.
+#
+# A fingerprint covers the discovery record and the state the check evaluates: the
+# user's credential report row, the bucket configuration or the volume's latest snapshot.
+# A resource whose state could not be read is always re-evaluated. MAX_REUSE_AGE_SEC
+# bounds reuse anyway.
+#
+# Reading that state costs the same API calls as running the check, so for users, buckets
+# and volumes reuse only skips evaluation. Stack drift is fingerprinted from the listing
+# alone, so reuse there skips the per-stack drift detection calls (drift made outside
+# CloudFormation is therefore only noticed once MAX_REUSE_AGE_SEC has passed).
+MAX_REUSE_AGE_SEC = 24 * 3600
+# Default of compliance.check_iam_key_age's max_age_days.
+DEFAULT_MAX_KEY_AGE_DAYS = 90
+# Default of compliance.check_ebs_backups' backup_age_days.
+DEFAULT_BACKUP_AGE_DAYS = 7
+
+
+class ResourceCheckSpec:
+    """
+    Describes how a per-resource check maps onto discovered resources.
+
+    Args:
+        resource_key: The field identifying a resource in the discovery record (e.g. 'UserName').
+        fields: The discovery fields that make up the fingerprint.
+        finding_key: Callable returning the resource key of one finding item.
+        state: Optional callable taking (resource, check kwargs) and returning the evaluated
+            state of the resource to add to the fingerprint, or None if it is unknown.
+            Without it the discovery fields alone make up the fingerprint.
+        prepare: Optional callable taking (resources, check kwargs), run once before state
+            is read (e.g. to fetch every bucket's configuration concurrently).
+        final: Optional callable taking a finding item and returning False if the result
+            is not settled yet (e.g. a drift detection still pending). Such a resource is
+            not stored, so the next scan evaluates it again.
+    """
+    def __init__(self, resource_key, fields, finding_key, state=None, prepare=None, final=None):
+        self.resource_key = resource_key
+        self.fields = fields
+        self.finding_key = finding_key
+        self.state = state
+        self.prepare = prepare
+        self.final = final
+
+    @property
+    def saves_api_calls(self):
+        """Whether reusing a result skips the check's API calls, not just its evaluation."""
+        return self.state is None
+
+
+_USER_FIELDS = ['UserName', 'UserId', 'Arn', 'CreateDate', 'PasswordLastUsed']
+_BUCKET_FIELDS = ['Name', 'CreationDate', 'BucketRegion']
+_VOLUME_FIELDS = ['VolumeId', 'Size', 'CreateTime', 'Tags']
+# Not DriftInformation: its LastCheckTimestamp changes with every detection the check runs.
+_STACK_FIELDS = ['StackId', 'StackName', 'StackStatus', 'LastUpdatedTime']
+
+
+def _credential_record(user, kwargs):
+    report = kwargs.get('credential_report')
+    return report.get(user.get('UserName')) if report is not None else None
+
+
+def _mfa_state(user, kwargs):
+    record = _credential_record(user, kwargs)
+    return None if record is None else {'MfaActive': record['MfaActive']}
+
+
+def _key_age_state(user, kwargs):
+    # Includes which keys are past the age limit, so a key that ages past it is re-evaluated.
+    record = _credential_record(user, kwargs)
+    if record is None:
+        return None
+    max_age_days = kwargs.get('max_age_days', DEFAULT_MAX_KEY_AGE_DAYS)
+    return {
+        'ActiveAccessKeys': [[key['Slot'], key['LastRotated']] for key in record['ActiveAccessKeys']],
+        'Aged': [key['Slot'] for key in kwargs['credential_report'].access_keys_older_than(user['UserName'], max_age_days)],
+    }
+
+
+def _fetch_bucket_configs(buckets, kwargs):
+    if kwargs.get('bucket_configs') is not None:
+        kwargs['bucket_configs'].fetch(buckets)
+
+
+def _bucket_state(fields):
+    """Returns a state callable digesting the given BucketConfig fields."""
+    def state(bucket, kwargs):
+        snapshot = kwargs.get('bucket_configs')
+        config = snapshot.get(bucket.get('Name')) if snapshot is not None else None
+        if config is None or any(field in config.errors for field in fields):
+            return None
+        return {field: getattr(config, field) for field in fields}
+    return state
+
+
+def _backup_state(volume, kwargs):
+    snapshot_index = kwargs.get('snapshot_index')
+    if snapshot_index is None:
+        return None
+    # Includes whether that snapshot is still recent, so a backup that ages out is re-evaluated.
+    backup_age_days = kwargs.get('backup_age_days', DEFAULT_BACKUP_AGE_DAYS)
+    return {
+        'LatestSnapshot': snapshot_index.latest_snapshot_time(volume['VolumeId']),
+        'Recent': snapshot_index.has_recent_snapshot(volume['VolumeId'], backup_age_days),
+    }
+
+
+PER_RESOURCE_CHECKS = {
+    'users_without_mfa': ResourceCheckSpec('UserName', _USER_FIELDS, lambda item: item, _mfa_state),
+    'aged_iam_keys': ResourceCheckSpec('UserName', _USER_FIELDS, lambda item: item['UserName'], _key_age_state),
+    'public_s3_buckets': ResourceCheckSpec(
+        'Name', _BUCKET_FIELDS, lambda item: item['Bucket'],
+        _bucket_state(['acl_grants', 'policy_status', 'public_access_block']), prepare=_fetch_bucket_configs
+    ),
+    's3_buckets_without_lifecycle': ResourceCheckSpec(
+        'Name', _BUCKET_FIELDS, lambda item: item, _bucket_state(['lifecycle_rules']), prepare=_fetch_bucket_configs
+    ),
+    'ebs_volumes_without_backup': ResourceCheckSpec(
+        'VolumeId', _VOLUME_FIELDS, lambda item: item['VolumeId'], _backup_state
+    ),
+    'cloudformation_drift_status': ResourceCheckSpec(
+        'StackName', _STACK_FIELDS, lambda item: item['StackName'],
+        final=lambda item: item.get('DriftStatus') != 'DETECTION_PENDING'
+    ),
+}
+
+
+def fingerprint(resource, fields, state=None):
+    """Returns a stable hash of the given fields of a discovery record and of the resource's evaluated state."""
+    relevant = {field: resource.get(field) for field in fields}
+    relevant['_state'] = state
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class IncrementalScan:
+    """
+    Per-scan state for incremental evaluation of the checks in PER_RESOURCE_CHECKS.
+
+    The previous per-resource findings are read from the result store when a check first
+    runs. wrap() turns a check into one that only evaluates changed resources; the new
+    per-resource state is kept until save() writes it back after the scan. A regional
+    check keeps its state per region.
+
+    Args:
+        result_store: The ResultStore holding the per-resource state.
+        account_id: The scanned account (state is kept per account).
+        force_full: Re-evaluate every resource, ignoring stored state.
+        max_reuse_age_sec: How long a stored per-resource result may be reused.
+    """
+    def __init__(self, result_store, account_id, force_full=False, max_reuse_age_sec=MAX_REUSE_AGE_SEC):
+        self._store = result_store
+        self._account_id = account_id or ''
+        self.force_full = force_full
+        self._max_reuse_age_sec = max_reuse_age_sec
+        self._lock = threading.Lock()
+        self._new_state = {}
+        self._stats = {}
+
+    def wrap(self, check_name, check_function, region=None):
+        """
+        Returns a function with the same signature as check_function(resources, *args)
+        that re-runs the check only on new or changed resources and reuses the stored
+        findings of every other resource.
+
+        Args:
+            check_name: A check in PER_RESOURCE_CHECKS.
+            check_function: The check to wrap.
+            region: The region a regional check scans (None for a global check).
+        """
+        spec = PER_RESOURCE_CHECKS[check_name]
+        state_name = check_name if region is None else f"{check_name}@{region}"
+
+        def run(resources, *args, **kwargs):
+            return self._run(state_name, spec, check_function, list(resources), args, kwargs)
+
+        run.__name__ = check_function.__name__
+        return run
+
+    def _run(self, check_name, spec, check_function, resources, args, kwargs):
+        now = time.time()
+        previous = {} if self.force_full else self._store.load_resource_state(self._account_id, check_name)
+
+        if spec.prepare:
+            spec.prepare(resources, kwargs)
+        current = {}
+        changed = []
+        for resource in resources:
+            key = resource.get(spec.resource_key)
+            if key is None:
+                continue
+            state = spec.state(resource, kwargs) if spec.state else {}
+            current[key] = fingerprint(resource, spec.fields, state)
+            prior = previous.get(key)
+            if (prior is None or state is None or prior['fingerprint'] != current[key]
+                    or now - prior['evaluated_at'] > self._max_reuse_age_sec):
+                changed.append(resource)
+
+        result = check_function(changed, *args, **kwargs) if changed else []
+        if not isinstance(result, list):
+            # An error: report it and leave the stored state untouched.
+            return result
+
+        new_findings = {}
+        for item in result:
+            new_findings.setdefault(spec.finding_key(item), []).append(item)
+
+        changed_keys = {resource.get(spec.resource_key) for resource in changed}
+        state = {}
+        findings = []
+        for key, resource_fingerprint in current.items():
+            if key in changed_keys:
+                entry = {'fingerprint': resource_fingerprint, 'findings': new_findings.get(key, []),
+                         'evaluated_at': now}
+            else:
+                entry = previous[key]
+            findings.extend(entry['findings'])
+            if not spec.final or all(spec.final(item) for item in entry['findings']):
+                state[key] = entry
+
+        with self._lock:
+            self._new_state[check_name] = state
+            self._stats[check_name] = {'evaluated': len(changed_keys), 'reused': len(current) - len(changed_keys),
+                                       'saves_api_calls': spec.saves_api_calls}
+        return findings
+
+    def save(self):
+        """Persists the per-resource state of every check that completed."""
+        with self._lock:
+            new_state = dict(self._new_state)
+        for check_name, state in new_state.items():
+            self._store.save_resource_state(self._account_id, check_name, state)
+
+    def metadata(self):
+        """
+        Returns the reuse statistics for scan_metadata.
+
+        reuse_ratio counts every reused resource. api_call_reuse_ratio only counts those
+        of checks whose reuse skips API calls (see ResourceCheckSpec.saves_api_calls);
+        the other checks still read each resource's state and only skip evaluation.
+        """
+        with self._lock:
+            stats = {name: dict(counts) for name, counts in self._stats.items()}
+
+        def ratio(counts):
+            evaluated = sum(check['evaluated'] for check in counts)
+            reused = sum(check['reused'] for check in counts)
+            return round(reused / (evaluated + reused), 3) if evaluated + reused else 0.0
+
+        call_saving = [counts for counts in stats.values() if counts['saves_api_calls']]
+        return {
+            'forced_full': self.force_full,
+            'resources_evaluated': sum(counts['evaluated'] for counts in stats.values()),
+            'resources_reused': sum(counts['reused'] for counts in stats.values()),
+            'reuse_ratio': ratio(stats.values()),
+            'resources_reused_without_api_calls': sum(counts['reused'] for counts in call_saving),
+            'api_call_reuse_ratio': ratio(call_saving),
+            'checks': stats,
+        }
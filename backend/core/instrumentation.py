@@ -0,0 +1,346 @@
+# core/instrumentation.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the API call latency histogram buckets, as in Prometheus
+# client libraries. The last bucket (+Inf) is implicit.
+LATENCY_BUCKETS_SEC = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Directory a Chrome trace (chrome://tracing, Perfetto, speedscope) of every scan is
+# written to. Tracing is off when unset, since it keeps one event per API call in memory.
+SCAN_TRACE_DIR = os.environ.get('SCAN_TRACE_DIR')
+
+# Calls made outside any scan task (e.g. the account ID lookup) are attributed to this name.
+UNATTRIBUTED = '(scan)'
+
+_context = threading.local()
+
+
+class LatencyHistogram:
+    """A cumulative-bucket latency histogram with call, retry, error and byte counters. Not thread-safe."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_SEC) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.retries = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def observe(self, call):
+        for i, bound in enumerate(LATENCY_BUCKETS_SEC):
+            if call.duration <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+        self.count += 1
+        self.sum += call.duration
+        self.max = max(self.max, call.duration)
+        self.retries += call.retries
+        self.errors += 1 if call.error_code else 0
+        self.bytes_sent += call.bytes_sent
+        self.bytes_received += call.bytes_received
+
+    def quantile(self, q):
+        """Returns the upper bound of the bucket holding the q-quantile (max for the +Inf bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_SEC, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            'calls': self.count,
+            'retries': self.retries,
+            'errors': self.errors,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'total_sec': round(self.sum, 3),
+            'p50_sec': self.quantile(0.5),
+            'p95_sec': self.quantile(0.95),
+            'max_sec': round(self.max, 3),
+            'buckets': {
+                **{str(bound): count for bound, count in zip(LATENCY_BUCKETS_SEC, self.buckets)},
+                '+Inf': self.buckets[-1],
+            },
+        }
+
+
+class ApiCall:
+    """One AWS API call (all of its attempts), as recorded by CallRecorder."""
+    __slots__ = ('service', 'operation', 'task', 'started', 'duration', 'retries',
+                 'error_code', 'bytes_sent', 'bytes_received', 'thread_id')
+
+    def __init__(self, service, operation, task, started, duration, retries, error_code,
+                 bytes_sent, bytes_received, thread_id):
+        self.service = service
+        self.operation = operation
+        self.task = task
+        self.started = started
+        self.duration = duration
+        self.retries = retries
+        self.error_code = error_code
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+        self.thread_id = thread_id
+
+
+class ScanProfile:
+    """
+    The API calls of one scan, aggregated into latency histograms per check (scan task)
+    and per operation.
+
+    Calls are attributed to the profile and task bound to the calling thread (see task()
+    and bind()). With trace=True every call and task span is also kept for write_trace().
+    """
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._by_task = {}
+        self._by_operation = {}
+        self._calls = []
+        self._spans = []
+
+    def record(self, call):
+        with self._lock:
+            self._by_task.setdefault(call.task or UNATTRIBUTED, LatencyHistogram()).observe(call)
+            self._by_operation.setdefault(f"{call.service}.{call.operation}", LatencyHistogram()).observe(call)
+            if self.trace:
+                self._calls.append(call)
+
+    @contextmanager
+    def task(self, name):
+        """Attributes the AWS calls made by the current thread to a scan task while active."""
+        previous = getattr(_context, 'binding', None)
+        _context.binding = (self, name)
+        started = time.time()
+        try:
+            yield
+        finally:
+            _context.binding = previous
+            if self.trace:
+                with self._lock:
+                    self._spans.append((name, started, time.time(), threading.get_ident()))
+
+    def as_dict(self):
+        """Returns {'checks': {task: histogram}, 'operations': {'service.Operation': histogram}}."""
+        with self._lock:
+            return {
+                'checks': {name: histogram.as_dict() for name, histogram in sorted(self._by_task.items())},
+                'operations': {name: histogram.as_dict() for name, histogram in sorted(self._by_operation.items())},
+            }
+
+    def write_trace(self, path):
+        """
+        Writes the scan's task spans and API calls as a Chrome trace (Trace Event Format).
+        Each worker thread is a row: task spans with the API calls they made nested under them.
+        """
+        with self._lock:
+            spans = list(self._spans)
+            calls = list(self._calls)
+        events = [{
+            'name': name, 'cat': 'task', 'ph': 'X', 'pid': 1, 'tid': thread_id,
+            'ts': round((started - self.started) * 1e6), 'dur': round((finished - started) * 1e6),
+        } for name, started, finished, thread_id in spans]
+        events += [{
+            'name': f"{call.service}.{call.operation}", 'cat': 'aws', 'ph': 'X', 'pid': 1, 'tid': call.thread_id,
+            'ts': round((call.started - self.started) * 1e6), 'dur': round(call.duration * 1e6),
+            'args': {'task': call.task, 'retries': call.retries, 'error': call.error_code,
+                     'bytes_sent': call.bytes_sent, 'bytes_received': call.bytes_received},
+        } for call in calls]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def bind(func):
+    """
+    Wraps func so that it runs with the calling thread's profile and task binding, for
+    work a check hands to its own thread pool.
+    """
+    binding = getattr(_context, 'binding', None)
+    if binding is None:
+        return func
+
+    def bound(*args, **kwargs):
+        previous = getattr(_context, 'binding', None)
+        _context.binding = binding
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _context.binding = previous
+    return bound
+
+
+class ApiMetrics:
+    """Process-wide AWS API call histograms per (service, operation) and per check, for /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_operation = {}
+        self._by_check = {}
+        self._errors = {}
+
+    def record(self, call):
+        with self._lock:
+            self._by_operation.setdefault((call.service, call.operation), LatencyHistogram()).observe(call)
+            self._by_check.setdefault(call.task or UNATTRIBUTED, LatencyHistogram()).observe(call)
+            if call.error_code:
+                key = (call.service, call.operation, call.error_code)
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def render_prometheus(self):
+        """Returns the metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            by_operation = {key: _snapshot(histogram) for key, histogram in self._by_operation.items()}
+            by_check = {key: _snapshot(histogram) for key, histogram in self._by_check.items()}
+            errors = dict(self._errors)
+
+        lines = [
+            '# HELP cloudguard_aws_api_call_duration_seconds Latency of AWS API calls, including retries.',
+            '# TYPE cloudguard_aws_api_call_duration_seconds histogram',
+        ]
+        for (service, operation), histogram in sorted(by_operation.items()):
+            labels = f'service="{_escape(service)}",operation="{_escape(operation)}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS_SEC + ('+Inf',), histogram['buckets']):
+                cumulative += count
+                lines.append(f'cloudguard_aws_api_call_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"cloudguard_aws_api_call_duration_seconds_sum{{{labels}}} {histogram['sum']}")
+            lines.append(f"cloudguard_aws_api_call_duration_seconds_count{{{labels}}} {histogram['count']}")
+
+        counters = [
+            ('cloudguard_aws_api_retries_total', 'Retried attempts of AWS API calls.', 'retries'),
+            ('cloudguard_aws_api_request_bytes_total', 'Bytes sent in AWS API requests.', 'bytes_sent'),
+            ('cloudguard_aws_api_response_bytes_total', 'Bytes received in AWS API responses.', 'bytes_received'),
+        ]
+        for metric, description, field in counters:
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+            for (service, operation), histogram in sorted(by_operation.items()):
+                lines.append(f'{metric}{{service="{_escape(service)}",operation="{_escape(operation)}"}} {histogram[field]}')
+
+        lines += ['# HELP cloudguard_aws_api_errors_total AWS API calls that failed, by error code.',
+                  '# TYPE cloudguard_aws_api_errors_total counter']
+        for (service, operation, code), count in sorted(errors.items()):
+            lines.append(f'cloudguard_aws_api_errors_total{{service="{_escape(service)}",'
+                         f'operation="{_escape(operation)}",code="{_escape(code)}"}} {count}')
+
+        lines += ['# HELP cloudguard_check_aws_api_calls_total AWS API calls made by each check.',
+                  '# TYPE cloudguard_check_aws_api_calls_total counter']
+        lines += [f'cloudguard_check_aws_api_calls_total{{check="{_escape(check)}"}} {histogram["count"]}'
+                  for check, histogram in sorted(by_check.items())]
+        lines += ['# HELP cloudguard_check_aws_api_seconds_total Time spent in AWS API calls by each check.',
+                  '# TYPE cloudguard_check_aws_api_seconds_total counter']
+        lines += [f'cloudguard_check_aws_api_seconds_total{{check="{_escape(check)}"}} {histogram["sum"]}'
+                  for check, histogram in sorted(by_check.items())]
+        return '\n'.join(lines) + '\n'
+
+
+def _snapshot(histogram):
+    return {'buckets': list(histogram.buckets), 'count': histogram.count, 'sum': round(histogram.sum, 6),
+            'retries': histogram.retries, 'bytes_sent': histogram.bytes_sent,
+            'bytes_received': histogram.bytes_received}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+api_metrics = ApiMetrics()
+
+
+class CallRecorder:
+    """
+    Records the latency, retries, bytes and error code of every call of a botocore
+    client through its event hooks, into the process-wide api_metrics and the ScanProfile
+    bound to the calling thread (if any):
+
+    - before-call: note the start time and the profile and task of the calling thread.
+    - request-created (once per attempt): add up the bytes sent.
+    - after-call / after-call-error: record the call. The retry count and the error code
+      come from the parsed response (or the exception when no response was received).
+    """
+    _CALL = 'cloudguard_instrumented_call'
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics or api_metrics
+
+    def _before_call(self, model, context, **kwargs):
+        context[self._CALL] = {
+            'started': time.time(),
+            'binding': getattr(_context, 'binding', None),
+            'bytes_sent': 0,
+        }
+
+    def _request_created(self, request, **kwargs):
+        call = request.context.get(self._CALL)
+        if call is not None and request.body:
+            call['bytes_sent'] += len(request.body) if isinstance(request.body, (bytes, str)) else 0
+
+    def _record(self, model, context, retries, error_code, bytes_received):
+        call = context.pop(self._CALL, None)
+        if call is None:
+            return
+        profile, task = call['binding'] or (None, None)
+        record = ApiCall(
+            service=model.service_model.service_name, operation=model.name, task=task,
+            started=call['started'], duration=time.time() - call['started'], retries=retries,
+            error_code=error_code, bytes_sent=call['bytes_sent'], bytes_received=bytes_received,
+            thread_id=threading.get_ident(),
+        )
+        self.metrics.record(record)
+        if profile is not None:
+            profile.record(record)
+
+    @staticmethod
+    def _bytes_received(http_response):
+        # From the Content-Length header only: reading the body would consume it before the
+        # caller of a streaming operation (e.g. s3.get_object) gets it.
+        headers = getattr(http_response, 'headers', None) or {}
+        try:
+            return int(headers.get('Content-Length', 0))
+        except (TypeError, ValueError):
+            return 0
+
+    def _after_call(self, model, context, http_response=None, parsed=None, **kwargs):
+        parsed = parsed or {}
+        self._record(
+            model, context,
+            retries=parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0),
+            error_code=parsed.get('Error', {}).get('Code'),
+            bytes_received=self._bytes_received(http_response),
+        )
+
+    def _after_call_error(self, model, context, exception=None, **kwargs):
+        self._record(
+            model, context,
+            retries=max(0, context.get('retries', {}).get('attempt', 1) - 1),
+            error_code=type(exception).__name__ if exception is not None else 'Error',
+            bytes_received=0,
+        )
+
+    def attach(self, client):
+        events = client.meta.events
+        events.register('before-call', self._before_call)
+        events.register('request-created', self._request_created)
+        events.register('after-call', self._after_call)
+        events.register('after-call-error', self._after_call_error)
+
+
+def trace_path(account_id, started, trace_dir=None):
+    """Returns the Chrome trace file of a scan in trace_dir (SCAN_TRACE_DIR by default), or None if tracing is off."""
+    trace_dir = trace_dir or SCAN_TRACE_DIR
+    if not trace_dir:
+        return None
+    return os.path.join(trace_dir, f"scan-{account_id or 'unknown'}-{int(started * 1000)}.json")
@@ -0,0 +1,324 @@
+# core/inventory.py
+import gzip
+import json
+from operator import itemgetter
+
+import pandas as pd
+
+from core import discovery
+from core.findings import tag_map
+from core.regions import regional_session
+
+# pyarrow backs the Arrow and Parquet formats. Without it inventories can only be written
+# as gzip JSON Lines.
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Resources are buffered per column and written in record batches of this many rows, so an
+# export holds at most one batch of values no matter how large the account is.
+BATCH_ROWS = 65536
+
+_encode_json = json.JSONEncoder(separators=(',', ':')).encode
+
+ARROW = 'arrow'
+PARQUET = 'parquet'
+JSONL = 'jsonl.gz'
+# File suffix of each format. Arrow IPC files are uncompressed and memory-mapped when
+# loaded; Parquet (zstd) is the smallest on disk; gzip JSON Lines needs nothing but pandas.
+FORMAT_SUFFIXES = {ARROW: ('.arrow', '.feather'), PARQUET: ('.parquet',), JSONL: ('.jsonl.gz',)}
+
+# One row per resource. 'kind' is the instance type, volume type, DB instance class, VPC
+# CIDR block or user path; 'size' is the volume size or allocated storage in GiB; 'tags'
+# maps tag keys to values (an Arrow map, queryable with pyarrow.compute.map_lookup).
+# Columns marked True repeat a small set of values and are dictionary-encoded.
+INVENTORY_COLUMNS = (
+    ('resource_type', True),
+    ('region', True),
+    ('resource_id', False),
+    ('name', False),
+    ('arn', False),
+    ('state', True),
+    ('vpc_id', True),
+    ('kind', True),
+    ('size', False),
+    ('created_at', False),
+    ('tags', False),
+)
+
+
+def _ec2_instance(item):
+    tags = tag_map(item.get('Tags'))
+    return (item['InstanceId'], tags.get('Name'), None, item.get('State', {}).get('Name'), item.get('VpcId'),
+            item.get('InstanceType'), None, item.get('LaunchTime'), tags)
+
+def _ebs_volume(item):
+    tags = tag_map(item.get('Tags'))
+    return (item['VolumeId'], tags.get('Name'), None, item.get('State'), None,
+            item.get('VolumeType'), item.get('Size'), item.get('CreateTime'), tags)
+
+def _rds_instance(item):
+    tags = tag_map(item.get('TagList'))
+    return (item['DBInstanceIdentifier'], item.get('DBName'), item.get('DBInstanceArn'), item.get('DBInstanceStatus'),
+            (item.get('DBSubnetGroup') or {}).get('VpcId'), item.get('DBInstanceClass'), item.get('AllocatedStorage'),
+            item.get('InstanceCreateTime'), tags)
+
+def _security_group(item):
+    return (item['GroupId'], item.get('GroupName'), item.get('SecurityGroupArn'), None, item.get('VpcId'),
+            None, None, None, tag_map(item.get('Tags')))
+
+def _vpc(item):
+    tags = tag_map(item.get('Tags'))
+    return (item['VpcId'], tags.get('Name'), None, item.get('State'), item['VpcId'],
+            item.get('CidrBlock'), None, None, tags)
+
+def _cloudformation_stack(item):
+    return (item['StackName'], item['StackName'], item.get('StackId'), item.get('StackStatus'), None,
+            None, None, item.get('CreationTime'), {})
+
+def _s3_bucket(item):
+    return (item['Name'], item['Name'], f"arn:aws:s3:::{item['Name']}", None, None,
+            None, None, item.get('CreationDate'), {})
+
+def _iam_user(item):
+    return (item['UserName'], item['UserName'], item.get('Arn'), None, None,
+            item.get('Path'), None, item.get('CreateDate'), tag_map(item.get('Tags')))
+
+# resource_type: (discovery generator, global or regional, row extractor). Extractors
+# return the values of every column after 'region', in INVENTORY_COLUMNS order.
+RESOURCE_TYPES = {
+    'iam_user': (discovery.iter_iam_users, 'global', _iam_user),
+    's3_bucket': (discovery.iter_s3_buckets, 'global', _s3_bucket),
+    'vpc': (discovery.iter_vpcs, 'regional', _vpc),
+    'security_group': (discovery.iter_security_groups, 'regional', _security_group),
+    'ec2_instance': (discovery.iter_ec2_instances, 'regional', _ec2_instance),
+    'ebs_volume': (discovery.iter_ebs_volumes, 'regional', _ebs_volume),
+    'rds_instance': (discovery.iter_rds_instances, 'regional', _rds_instance),
+    'cloudformation_stack': (discovery.iter_cloudformation_stacks, 'regional', _cloudformation_stack),
+}
+
+
+def inventory_format(path):
+    """Returns the format of an inventory file from its suffix. Raises ValueError for unknown suffixes."""
+    for name, suffixes in FORMAT_SUFFIXES.items():
+        if path.endswith(suffixes):
+            return name
+    raise ValueError(f"Unknown inventory format: {path} (expected one of "
+                     f"{', '.join(s for suffixes in FORMAT_SUFFIXES.values() for s in suffixes)})")
+
+
+def default_inventory_path(basename='inventory'):
+    """Returns basename with the suffix of the best format available: Arrow, or gzip JSON Lines without pyarrow."""
+    return basename + FORMAT_SUFFIXES[ARROW if pa is not None else JSONL][0]
+
+
+def _arrow_schema():
+    fields = []
+    for name, dictionary in INVENTORY_COLUMNS:
+        if dictionary:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        elif name == 'size':
+            fields.append(pa.field(name, pa.int64()))
+        elif name == 'created_at':
+            fields.append(pa.field(name, pa.timestamp('ms', tz='UTC')))
+        elif name == 'tags':
+            fields.append(pa.field(name, pa.map_(pa.string(), pa.string())))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+class InventoryWriter:
+    """
+    Writes resources to an inventory file one row at a time.
+
+    Only the extracted column values are kept, in per-column buffers that are flushed every
+    BATCH_ROWS rows, so the boto3 response dicts can be dropped as soon as they are added.
+    Dictionary-encoded columns keep one code table for the whole file: every batch writes
+    just the values that are new since the previous one (an Arrow dictionary delta).
+
+    Args:
+        path: The file to write. Its suffix selects the format (see FORMAT_SUFFIXES).
+        batch_rows: Rows per record batch.
+
+    Raises:
+        ValueError: If the suffix is not a known format.
+        ImportError: If the format needs pyarrow and it is not installed.
+    """
+    def __init__(self, path, batch_rows=BATCH_ROWS):
+        self.path = path
+        self.format = inventory_format(path)
+        if self.format != JSONL and pa is None:
+            raise ImportError(f"Writing {self.format} inventories requires pyarrow; use a {JSONL} file instead")
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._rows = []
+        # Per dictionary-encoded column: {value: code} (None stays null) and the values in code order.
+        # Every dictionary starts with '': an Arrow file only takes a later dictionary as a delta of a
+        # non-empty one, so a column that is all null in the first batch (e.g. vpc_id while the IAM
+        # users are written) would otherwise fail the write on its first value.
+        self._dictionaries = [({None: None, '': 0}, ['']) if dictionary else None
+                              for _, dictionary in INVENTORY_COLUMNS]
+        if self.format == JSONL:
+            self._schema = None
+            # Level 1: a few times faster than the default for about 10% more bytes.
+            self._sink = gzip.open(path, 'wt', compresslevel=1)
+        elif self.format == PARQUET:
+            self._schema = _arrow_schema()
+            self._sink = pq.ParquetWriter(path, self._schema, compression='zstd')
+        else:
+            self._schema = _arrow_schema()
+            self._sink = pa.ipc.new_file(path, self._schema,
+                                         options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+    def add(self, resource_type, region, item):
+        """Adds one resource, as returned by the discovery module, to the inventory."""
+        self._rows.append((resource_type, region) + RESOURCE_TYPES[resource_type][2](item))
+        self.rows += 1
+        if len(self._rows) >= self.batch_rows:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        if self.format == JSONL:
+            self._write_jsonl()
+        else:
+            self._sink.write_batch(self._record_batch())
+        self._rows = []
+
+    def _record_batch(self):
+        # Rows are turned into columns and encoded a whole batch at a time, at C speed where possible.
+        arrays = []
+        columns = [list(map(itemgetter(index), self._rows)) for index in range(len(INVENTORY_COLUMNS))]
+        for (name, _), column, dictionary, field in zip(INVENTORY_COLUMNS, columns, self._dictionaries, self._schema):
+            if dictionary is not None:
+                codes, values = dictionary
+                for value in set(column).difference(codes):
+                    codes[value] = len(values)
+                    values.append(value)
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(list(map(codes.__getitem__, column)), pa.int32()), pa.array(values, pa.string())
+                ))
+            elif name == 'tags':
+                arrays.append(pa.array([tags or None for tags in column], field.type))
+            else:
+                arrays.append(pa.array(column, field.type))
+        return pa.record_batch(arrays, schema=self._schema)
+
+    def _write_jsonl(self):
+        names = [name for name, _ in INVENTORY_COLUMNS]
+        lines = []
+        for row in self._rows:
+            record = {name: value for name, value in zip(names, row) if value is not None}
+            if 'created_at' in record:
+                record['created_at'] = record['created_at'].isoformat()
+            if not record.get('tags'):
+                record.pop('tags', None)
+            lines.append(_encode_json(record))
+        lines.append('')
+        self._sink.write('\n'.join(lines))
+
+    def close(self):
+        """Writes the buffered rows and closes the file."""
+        self._flush()
+        self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_resources(session, regions=None, resource_types=None):
+    """
+    Yields (resource_type, region, item) for every discovered resource, one page at a time.
+
+    Args:
+        session: The session to discover with.
+        regions: Regions to list regional resources in. Defaults to the session's region.
+        resource_types: Optional subset of RESOURCE_TYPES to list.
+    """
+    selected = [name for name in RESOURCE_TYPES if resource_types is None or name in resource_types]
+    for resource_type in selected:
+        iterate, scope, _ = RESOURCE_TYPES[resource_type]
+        if scope == 'global':
+            for item in iterate(session):
+                # list_buckets reports each bucket's region in BucketRegion.
+                yield resource_type, item.get('BucketRegion'), item
+    for region in regions or [session.region_name]:
+        region_session = session if region == session.region_name else regional_session(session, region)
+        for resource_type in selected:
+            iterate, scope, _ = RESOURCE_TYPES[resource_type]
+            if scope == 'regional':
+                for item in iterate(region_session):
+                    yield resource_type, region, item
+
+
+def write_inventory(resources, path, batch_rows=BATCH_ROWS):
+    """
+    Writes (resource_type, region, item) tuples, e.g. from iter_resources, to an inventory file.
+
+    Returns:
+        A dictionary with the file, its format and the number of resources per type.
+    """
+    counts = {}
+    with InventoryWriter(path, batch_rows) as writer:
+        for resource_type, region, item in resources:
+            writer.add(resource_type, region, item)
+            counts[resource_type] = counts.get(resource_type, 0) + 1
+    return {"file": path, "format": writer.format, "resources": counts}
+
+
+def open_inventory(path, columns=None):
+    """
+    Opens an Arrow or Parquet inventory as a pyarrow Table.
+
+    Arrow files are memory-mapped: the table reads straight from the page cache and loading
+    takes about the same time at any size. Parquet files are decompressed into memory.
+    """
+    if pa is None:
+        raise ImportError("Opening an Arrow or Parquet inventory requires pyarrow")
+    if inventory_format(path) == PARQUET:
+        return pq.read_table(path, columns=columns, memory_map=True)
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return table.select(columns) if columns else table
+
+
+def query_inventory(path, resource_type=None, region=None, columns=None):
+    """
+    Returns the inventory rows of one resource type and/or region as a pandas DataFrame,
+    with tags as dictionaries whatever the format.
+
+    Arrow and Parquet rows are filtered before they are converted, so only the matching
+    rows are copied out of the file. gzip JSON Lines files are read in chunks.
+    """
+    columns = columns or [name for name, _ in INVENTORY_COLUMNS]
+    filters = {'resource_type': resource_type, 'region': region}
+    if inventory_format(path) == JSONL:
+        frames = []
+        for chunk in pd.read_json(path, lines=True, chunksize=BATCH_ROWS, compression='gzip'):
+            # Keys left out of every line of a chunk (e.g. 'tags') come back as missing columns.
+            chunk = chunk.reindex(columns=[name for name, _ in INVENTORY_COLUMNS])
+            for name, value in filters.items():
+                if value is not None:
+                    chunk = chunk[chunk[name] == value]
+            frames.append(chunk[columns])
+        frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+        if 'size' in frame:
+            frame['size'] = frame['size'].astype('Int64')
+        return frame
+
+    table = open_inventory(path)
+    for name, value in filters.items():
+        if value is not None:
+            table = table.filter(pc.equal(table[name].cast(pa.string()), value))
+    frame = table.select(columns).to_pandas()
+    if 'tags' in frame:
+        # Arrow maps convert to lists of (key, value) pairs.
+        frame['tags'] = frame['tags'].map(dict, na_action='ignore')
+    return frame
@@ -0,0 +1,163 @@
+# core/jobs.py
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from core.streaming import ScanEventLog
+
+# Scans running at the same time, and scans allowed to wait for a free worker. Requests
+# beyond that are rejected instead of piling up behind many-minute scans.
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_JOB_QUEUE_SIZE = 8
+# Finished jobs are kept (for status polling) for this long.
+FINISHED_JOB_RETENTION_SEC = 3600
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class JobQueueFull(Exception):
+    """Raised when a scan job cannot be queued because the queue is full."""
+
+
+class ScanProgress:
+    """
+    Thread-safe counter of planned and finished scan tasks, updated by the orchestrator,
+    and the job's ScanEventLog of check results for streaming clients.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.events = ScanEventLog()
+        self.total = 0
+        self.completed = 0
+        self.last_task = None
+
+    def plan(self, task_count):
+        with self._lock:
+            self.total += task_count
+
+    def task_done(self, name, timing):
+        with self._lock:
+            self.completed += 1
+            self.last_task = name
+
+    def as_dict(self):
+        with self._lock:
+            percent = round(100 * self.completed / self.total, 1) if self.total else 0.0
+            return {'completed_tasks': self.completed, 'total_tasks': self.total,
+                    'percent': percent, 'last_task': self.last_task}
+
+
+class ScanJobManager:
+    """
+    Runs scans as background jobs on a bounded executor.
+
+    A job is identified by its scope (e.g. 'all_findings:us-east-1') and its kind of scan
+    (the 'full' and 'refresh' options). Submitting a scope that already has a queued or
+    running job of the same kind returns that job instead of starting a duplicate scan; a
+    forced full scan never joins a partial refresh, nor the other way round.
+
+    Args:
+        run_job: Callable invoked as run_job(scope, progress, **options) in a worker thread.
+            It performs the scan and returns the stored scan ID.
+        max_workers: How many scans run at the same time.
+        queue_size: How many further scans may wait for a worker.
+    """
+    def __init__(self, run_job, max_workers=DEFAULT_JOB_WORKERS, queue_size=DEFAULT_JOB_QUEUE_SIZE):
+        self._run_job = run_job
+        self._capacity = max_workers + queue_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scan-job')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active_by_key = {}
+        self._done_events = {}
+
+    @staticmethod
+    def _job_key(scope, options):
+        return scope, bool(options.get('full')), bool(options.get('refresh'))
+
+    def submit(self, scope, **options):
+        """
+        Starts a scan job for a scope, or returns the job of the same kind already active for it.
+
+        Returns:
+            A tuple (job, created) where created is False when the request was coalesced.
+
+        Raises:
+            JobQueueFull: If max_workers + queue_size jobs are already active.
+        """
+        with self._lock:
+            self._prune()
+            key = self._job_key(scope, options)
+            active_id = self._active_by_key.get(key)
+            if active_id is not None:
+                return self._view(self._jobs[active_id]), False
+            if len(self._active_by_key) >= self._capacity:
+                raise JobQueueFull(f"{len(self._active_by_key)} scan jobs are already queued or running")
+
+            job_id = str(uuid.uuid4())
+            job = {
+                'job_id': job_id,
+                'scope': scope,
+                'status': 'queued',
+                'submitted_at': time.time(),
+                'progress': ScanProgress(),
+            }
+            self._jobs[job_id] = job
+            self._active_by_key[key] = job_id
+            self._done_events[job_id] = threading.Event()
+        self._executor.submit(self._run, job, options)
+        return self._view(job), True
+
+    def _run(self, job, options):
+        with self._lock:
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+        try:
+            scan_id = self._run_job(job['scope'], job['progress'], **options)
+            fields = {'status': 'complete', 'scan_id': scan_id}
+        except Exception as e:
+            print(f"Scan job {job['job_id']} ({job['scope']}) failed: {e}")
+            print(traceback.format_exc())
+            fields = {'status': 'failed', 'error': str(e)}
+        # No-op if run_job already ended the log with its summary.
+        job['progress'].events.finish(scan_id=fields.get('scan_id'), error=fields.get('error'))
+        with self._lock:
+            job.update(fields)
+            job['finished_at'] = time.time()
+            self._active_by_key.pop(self._job_key(job['scope'], options), None)
+            self._done_events.pop(job['job_id']).set()
+
+    def _prune(self):
+        cutoff = time.time() - FINISHED_JOB_RETENTION_SEC
+        for job_id in [j for j, job in self._jobs.items()
+                       if job['status'] not in ACTIVE_STATUSES and job['finished_at'] < cutoff]:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _view(job):
+        view = {k: v for k, v in job.items() if k != 'progress'}
+        view['progress'] = job['progress'].as_dict()
+        return view
+
+    def get(self, job_id):
+        """Returns the status of a job, or None if it is unknown (or pruned)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._view(job) if job is not None else None
+
+    def events(self, job_id):
+        """Returns the ScanEventLog of a job, or None if the job is unknown (or pruned)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job['progress'].events if job is not None else None
+
+    def wait(self, job_id, timeout=None):
+        """Blocks until a job finishes (or timeout passes) and returns its status."""
+        with self._lock:
+            event = self._done_events.get(job_id)
+        if event is not None:
+            event.wait(timeout)
+        return self.get(job_id)
@@ -0,0 +1,167 @@
+# core/metrics.py
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from core.client_pool import get_client
+
+# GetMetricData accepts at most 500 queries per request.
+MAX_QUERIES_PER_REQUEST = 500
+# Datapoints cached per process, by (account, region, query, period, time range). Oldest
+# entries are evicted first.
+MAX_CACHED_QUERIES = 200_000
+
+
+class MetricQuery:
+    """
+    One CloudWatch metric of one resource, e.g. NetworkOut of an instance.
+
+    Args:
+        namespace: e.g. 'AWS/EC2'.
+        metric_name: e.g. 'NetworkOut'.
+        dimensions: A dict (or pairs) of dimension name to value, e.g. {'InstanceId': 'i-123'}.
+        stat: The statistic, e.g. 'Sum', 'Average', 'Maximum'.
+    """
+    __slots__ = ('namespace', 'metric_name', 'dimensions', 'stat')
+
+    def __init__(self, namespace, metric_name, dimensions=(), stat='Sum'):
+        self.namespace = namespace
+        self.metric_name = metric_name
+        self.dimensions = tuple(sorted(dict(dimensions).items()))
+        self.stat = stat
+
+    def _key(self):
+        return (self.namespace, self.metric_name, self.dimensions, self.stat)
+
+    def __eq__(self, other):
+        return isinstance(other, MetricQuery) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"MetricQuery({self.namespace}/{self.metric_name}, {dict(self.dimensions)}, {self.stat})"
+
+    def as_metric_stat(self, period):
+        return {
+            'Metric': {
+                'Namespace': self.namespace,
+                'MetricName': self.metric_name,
+                'Dimensions': [{'Name': name, 'Value': value} for name, value in self.dimensions],
+            },
+            'Period': period,
+            'Stat': self.stat,
+        }
+
+
+def load_balancer_dimension(load_balancer_arn):
+    """Returns the CloudWatch 'LoadBalancer' dimension value (e.g. 'app/name/id') of an ELBv2 ARN."""
+    return load_balancer_arn.split(':loadbalancer/', 1)[-1]
+
+
+def metric_window(days=None, hours=None, period=3600, now=None):
+    """
+    Returns (start, end) for the last days/hours, with the end rounded down to a multiple
+    of period. Aligned windows make repeated requests within a period hit the cache.
+    """
+    now = now or datetime.now(timezone.utc)
+    period_start = int(now.timestamp()) // period * period
+    end = datetime.fromtimestamp(period_start, tz=timezone.utc)
+    return end - timedelta(days=days or 0, hours=hours or 0), end
+
+
+class _DatapointCache:
+    """A thread-safe, size-bounded LRU of datapoints."""
+
+    def __init__(self, max_entries=MAX_CACHED_QUERIES):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+_default_cache = _DatapointCache()
+
+
+class MetricFetcher:
+    """
+    Fetches many metrics with as few GetMetricData requests as possible: queries not in
+    the cache are sent 500 at a time, and every request follows NextToken until all of
+    its datapoints have arrived.
+
+    Args:
+        session: Optional session; its region's CloudWatch is queried (pooled client otherwise).
+        cache: A datapoint cache (the process-wide cache by default).
+    """
+    def __init__(self, session=None, cache=None):
+        self._cloudwatch = session.client('cloudwatch') if session is not None else get_client('cloudwatch')
+        # Identical queries against another account or region are different metrics.
+        self._scope = (getattr(session, 'role_arn', None), self._cloudwatch.meta.region_name)
+        self._cache = cache or _default_cache
+        self.requests_made = 0
+
+    def fetch(self, queries, start, end, period=3600):
+        """
+        Returns {query: ((timestamp, value), ...)} (oldest first) for every query. A query
+        without datapoints maps to an empty tuple.
+
+        Raises:
+            ClientError: If a GetMetricData request fails.
+        """
+        results = {}
+        missing = []
+        for query in dict.fromkeys(queries):
+            cached = self._cache.get((self._scope, query, period, start, end))
+            if cached is not None:
+                results[query] = cached
+            else:
+                missing.append(query)
+
+        for offset in range(0, len(missing), MAX_QUERIES_PER_REQUEST):
+            batch = missing[offset:offset + MAX_QUERIES_PER_REQUEST]
+            for query, datapoints in self._fetch_batch(batch, start, end, period).items():
+                self._cache.put((self._scope, query, period, start, end), datapoints)
+                results[query] = datapoints
+        return results
+
+    def _fetch_batch(self, batch, start, end, period):
+        by_id = {f"m{i}": query for i, query in enumerate(batch)}
+        datapoints = {query: [] for query in batch}
+        request = {
+            'MetricDataQueries': [
+                {'Id': query_id, 'MetricStat': query.as_metric_stat(period), 'ReturnData': True}
+                for query_id, query in by_id.items()
+            ],
+            'StartTime': start,
+            'EndTime': end,
+            'ScanBy': 'TimestampAscending',
+        }
+        while True:
+            response = self._cloudwatch.get_metric_data(**request)
+            self.requests_made += 1
+            for result in response.get('MetricDataResults', []):
+                datapoints[by_id[result['Id']]].extend(zip(result.get('Timestamps', []), result.get('Values', [])))
+            if not response.get('NextToken'):
+                break
+            request['NextToken'] = response['NextToken']
+        return {query: tuple(sorted(values, key=lambda point: point[0])) for query, values in datapoints.items()}
+
+    def aggregate(self, queries, start, end, period=3600, how=sum):
+        """Returns {query: how(values)} (None for queries without datapoints), e.g. totals or maxima."""
+        return {
+            query: how([value for _, value in points]) if points else None
+            for query, points in self.fetch(queries, start, end, period).items()
+        }
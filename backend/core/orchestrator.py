@@ -0,0 +1,169 @@
+# core/orchestrator.py
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Most of a scan is spent waiting on AWS round-trips, so a small thread pool
+# is enough to overlap independent discovery calls and checks.
+DEFAULT_MAX_WORKERS = 8
+
+
+class ScanTask:
+    """
+    A single unit of scan work (a discovery call or a check).
+
+    Args:
+        name: Unique task name. Check names double as the finding keys in the API response.
+        func: The callable to run.
+        inputs: Names of the tasks whose results are passed to func, in order.
+        args: Extra positional arguments appended after the inputs (e.g. a session).
+        kwarg_inputs: Optional {parameter name: task name} of task results passed as keywords.
+    """
+    def __init__(self, name, func, inputs=(), args=(), kwarg_inputs=None):
+        self.name = name
+        self.func = func
+        self.positional_inputs = list(inputs)
+        self.args = tuple(args)
+        self.kwarg_inputs = dict(kwarg_inputs or {})
+        # Every task this one waits for, positional or keyword.
+        self.inputs = self.positional_inputs + [dep for dep in self.kwarg_inputs.values()
+                                                if dep not in self.positional_inputs]
+
+    def __repr__(self):
+        return f"ScanTask({self.name!r}, inputs={self.inputs!r})"
+
+
+def _validate_graph(tasks):
+    """Raises ValueError for duplicate names, unknown inputs or dependency cycles."""
+    by_name = {}
+    for task in tasks:
+        if task.name in by_name:
+            raise ValueError(f"Duplicate scan task name: {task.name}")
+        by_name[task.name] = task
+
+    for task in tasks:
+        for dep in task.inputs:
+            if dep not in by_name:
+                raise ValueError(f"Task {task.name} depends on unknown task {dep}")
+
+    # Kahn's algorithm: if we cannot order every task, there is a cycle.
+    remaining = {t.name: len(t.inputs) for t in tasks}
+    dependents = {t.name: [] for t in tasks}
+    for task in tasks:
+        for dep in task.inputs:
+            dependents[dep].append(task.name)
+    ready = [name for name, count in remaining.items() if count == 0]
+    ordered = 0
+    while ready:
+        name = ready.pop()
+        ordered += 1
+        for child in dependents[name]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                ready.append(child)
+    if ordered != len(tasks):
+        raise ValueError("Scan task graph contains a dependency cycle")
+    return by_name, dependents
+
+
+def _timed_call(task, args, kwargs, profile=None):
+    """Runs a task and returns (result, error, started, finished) without raising."""
+    started = time.time()
+    try:
+        if profile is None:
+            result = task.func(*args, **kwargs)
+        else:
+            with profile.task(task.name):
+                result = task.func(*args, **kwargs)
+        return result, None, started, time.time()
+    except Exception as e:
+        print(f"Error running check {task.name}: {e}")
+        print(traceback.format_exc())
+        return None, e, started, time.time()
+
+
+def run_task_graph(tasks, max_workers=DEFAULT_MAX_WORKERS, on_task_done=None, deadline=None, profile=None):
+    """
+    Runs a dependency graph of ScanTasks on a bounded thread pool.
+
+    A task is submitted as soon as all of its inputs have finished, so independent
+    discovery calls and checks overlap. A task that raises produces an error dictionary
+    as its result, and any task depending on it is skipped rather than run on bad data.
+
+    Args:
+        tasks: A list of ScanTask objects.
+        max_workers: The maximum number of tasks running at once.
+        on_task_done: Optional callback invoked as on_task_done(name, timing, result) after each task.
+        deadline: Optional time.time() value. Tasks not yet started when it passes are
+            reported with a 'timeout' status instead of being run. Tasks already running
+            are allowed to finish, since threads cannot be interrupted.
+        profile: Optional core.instrumentation.ScanProfile the AWS calls of each task
+            are attributed to.
+
+    Returns:
+        A tuple (results, timings) of dictionaries keyed by task name.
+    """
+    by_name, dependents = _validate_graph(tasks)
+    waiting_on = {t.name: set(t.inputs) for t in tasks}
+    results = {}
+    timings = {}
+    failed = set()
+    graph_start = time.time()
+
+    def finish(name, result, status, started=None, finished=None):
+        results[name] = result
+        timing = {'status': status}
+        if started is not None:
+            timing['start_offset_sec'] = round(started - graph_start, 3)
+            timing['duration_sec'] = round(finished - started, 3)
+        timings[name] = timing
+        if status != 'ok':
+            failed.add(name)
+        if on_task_done:
+            on_task_done(name, timing, result)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scan') as executor:
+        running = {}
+
+        def submit_ready():
+            for name in [n for n, deps in waiting_on.items() if not deps]:
+                del waiting_on[name]
+                task = by_name[name]
+                if deadline is not None and time.time() > deadline:
+                    finish(name, {"error": f"Timed out before running check: {name}",
+                                  "details": "The scan deadline passed"}, 'timeout')
+                    release(name)
+                    continue
+                failed_deps = [dep for dep in task.inputs if dep in failed]
+                if failed_deps:
+                    finish(name, {"error": f"Skipped check: {name}",
+                                  "details": f"Dependency failed: {', '.join(failed_deps)}"}, 'skipped')
+                    release(name)
+                    continue
+                args = [results[dep] for dep in task.positional_inputs] + list(task.args)
+                kwargs = {param: results[dep] for param, dep in task.kwarg_inputs.items()}
+                running[executor.submit(_timed_call, task, args, kwargs, profile)] = name
+
+        def release(name):
+            for child in dependents[name]:
+                waiting_on[child].discard(name)
+
+        submit_ready()
+        while running or waiting_on:
+            if not running:
+                # Skipped tasks may have unblocked others without anything in flight.
+                submit_ready()
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                result, error, started, finished = future.result()
+                if error is None:
+                    finish(name, result, 'ok', started, finished)
+                else:
+                    finish(name, {"error": f"Failed to run check: {name}", "details": str(error)},
+                           'error', started, finished)
+                release(name)
+            submit_ready()
+
+    return results, timings
@@ -0,0 +1,100 @@
+# core/regions.py
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+
+from core.client_pool import PooledSession
+
+# How many regions are scanned at the same time by default. Each region runs its own
+# task graph, so the total number of in-flight AWS calls is roughly this times the
+# per-graph worker count.
+DEFAULT_REGION_CONCURRENCY = 4
+
+
+def list_enabled_regions(session):
+    """
+    Lists the regions enabled for the account (opt-in regions only once opted in).
+
+    Args:
+        session: A boto3 session object.
+
+    Returns:
+        A sorted list of region names. Falls back to the session's own region on error.
+    """
+    ec2 = session.client('ec2')
+    try:
+        regions = ec2.describe_regions(
+            Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}]
+        )['Regions']
+        return sorted(r['RegionName'] for r in regions)
+    except ClientError as e:
+        print(f"Error listing enabled regions, scanning the default region only: {e}")
+        return [session.region_name]
+
+
+def regional_session(session, region_name):
+    """Returns a PooledSession for the same credentials as session, bound to another region."""
+    return PooledSession(role_arn=getattr(session, 'role_arn', None), region_name=region_name)
+
+
+def run_per_region(regions, scan_region, max_concurrency=DEFAULT_REGION_CONCURRENCY):
+    """
+    Calls scan_region(region) for every region with at most max_concurrency running at once.
+
+    Returns:
+        A dictionary mapping each region to the value scan_region returned for it.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix='region') as executor:
+        futures = {region: executor.submit(scan_region, region) for region in regions}
+        return {region: future.result() for region, future in futures.items()}
+
+
+def _is_error(result):
+    return isinstance(result, dict) and 'error' in result
+
+
+def _tag_region(item, region):
+    if isinstance(item, dict):
+        return dict(item, Region=region)
+    return {'ResourceId': item, 'Region': region}
+
+
+def merge_regional_results(results_by_region):
+    """
+    Merges the per-region results of each check into a single region-tagged result.
+
+    List results are concatenated, and every item is tagged with a 'Region' key (a bare
+    item such as a VPC ID becomes {'ResourceId': item, 'Region': region}). Any other result
+    (e.g. a status dictionary) is kept per region, as are the results of a check that
+    returned a list in some regions and something else in others. Errors are reported
+    separately so one failing region does not hide the findings of the others. A check
+    that failed in every region gets an error result itself (with each region's error in
+    'details'), so it is never reported as having no findings.
+
+    Args:
+        results_by_region: A dictionary of {region: {check_name: result}}.
+
+    Returns:
+        A tuple (merged, errors) where merged is {check_name: result} and errors is
+        {check_name: {region: error}}.
+    """
+    by_check = {}
+    errors = {}
+    for region, results in results_by_region.items():
+        for name, result in results.items():
+            if _is_error(result):
+                errors.setdefault(name, {})[region] = result
+            else:
+                by_check.setdefault(name, {})[region] = result
+    merged = {}
+    for name, by_region in by_check.items():
+        if all(isinstance(result, list) for result in by_region.values()):
+            merged[name] = [_tag_region(item, region) for region, result in by_region.items() for item in result]
+        else:
+            merged[name] = by_region
+    for name, region_errors in errors.items():
+        if name not in merged:
+            merged[name] = {
+                "error": f"Failed in every scanned region: {name}",
+                "details": {region: error.get('details', error['error']) for region, error in region_errors.items()},
+            }
+    return merged, errors
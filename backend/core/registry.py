@@ -0,0 +1,261 @@
+# core/registry.py
+import os
+
+from core import advanced_checks, compliance, discovery, enhanced_discovery
+from core.bucket_configs import BucketConfigSnapshot
+from core.credential_report import build_credential_report
+from core.incremental import PER_RESOURCE_CHECKS
+from core.orchestrator import ScanTask
+from core.snapshot_index import build_snapshot_index
+from core.utilization import find_idle_resources
+
+# Global services (IAM, the S3 bucket list, CloudTrail, ...) are scanned once per scan;
+# regional ones once per scanned region.
+GLOBAL = 'global'
+REGIONAL = 'regional'
+
+# The pillars of the scan response, in order.
+PILLARS = ['security', 'cost_optimization', 'reliability', 'performance_efficiency', 'operational_excellence']
+
+# Severities of check findings, most severe first.
+SEVERITIES = ['high', 'medium', 'low']
+
+# How long (seconds) a check's stored result is served before the check is run again,
+# for checks whose subject rarely changes. Other checks use the scan API's CACHE_TTL.
+# Override with e.g. CHECK_TTLS="cloudtrail_status=3600,unattached_ebs_volumes=600".
+DEFAULT_CHECK_TTLS = {'cloudtrail_status': 24 * 3600, 'compute_optimizer_status': 24 * 3600}
+
+
+def _parse_ttls(value):
+    ttls = {}
+    for item in value.split(','):
+        name, _, ttl = item.partition('=')
+        if name.strip() and ttl.strip():
+            ttls[name.strip()] = int(ttl)
+    return ttls
+
+CHECK_TTLS = {
+    **DEFAULT_CHECK_TTLS,
+    **_parse_ttls(os.environ.get('CHECK_TTLS', ''))
+}
+
+
+class Dataset:
+    """
+    A discovery result that checks consume, e.g. the list of IAM users.
+
+    Args:
+        name: Unique dataset name (also its task name in the scan graph).
+        scope: GLOBAL or REGIONAL.
+        load: Callable taking a session and returning the dataset.
+        stream: Optional callable taking a session and returning a generator over the
+            same items. Used instead of load when a single check loops over the dataset,
+            so it processes pages as they arrive rather than waiting for the full list.
+        api_cost: Rough number of API calls to load it, per page of a listing or per
+            resource when every resource needs its own calls.
+    """
+    def __init__(self, name, scope, load, stream=None, api_cost=1):
+        self.name = name
+        self.scope = scope
+        self.load = load
+        self.stream = stream
+        self.api_cost = api_cost
+
+
+class Check:
+    """
+    A registered check.
+
+    The check function is called as func(*datasets, session, **kwarg_datasets), with
+    session left out if takes_session is False.
+
+    Args:
+        name: Unique check name; also its key in the scan response.
+        pillar: The Well-Architected pillar it is reported under.
+        scope: GLOBAL or REGIONAL.
+        func: The check function.
+        datasets: Names of the datasets passed positionally, in order.
+        kwarg_datasets: Optional {parameter name: dataset name} passed as keywords.
+        takes_session: Whether func takes the session after the datasets.
+        api_cost: Rough number of API calls the check makes itself per resource it
+            evaluates, on top of its datasets (0 if it only reads datasets).
+        severity: The severity of its findings, one of SEVERITIES.
+    """
+    def __init__(self, name, pillar, scope, func, datasets=(), kwarg_datasets=None, takes_session=True, api_cost=0,
+                 severity='medium'):
+        if pillar not in PILLARS:
+            raise ValueError(f"Unknown pillar for check {name}: {pillar}")
+        if severity not in SEVERITIES:
+            raise ValueError(f"Unknown severity for check {name}: {severity}")
+        self.name = name
+        self.pillar = pillar
+        self.scope = scope
+        self.func = func
+        self.datasets = list(datasets)
+        self.kwarg_datasets = dict(kwarg_datasets or {})
+        self.takes_session = takes_session
+        self.api_cost = api_cost
+        self.severity = severity
+        # None: the scan API's default cache TTL.
+        self.ttl = CHECK_TTLS.get(name)
+
+    @property
+    def required_datasets(self):
+        return self.datasets + [name for name in self.kwarg_datasets.values() if name not in self.datasets]
+
+    def describe(self):
+        """Returns the registry entry as a dictionary (for the API)."""
+        return {
+            'name': self.name,
+            'pillar': self.pillar,
+            'severity': self.severity,
+            'scope': self.scope,
+            'datasets': self.required_datasets,
+            'api_cost': self.api_cost,
+            'ttl_sec': self.ttl,
+            'incremental': self.name in PER_RESOURCE_CHECKS,
+        }
+
+
+DATASETS = {dataset.name: dataset for dataset in [
+    # --- Global ---
+    Dataset('iam_users', GLOBAL, discovery.list_iam_users, stream=discovery.iter_iam_users),
+    Dataset('s3_buckets', GLOBAL, discovery.list_s3_buckets, stream=discovery.iter_s3_buckets),
+    Dataset('cloudtrails', GLOBAL, discovery.list_cloudtrails),
+    Dataset('credential_report', GLOBAL, build_credential_report, api_cost=2),
+    # Reads each bucket's configuration the first time a check asks for it.
+    Dataset('bucket_configs', GLOBAL, BucketConfigSnapshot, api_cost=7),
+
+    # --- Regional ---
+    Dataset('vpcs', REGIONAL, discovery.list_vpcs, stream=discovery.iter_vpcs),
+    Dataset('security_groups', REGIONAL, discovery.list_security_groups, stream=discovery.iter_security_groups),
+    Dataset('ebs_volumes', REGIONAL, discovery.list_ebs_volumes, stream=discovery.iter_ebs_volumes),
+    Dataset('ec2_instances', REGIONAL, discovery.list_ec2_instances, stream=discovery.iter_ec2_instances),
+    Dataset('rds_instances', REGIONAL, discovery.list_rds_instances, stream=discovery.iter_rds_instances),
+    Dataset('load_balancers', REGIONAL, discovery.list_load_balancers, stream=discovery.iter_load_balancers),
+    Dataset('cfn_stacks', REGIONAL, discovery.list_cloudformation_stacks, stream=discovery.iter_cloudformation_stacks),
+    Dataset('snapshot_index', REGIONAL, build_snapshot_index),
+]}
+
+CHECKS = {check.name: check for check in [
+    # --- Security ---
+    Check('users_without_mfa', 'security', GLOBAL, compliance.check_mfa, ['iam_users'],
+          {'credential_report': 'credential_report'}, api_cost=1, severity='high'),
+    Check('public_s3_buckets', 'security', GLOBAL, compliance.check_public_s3_buckets, ['s3_buckets'],
+          {'bucket_configs': 'bucket_configs'}, severity='high'),
+    Check('aged_iam_keys', 'security', GLOBAL, compliance.check_iam_key_age, ['iam_users'],
+          {'credential_report': 'credential_report'}, api_cost=1),
+    Check('unrestricted_security_groups', 'security', REGIONAL, compliance.check_unrestricted_security_groups,
+          ['security_groups'], takes_session=False, severity='high'),
+    Check('vpcs_without_flow_logs', 'security', REGIONAL, compliance.check_vpc_flow_logs, ['vpcs'], api_cost=1),
+    Check('cloudtrail_status', 'security', GLOBAL, compliance.check_cloudtrail_status, ['cloudtrails'],
+          takes_session=False, severity='high'),
+    Check('secrets_rotation_status', 'security', REGIONAL, enhanced_discovery.check_secrets_rotation),
+
+    # --- Cost Optimization ---
+    Check('s3_buckets_without_lifecycle', 'cost_optimization', GLOBAL, compliance.check_s3_lifecycle, ['s3_buckets'],
+          {'bucket_configs': 'bucket_configs'}, severity='low'),
+    Check('compute_optimizer_status', 'cost_optimization', GLOBAL, compliance.check_compute_optimizer, api_cost=1,
+          severity='low'),
+    Check('ec2_rightsizing_recommendations', 'cost_optimization', REGIONAL,
+          enhanced_discovery.get_ec2_rightsizing_recommendations, api_cost=1, severity='low'),
+    Check('unattached_ebs_volumes', 'cost_optimization', REGIONAL, advanced_checks.get_unattached_ebs_volumes,
+          api_cost=1, severity='low'),
+    Check('idle_load_balancers', 'cost_optimization', REGIONAL, advanced_checks.get_idle_load_balancers,
+          kwarg_datasets={'load_balancers': 'load_balancers'}, api_cost=1, severity='low'),
+    Check('idle_resources', 'cost_optimization', REGIONAL, find_idle_resources,
+          kwarg_datasets={'load_balancers': 'load_balancers', 'ec2_instances': 'ec2_instances',
+                          'rds_instances': 'rds_instances', 'ebs_volumes': 'ebs_volumes'}, severity='low'),
+    Check('old_ebs_snapshots', 'cost_optimization', REGIONAL, advanced_checks.get_old_ebs_snapshots,
+          kwarg_datasets={'snapshot_index': 'snapshot_index'}, severity='low'),
+
+    # --- Reliability ---
+    Check('rds_multi_az_status', 'reliability', REGIONAL, compliance.check_rds_multi_az, ['rds_instances'],
+          takes_session=False),
+    Check('ebs_volumes_without_backup', 'reliability', REGIONAL, compliance.check_ebs_backups, ['ebs_volumes'],
+          {'snapshot_index': 'snapshot_index'}),
+
+    # --- Performance Efficiency ---
+    Check('ec2_without_detailed_monitoring', 'performance_efficiency', REGIONAL,
+          compliance.check_ec2_detailed_monitoring, ['ec2_instances'], takes_session=False, severity='low'),
+
+    # --- Operational Excellence ---
+    Check('cloudformation_drift_status', 'operational_excellence', REGIONAL, compliance.check_cloudformation_drift,
+          ['cfn_stacks'], api_cost=3),
+]}
+
+
+def select_checks(check_names=None, pillars=None):
+    """
+    Returns the registered checks matching the filters, in registry order. With no
+    filters every check is selected; with both, a check matching either is selected.
+
+    Raises:
+        ValueError: If a check or pillar name is unknown.
+    """
+    unknown = [name for name in check_names or [] if name not in CHECKS]
+    unknown += [pillar for pillar in pillars or [] if pillar not in PILLARS]
+    if unknown:
+        raise ValueError(f"Unknown checks or pillars: {', '.join(unknown)}")
+    if not check_names and not pillars:
+        return list(CHECKS.values())
+    return [check for check in CHECKS.values()
+            if check.name in (check_names or []) or check.pillar in (pillars or [])]
+
+
+def pillar_checks(checks=None):
+    """Returns {pillar: [check names]} for the given checks (all registered checks by default)."""
+    grouped = {}
+    for check in checks if checks is not None else CHECKS.values():
+        grouped.setdefault(check.pillar, []).append(check.name)
+    return {pillar: grouped[pillar] for pillar in PILLARS if pillar in grouped}
+
+
+def build_tasks(session, scope, checks=None, incremental=None):
+    """
+    Declares the scan tasks of the selected checks in one scope: one task per check and
+    one per dataset they consume, so every dataset is loaded exactly once and datasets no
+    selected check needs are not loaded at all.
+
+    A dataset consumed by a single check as its only positional input is streamed into
+    that check instead (if the dataset can be streamed). Checks are declared most
+    expensive first, so the orchestrator starts them as early as possible.
+
+    Args:
+        session: The session to scan with (bound to the scanned region for REGIONAL).
+        scope: GLOBAL or REGIONAL.
+        checks: The selected checks (see select_checks); all registered checks by default.
+        incremental: Optional IncrementalScan. Checks in incremental.PER_RESOURCE_CHECKS
+            then only re-evaluate resources that are new or changed since the last scan.
+
+    Returns:
+        A list of ScanTasks for core.orchestrator.run_task_graph.
+    """
+    checks = [check for check in (checks if checks is not None else CHECKS.values()) if check.scope == scope]
+    consumers = {}
+    for check in checks:
+        for name in check.required_datasets:
+            consumers.setdefault(name, []).append(check)
+
+    def streamed(check):
+        if len(check.datasets) != 1 or check.kwarg_datasets:
+            return False
+        dataset = DATASETS[check.datasets[0]]
+        return dataset.stream is not None and len(consumers[dataset.name]) == 1
+
+    tasks = [
+        ScanTask(name, DATASETS[name].load, args=[session])
+        for name, dataset_consumers in consumers.items()
+        if not (len(dataset_consumers) == 1 and streamed(dataset_consumers[0]))
+    ]
+    for check in sorted(checks, key=lambda check: check.api_cost, reverse=True):
+        func = check.func
+        if incremental and check.name in PER_RESOURCE_CHECKS:
+            func = incremental.wrap(check.name, func, session.region_name if scope == REGIONAL else None)
+        args = [session] if check.takes_session else []
+        if streamed(check):
+            tasks.append(ScanTask(check.name, func, args=[DATASETS[check.datasets[0]].stream(session)] + args))
+        else:
+            tasks.append(ScanTask(check.name, func, inputs=check.datasets, args=args,
+                                  kwarg_inputs=check.kwarg_datasets))
+    return tasks
@@ -0,0 +1,556 @@
+# core/result_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from core.findings import count_findings, finding_index_fields, is_finding, iter_finding_items
+
+# Scan results are persisted so they survive restarts and are shared between gunicorn
+# workers. The store is chosen with RESULT_STORE (e.g. "sqlite:////var/lib/cloudguard/scans.db");
+# other backends can be added with register_store_backend().
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scan_results.db')
+
+# Keys of a scan response that are not pillars of findings.
+_METADATA_KEY = 'scan_metadata'
+
+# Orderings of ResultStore.query_finding_items: the order findings were reported in, or
+# one of the indexed finding fields.
+FINDING_SORT_KEYS = ('position', 'resource_id', 'region', 'created_at')
+
+# Stored scans are pruned whenever a scan is saved: only the newest SCAN_RETENTION_COUNT
+# scans of each (scope, account) are kept, and none older than SCAN_RETENTION_DAYS. The
+# newest scan of a scope and account is always kept, however old. 0 disables a limit.
+SCAN_RETENTION_COUNT = int(os.environ.get('SCAN_RETENTION_COUNT', 100))
+SCAN_RETENTION_DAYS = float(os.environ.get('SCAN_RETENTION_DAYS', 30))
+
+
+class ResultStore:
+    """
+    Interface for scan result storage. A scan is stored as its metadata plus one entry per
+    (pillar, check), so history and per-check queries do not need to load whole scans.
+    """
+
+    def save_scan(self, data, scope, account_id=None, region=None, started_at=None, finished_at=None):
+        """
+        Persists a scan response and returns its scan ID.
+
+        Args:
+            data: The scan response dictionary (scan_metadata plus one key per pillar).
+            scope: What was scanned, e.g. 'all_findings' or 'all_findings:us-east-1,eu-west-1'.
+            account_id: The scanned AWS account.
+            region: The scanned region, or a comma-separated list for multi-region scans.
+            started_at, finished_at: time.time() values of the scan.
+
+        Stores may delete older scans past their retention limits at the same time.
+        """
+        raise NotImplementedError
+
+    def get_scan(self, scan_id):
+        """Returns a stored scan (with its 'data' reassembled), or None."""
+        raise NotImplementedError
+
+    def latest_scan(self, scope=None, account_id=None):
+        """Returns the most recent stored scan matching scope/account, or None."""
+        raise NotImplementedError
+
+    def get_scan_metadata(self, scan_id):
+        """Returns a stored scan with its 'scan_metadata' but without its findings, or None."""
+        raise NotImplementedError
+
+    def iter_check_results(self, scan_id, check_names=None):
+        """
+        Yields (pillar, check_name, finding_count, result) for the checks of a stored scan
+        (only check_names if given), loading one result at a time.
+        """
+        raise NotImplementedError
+
+    def list_scans(self, scope=None, account_id=None, limit=20):
+        """Returns the metadata (without findings) of the most recent scans, newest first."""
+        raise NotImplementedError
+
+    def latest_per_account(self, scope=None):
+        """Returns the most recently finished stored scan of every account, keyed by account ID."""
+        raise NotImplementedError
+
+    def latest_finding_counts(self, scope=None):
+        """
+        Returns the latest finding count of every check of every account, as
+        {account_id: {pillar: {check_name: count}}}, without loading the findings themselves.
+
+        Each check's count comes from the most recently finished scan that ran it, so a
+        partial scan (e.g. ?pillars=reliability) only replaces the checks it ran.
+        """
+        raise NotImplementedError
+
+    def check_history(self, check_name, scope=None, account_id=None, limit=50):
+        """Returns the finding count of one check across the most recent scans, newest first."""
+        raise NotImplementedError
+
+    def get_finding_counts(self, scan_id):
+        """Returns the finding counts of a stored scan as {pillar: {check_name: count}}."""
+        raise NotImplementedError
+
+    def latest_check_scans(self, check_name, scope=None, account_ids=None):
+        """Returns {scan_id: account_id} of the most recently finished scan of every account that ran a check."""
+        raise NotImplementedError
+
+    def query_finding_items(self, check_name, scan_ids, regions=None, tags=None, created_before=None,
+                            sort='position', descending=False, after=None, limit=100):
+        """
+        Returns one page of the findings of a check, from the per-finding index, as
+        (rows, total).
+
+        Args:
+            check_name: The check.
+            scan_ids: The stored scans to read the findings of.
+            regions: Optional regions the findings must be in.
+            tags: Optional {key: value} the findings' resources must be tagged with
+                (a None value only requires the key).
+            created_before: Optional POSIX timestamp the resources must be older than.
+            sort: One of FINDING_SORT_KEYS.
+            descending: Sort in descending order.
+            after: The 'cursor' of the last row of the previous page.
+            limit: The page size.
+
+        Returns:
+            rows: Dictionaries with 'scan_id', 'region', 'resource_id', 'created_at', the
+                finding 'item' and the 'cursor' to resume after it.
+            total: The number of findings matching the filters.
+        """
+        raise NotImplementedError
+
+    def load_resource_state(self, account_id, check_name):
+        """
+        Returns the per-resource state of an incremental check as
+        {resource_key: {'fingerprint': ..., 'findings': [...], 'evaluated_at': ...}}.
+        """
+        raise NotImplementedError
+
+    def save_resource_state(self, account_id, check_name, state):
+        """Replaces the per-resource state of an incremental check."""
+        raise NotImplementedError
+
+
+class SQLiteResultStore(ResultStore):
+    """
+    The default ResultStore, backed by a single SQLite file in WAL mode.
+
+    Args:
+        path: The database file.
+        retention_count: Scans kept per (scope, account) (0 for no limit).
+        retention_days: Age after which scans are deleted (0 for no limit). The newest scan
+            of each scope and account is kept regardless.
+    """
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH, retention_count=SCAN_RETENTION_COUNT,
+                 retention_days=SCAN_RETENTION_DAYS):
+        self._path = path
+        self._retention_count = retention_count
+        self._retention_days = retention_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            # WAL lets readers in other worker processes run while a scan is being written.
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS scans (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    scope TEXT NOT NULL,
+                    account_id TEXT,
+                    region TEXT,
+                    started_at REAL,
+                    finished_at REAL,
+                    duration_sec REAL,
+                    metadata TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_scans_scope_account
+                    ON scans (scope, account_id, finished_at);
+                CREATE TABLE IF NOT EXISTS findings (
+                    scan_id INTEGER NOT NULL REFERENCES scans(id),
+                    pillar TEXT NOT NULL,
+                    check_name TEXT NOT NULL,
+                    finding_count INTEGER,
+                    result TEXT,
+                    PRIMARY KEY (scan_id, pillar, check_name)
+                );
+                CREATE INDEX IF NOT EXISTS idx_findings_check
+                    ON findings (pillar, check_name, scan_id);
+                CREATE TABLE IF NOT EXISTS finding_items (
+                    scan_id INTEGER NOT NULL REFERENCES scans(id),
+                    check_name TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    region TEXT,
+                    resource_id TEXT,
+                    created_at REAL,
+                    tags TEXT,
+                    item TEXT NOT NULL,
+                    is_finding INTEGER NOT NULL DEFAULT 1,
+                    PRIMARY KEY (scan_id, check_name, position)
+                );
+                CREATE INDEX IF NOT EXISTS idx_finding_items_region
+                    ON finding_items (scan_id, check_name, region);
+                CREATE INDEX IF NOT EXISTS idx_finding_items_created
+                    ON finding_items (scan_id, check_name, created_at);
+                CREATE TABLE IF NOT EXISTS resource_state (
+                    account_id TEXT NOT NULL,
+                    check_name TEXT NOT NULL,
+                    resource_key TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    findings TEXT,
+                    evaluated_at REAL,
+                    PRIMARY KEY (account_id, check_name, resource_key)
+                );
+            """)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(finding_items)")}
+            if 'is_finding' not in columns:
+                # Databases from before list results were stored only as finding items.
+                self._conn.execute("ALTER TABLE finding_items ADD COLUMN is_finding INTEGER NOT NULL DEFAULT 1")
+
+    def save_scan(self, data, scope, account_id=None, region=None, started_at=None, finished_at=None):
+        finished_at = finished_at or time.time()
+        started_at = started_at or finished_at
+        rows = []
+        for pillar, checks in data.items():
+            if pillar == _METADATA_KEY or not isinstance(checks, dict):
+                continue
+            for check_name, result in checks.items():
+                # A list result is stored once, as its items in finding_items (see _index_items).
+                stored = None if isinstance(result, list) else json.dumps(result, default=str)
+                rows.append((pillar, check_name, count_findings(check_name, result), stored))
+
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO scans (scope, account_id, region, started_at, finished_at, duration_sec, metadata)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (scope, account_id, region, started_at, finished_at, round(finished_at - started_at, 2),
+                 json.dumps(data.get(_METADATA_KEY, {}), default=str))
+            )
+            scan_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO findings (scan_id, pillar, check_name, finding_count, result) VALUES (?, ?, ?, ?, ?)",
+                [(scan_id, *row) for row in rows]
+            )
+            for pillar, checks in data.items():
+                if pillar != _METADATA_KEY and isinstance(checks, dict):
+                    for check_name, result in checks.items():
+                        self._index_items(scan_id, check_name, result, region)
+            self._prune(time.time())
+        return scan_id
+
+    def _prune(self, now):
+        """Deletes the scans past the retention limits, with their findings. Called with the lock held."""
+        limits = []
+        params = []
+        if self._retention_count:
+            limits.append("recency > ?")
+            params.append(self._retention_count)
+        if self._retention_days:
+            limits.append("finished_at < ?")
+            params.append(now - self._retention_days * 86400)
+        if not limits:
+            return
+        expired = [row[0] for row in self._conn.execute(
+            f"SELECT id FROM ("
+            f"  SELECT id, finished_at, ROW_NUMBER() OVER ("
+            f"    PARTITION BY scope, account_id ORDER BY finished_at DESC, id DESC"
+            f"  ) AS recency FROM scans"
+            f") WHERE recency > 1 AND ({' OR '.join(limits)})", params
+        )]
+        for table, column in (('finding_items', 'scan_id'), ('findings', 'scan_id'), ('scans', 'id')):
+            self._conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", [(scan_id,) for scan_id in expired])
+
+    def _index_items(self, scan_id, check_name, result, scan_region=None):
+        """
+        Adds the items of one check result to finding_items. Called with the lock held.
+
+        Every item of a list result is added, in order, flagged with whether it is a finding,
+        as this is the only copy of the result. Other results (per-region results that are
+        not all lists) keep their JSON in findings and only their findings are added here.
+        Findings without a 'Region' of their own get the scan's region if it scanned only one.
+        """
+        default_region = scan_region if scan_region and ',' not in scan_region else None
+        if isinstance(result, list):
+            items = ((item.get('Region') if isinstance(item, dict) else None, item, is_finding(check_name, item))
+                     for item in result)
+        else:
+            items = ((region, item, True) for region, item in iter_finding_items(check_name, result))
+        rows = []
+        for position, (region, item, finding) in enumerate(items):
+            resource_id, created_at, tags = finding_index_fields(item)
+            rows.append((scan_id, check_name, position, region or default_region, resource_id, created_at,
+                         json.dumps(tags) if tags else None, json.dumps(item, default=str), int(finding)))
+        self._conn.executemany(
+            "INSERT INTO finding_items (scan_id, check_name, position, region, resource_id, created_at, tags, item,"
+            " is_finding) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+    def _ensure_items_indexed(self, scan_id, check_name):
+        """Indexes the findings of a scan stored before finding_items existed."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT f.result, s.region FROM findings f JOIN scans s ON s.id = f.scan_id"
+                " WHERE f.scan_id = ? AND f.check_name = ? AND f.finding_count > 0 AND f.result IS NOT NULL AND NOT EXISTS (SELECT 1 FROM finding_items i WHERE i.scan_id = f.scan_id AND i.check_name = f.check_name)",
+                (scan_id, check_name)
+            ).fetchone()
+            if row is not None:
+                self._index_items(scan_id, check_name, json.loads(row['result']), row['region'])
+
+    @staticmethod
+    def _scan_summary(row):
+        return {
+            'scan_id': row['id'],
+            'scope': row['scope'],
+            'account_id': row['account_id'],
+            'region': row['region'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+            'duration_sec': row['duration_sec'],
+        }
+
+    def _load_result(self, scan_id, check_name, result):
+        """Decodes a stored check result, reassembling a list result from its finding items."""
+        if result is not None:
+            return json.loads(result)
+        with self._lock:
+            items = self._conn.execute(
+                "SELECT item FROM finding_items WHERE scan_id = ? AND check_name = ? ORDER BY position",
+                (scan_id, check_name)
+            ).fetchall()
+        return [json.loads(item['item']) for item in items]
+
+    def _load(self, row):
+        scan = self._scan_summary(row)
+        data = {_METADATA_KEY: json.loads(row['metadata'] or '{}')}
+        with self._lock:
+            findings = self._conn.execute(
+                "SELECT pillar, check_name, result FROM findings WHERE scan_id = ?", (row['id'],)
+            ).fetchall()
+        for finding in findings:
+            data.setdefault(finding['pillar'], {})[finding['check_name']] = self._load_result(
+                row['id'], finding['check_name'], finding['result'])
+        scan['data'] = data
+        return scan
+
+    @staticmethod
+    def _where(scope, account_id, table='', extra=()):
+        clauses, params = [], []
+        if scope is not None:
+            clauses.append(f"{table}scope = ?")
+            params.append(scope)
+        if account_id is not None:
+            clauses.append(f"{table}account_id = ?")
+            params.append(account_id)
+        for clause, value in extra:
+            clauses.append(clause)
+            params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def get_scan(self, scan_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM scans WHERE id = ?", (scan_id,)).fetchone()
+        return self._load(row) if row else None
+
+    def get_scan_metadata(self, scan_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM scans WHERE id = ?", (scan_id,)).fetchone()
+        if not row:
+            return None
+        return dict(self._scan_summary(row), scan_metadata=json.loads(row['metadata'] or '{}'))
+
+    def iter_check_results(self, scan_id, check_names=None):
+        with self._lock:
+            keys = self._conn.execute(
+                "SELECT pillar, check_name, finding_count FROM findings WHERE scan_id = ? ORDER BY rowid", (scan_id,)
+            ).fetchall()
+        for key in keys:
+            if check_names is not None and key['check_name'] not in check_names:
+                continue
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT result FROM findings WHERE scan_id = ? AND pillar = ? AND check_name = ?",
+                    (scan_id, key['pillar'], key['check_name'])
+                ).fetchone()
+            if row is not None:
+                yield (key['pillar'], key['check_name'], key['finding_count'],
+                       self._load_result(scan_id, key['check_name'], row['result']))
+
+    def latest_scan(self, scope=None, account_id=None):
+        where, params = self._where(scope, account_id)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT * FROM scans{where} ORDER BY finished_at DESC, id DESC LIMIT 1", params
+            ).fetchone()
+        return self._load(row) if row else None
+
+    def list_scans(self, scope=None, account_id=None, limit=20):
+        where, params = self._where(scope, account_id)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM scans{where} ORDER BY finished_at DESC, id DESC LIMIT ?", params + [limit]
+            ).fetchall()
+        return [self._scan_summary(row) for row in rows]
+
+    def latest_per_account(self, scope=None):
+        where, params = self._where(scope, None)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM ("
+                f"  SELECT *, ROW_NUMBER() OVER ("
+                f"    PARTITION BY account_id ORDER BY finished_at DESC, id DESC"
+                f"  ) AS recency FROM scans{where}"
+                f") WHERE recency = 1", params
+            ).fetchall()
+        return {row['account_id']: self._load(row) for row in rows}
+
+    def latest_finding_counts(self, scope=None):
+        where, params = self._where(scope, None, table='s.')
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT account_id, pillar, check_name, finding_count FROM ("
+                f"  SELECT s.account_id, f.pillar, f.check_name, f.finding_count, ROW_NUMBER() OVER ("
+                f"    PARTITION BY s.account_id, f.check_name ORDER BY s.finished_at DESC, s.id DESC"
+                f"  ) AS recency FROM findings f JOIN scans s ON s.id = f.scan_id{where}"
+                f") WHERE recency = 1", params
+            ).fetchall()
+        counts = {}
+        for row in rows:
+            counts.setdefault(row['account_id'], {}).setdefault(row['pillar'], {})[row['check_name']] = row['finding_count']
+        return counts
+
+    def check_history(self, check_name, scope=None, account_id=None, limit=50):
+        where, params = self._where(scope, account_id, table='s.', extra=[("f.check_name = ?", check_name)])
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT s.*, f.pillar, f.finding_count FROM findings f JOIN scans s ON s.id = f.scan_id"
+                f"{where} ORDER BY s.finished_at DESC, s.id DESC LIMIT ?", params + [limit]
+            ).fetchall()
+        return [dict(self._scan_summary(row), pillar=row['pillar'], finding_count=row['finding_count'])
+                for row in rows]
+
+    def get_finding_counts(self, scan_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT pillar, check_name, finding_count FROM findings WHERE scan_id = ?", (scan_id,)
+            ).fetchall()
+        counts = {}
+        for row in rows:
+            counts.setdefault(row['pillar'], {})[row['check_name']] = row['finding_count']
+        return counts
+
+    def latest_check_scans(self, check_name, scope=None, account_ids=None):
+        where, params = self._where(scope, None, table='s.', extra=[("f.check_name = ?", check_name)])
+        if account_ids:
+            where += f" AND s.account_id IN ({', '.join('?' for _ in account_ids)})"
+            params += list(account_ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT account_id, scan_id FROM ("
+                f"  SELECT s.account_id, s.id AS scan_id, ROW_NUMBER() OVER ("
+                f"    PARTITION BY s.account_id ORDER BY s.finished_at DESC, s.id DESC"
+                f"  ) AS recency FROM scans s JOIN findings f ON f.scan_id = s.id{where}"
+                f") WHERE recency = 1", params
+            ).fetchall()
+        return {row['scan_id']: row['account_id'] for row in rows}
+
+    def query_finding_items(self, check_name, scan_ids, regions=None, tags=None, created_before=None,
+                            sort='position', descending=False, after=None, limit=100):
+        if sort not in FINDING_SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        scan_ids = list(scan_ids)
+        if not scan_ids:
+            return [], 0
+        for scan_id in scan_ids:
+            self._ensure_items_indexed(scan_id, check_name)
+
+        clauses = [f"scan_id IN ({', '.join('?' for _ in scan_ids)})", "check_name = ?", "is_finding = 1"]
+        params = scan_ids + [check_name]
+        if regions:
+            clauses.append(f"region IN ({', '.join('?' for _ in regions)})")
+            params += list(regions)
+        for key, value in (tags or {}).items():
+            path = '$."' + key.replace('"', '""') + '"'
+            if value is None:
+                clauses.append("json_extract(tags, ?) IS NOT NULL")
+                params.append(path)
+            else:
+                clauses.append("json_extract(tags, ?) = ?")
+                params += [path, value]
+        if created_before is not None:
+            clauses.append("created_at <= ?")
+            params.append(created_before)
+        where = " WHERE " + " AND ".join(clauses)
+
+        # Keyset pagination on (sort value, scan_id, position), which is unique. NULLs sort
+        # as the lowest value so that the row comparison is total. The reported order has no
+        # sort value of its own, so it repeats scan_id.
+        sort_value = {'position': "scan_id", 'resource_id': "COALESCE(resource_id, '')",
+                      'region': "COALESCE(region, '')", 'created_at': "COALESCE(created_at, 0)"}[sort]
+        direction = "DESC" if descending else "ASC"
+        page_where, page_params = where, list(params)
+        if after is not None:
+            page_where += f" AND ({sort_value}, scan_id, position) {'<' if descending else '>'} (?, ?, ?)"
+            page_params += list(after)
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM finding_items{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT scan_id, position, region, resource_id, created_at, item, {sort_value} AS sort_value"
+                f" FROM finding_items{page_where}"
+                f" ORDER BY {sort_value} {direction}, scan_id {direction}, position {direction} LIMIT ?",
+                page_params + [limit]
+            ).fetchall()
+        return [{
+            'scan_id': row['scan_id'],
+            'region': row['region'],
+            'resource_id': row['resource_id'],
+            'created_at': row['created_at'],
+            'item': json.loads(row['item']),
+            'cursor': [row['sort_value'], row['scan_id'], row['position']],
+        } for row in rows], total
+
+    def load_resource_state(self, account_id, check_name):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT resource_key, fingerprint, findings, evaluated_at FROM resource_state"
+                " WHERE account_id = ? AND check_name = ?", (account_id, check_name)
+            ).fetchall()
+        return {row['resource_key']: {'fingerprint': row['fingerprint'], 'findings': json.loads(row['findings']),
+                                      'evaluated_at': row['evaluated_at']}
+                for row in rows}
+
+    def save_resource_state(self, account_id, check_name, state):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM resource_state WHERE account_id = ? AND check_name = ?", (account_id, check_name)
+            )
+            self._conn.executemany(
+                "INSERT INTO resource_state (account_id, check_name, resource_key, fingerprint, findings, evaluated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(account_id, check_name, key, entry['fingerprint'], json.dumps(entry['findings'], default=str),
+                  entry['evaluated_at']) for key, entry in state.items()]
+            )
+
+
+_STORE_BACKENDS = {'sqlite': lambda location: SQLiteResultStore(location or DEFAULT_SQLITE_PATH)}
+
+def register_store_backend(scheme, factory):
+    """Registers a ResultStore factory, called with the part of RESULT_STORE after '<scheme>://'."""
+    _STORE_BACKENDS[scheme] = factory
+
+def create_result_store(url=None):
+    """
+    Builds a ResultStore from a URL such as 'sqlite:///path/to/scans.db'.
+    Without a URL, the default SQLite file next to the backend is used.
+    """
+    if not url:
+        return SQLiteResultStore()
+    scheme, sep, location = url.partition('://')
+    if not sep or scheme not in _STORE_BACKENDS:
+        raise ValueError(f"Unsupported result store: {url}")
+    if scheme == 'sqlite' and location.startswith('/'):
+        # sqlite:///relative.db -> 'relative.db', sqlite:////abs/path.db -> '/abs/path.db'
+        location = location[1:]
+    return _STORE_BACKENDS[scheme](location)
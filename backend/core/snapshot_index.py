@@ -0,0 +1,98 @@
+# core/snapshot_index.py
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+
+# Upper bounds (in days) of the snapshot age buckets, oldest bucket open-ended.
+AGE_BUCKETS_DAYS = [7, 30, 90, 365]
+
+
+def _bucket_label(index):
+    if index == 0:
+        return f"<{AGE_BUCKETS_DAYS[0]}d"
+    if index == len(AGE_BUCKETS_DAYS):
+        return f">{AGE_BUCKETS_DAYS[-1]}d"
+    return f"{AGE_BUCKETS_DAYS[index - 1]}-{AGE_BUCKETS_DAYS[index]}d"
+
+
+class SnapshotIndex:
+    """
+    Every EBS snapshot owned by the account, read once per scan.
+
+    Snapshots are kept sorted by StartTime (for age queries) and grouped by VolumeId with
+    the latest StartTime of each volume, so backup and age checks answer without any
+    further API calls.
+
+    Args:
+        snapshots: An iterable of snapshot dictionaries from describe_snapshots.
+        now: The reference time for ages (defaults to the current time).
+    """
+    def __init__(self, snapshots, now=None):
+        self.now = now or datetime.now(timezone.utc)
+        self.latest_by_volume = {}
+        self._snapshots = []
+        for snapshot in snapshots:
+            start_time = snapshot.get('StartTime')
+            if not start_time:
+                continue
+            # Keep only the fields the checks report, not the whole response dictionary.
+            self._snapshots.append((start_time, {
+                'SnapshotId': snapshot.get('SnapshotId'),
+                'VolumeId': snapshot.get('VolumeId', 'N/A'),
+                'StartTime': start_time,
+                'VolumeSize': snapshot.get('VolumeSize', 'N/A'),
+                'Tags': snapshot.get('Tags', []),
+            }))
+            volume_id = snapshot.get('VolumeId')
+            if volume_id and (volume_id not in self.latest_by_volume or start_time > self.latest_by_volume[volume_id]):
+                self.latest_by_volume[volume_id] = start_time
+        self._snapshots.sort(key=lambda item: item[0])
+        self._start_times = [start_time for start_time, _ in self._snapshots]
+
+        self.age_buckets = {_bucket_label(i): 0 for i in range(len(AGE_BUCKETS_DAYS) + 1)}
+        boundaries = [self.now - timedelta(days=days) for days in AGE_BUCKETS_DAYS]
+        previous = len(self._start_times)
+        for i, boundary in enumerate(boundaries):
+            position = bisect_left(self._start_times, boundary)
+            self.age_buckets[_bucket_label(i)] = previous - position
+            previous = position
+        self.age_buckets[_bucket_label(len(AGE_BUCKETS_DAYS))] = previous
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def latest_snapshot_time(self, volume_id):
+        """Returns the StartTime of the newest snapshot of a volume, or None."""
+        return self.latest_by_volume.get(volume_id)
+
+    def has_recent_snapshot(self, volume_id, max_age_days):
+        """Returns True if the volume has a snapshot newer than max_age_days."""
+        latest = self.latest_by_volume.get(volume_id)
+        return latest is not None and latest > self.now - timedelta(days=max_age_days)
+
+    def snapshots_older_than(self, days):
+        """Returns the snapshots started more than the given number of days ago, oldest first."""
+        position = bisect_left(self._start_times, self.now - timedelta(days=days))
+        return [snapshot for _, snapshot in self._snapshots[:position]]
+
+
+def build_snapshot_index(session):
+    """
+    Reads every snapshot owned by the account with one paginated describe_snapshots pass.
+
+    Args:
+        session: A boto3 session object.
+
+    Returns:
+        A SnapshotIndex.
+
+    Raises:
+        ClientError: If the snapshots cannot be listed. An empty index would wrongly
+            report every volume as unprotected, so the error is left to the caller.
+    """
+    ec2 = session.client('ec2')
+
+    def iter_snapshots():
+        for page in ec2.get_paginator('describe_snapshots').paginate(OwnerIds=['self']):
+            yield from page.get('Snapshots', [])
+
+    return SnapshotIndex(iter_snapshots())
@@ -0,0 +1,144 @@
+# core/streaming.py
+import json
+import threading
+
+# A stream with nothing to send writes an SSE comment this often, so proxies and load
+# balancers do not close it as idle during long checks.
+KEEPALIVE_SEC = 15
+# Reconnection delay (milliseconds) suggested to EventSource clients.
+RETRY_MS = 3000
+
+
+class ScanEventLog:
+    """
+    The events of one scan job, in order: a 'check' event per check result as soon as the
+    check finishes (one per region in multi-region scans), then a final 'summary' event
+    (or an 'error' event if the scan failed).
+
+    Check events hold references to the results the running scan keeps anyway and are only
+    serialized when sent, so the scan response is never built twice. Once the scan is
+    stored, finish() drops the references: readers that are behind (or resume later) get
+    those results from the result store, one check at a time.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._events = []
+        self.closed = False
+        self.scan_id = None
+
+    def publish_check(self, pillar, check_name, result, region=None):
+        with self._condition:
+            if self.closed:
+                return
+            self._events.append({'event': 'check', 'pillar': pillar, 'check': check_name,
+                                 'region': region, 'result': result})
+            self._condition.notify_all()
+
+    def finish(self, scan_id=None, summary=None, error=None):
+        """
+        Ends the log with a 'summary' event (or an 'error' event) and releases the check
+        results. Only the first call has an effect.
+        """
+        with self._condition:
+            if self.closed:
+                return
+            for event in self._events:
+                event.pop('result', None)
+            self.scan_id = scan_id
+            if error is not None:
+                self._events.append({'event': 'error', 'error': error})
+            else:
+                self._events.append({'event': 'summary', **(summary or {}), 'scan_id': scan_id})
+            self.closed = True
+            self._condition.notify_all()
+
+    def read(self, position, timeout=KEEPALIVE_SEC):
+        """
+        Returns (events after the first `position`, closed), waiting up to timeout for new
+        events while there are none and the log is still open.
+        """
+        with self._condition:
+            if len(self._events) <= position and not self.closed:
+                self._condition.wait(timeout)
+            return [dict(event) for event in self._events[position:]], self.closed
+
+
+def format_event(event_id, event, data):
+    """Returns one Server-Sent Event."""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def parse_event_id(last_event_id):
+    """
+    Splits a Last-Event-ID of the form '<stream>:<position>' (e.g. 'job-<id>:4' or
+    'scan-12:4') into (stream, position). Returns (None, 0) if it is malformed.
+    """
+    stream, _, position = (last_event_id or '').rpartition(':')
+    if not stream or not position.isdigit():
+        return None, 0
+    return stream, int(position)
+
+
+def stream_job_events(stream, log, position, load_results):
+    """
+    Yields the SSE text of a job's events after `position`, until its final event.
+
+    Args:
+        stream: The stream name used in the event IDs.
+        log: The job's ScanEventLog.
+        position: How many events the client already received.
+        load_results: Callable taking (scan_id, check_names) and yielding
+            (pillar, check_name, finding_count, result) from the result store, for events
+            whose result was released once the scan was stored.
+    """
+    yield f"retry: {RETRY_MS}\n\n"
+    replayed = set()
+    while True:
+        events, closed = log.read(position)
+        if not events:
+            if closed:
+                return
+            yield ": keep-alive\n\n"
+            continue
+        for event in events:
+            position += 1
+            name = event.pop('event')
+            if name == 'check' and 'result' not in event:
+                # The stored result is the merged one, so it is sent once for all regions.
+                if event['check'] in replayed:
+                    continue
+                replayed.add(event['check'])
+                stored = next(iter(load_results(log.scan_id, {event['check']})), None)
+                if stored is None:
+                    continue
+                event['result'] = stored[3]
+                event['region'] = None
+            yield format_event(f"{stream}:{position}", name, event)
+            if name in ('summary', 'error'):
+                return
+
+
+def stream_stored_scan(stream, scan, position, load_results):
+    """
+    Yields the SSE text of a stored scan: a 'check' event per check after `position`,
+    read from the result store one at a time, then a 'summary' event with the scan
+    metadata and the finding count of every check.
+
+    Args:
+        stream: The stream name used in the event IDs.
+        scan: The stored scan without its findings (see ResultStore.get_scan_metadata).
+        position: How many events the client already received.
+        load_results: As for stream_job_events.
+    """
+    yield f"retry: {RETRY_MS}\n\n"
+    finding_counts = {}
+    index = 0
+    for pillar, check_name, finding_count, result in load_results(scan['scan_id'], None):
+        index += 1
+        finding_counts.setdefault(pillar, {})[check_name] = finding_count
+        if index > position:
+            yield format_event(f"{stream}:{index}", 'check',
+                               {'pillar': pillar, 'check': check_name, 'region': None, 'result': result})
+    yield format_event(f"{stream}:{index + 1}", 'summary', {
+        'scan_id': scan['scan_id'], 'scan_metadata': scan['scan_metadata'], 'finding_counts': finding_counts,
+    })
@@ -0,0 +1,197 @@
+# core/throttling.py
+import random
+import threading
+import time
+
+# Error codes AWS services use to signal that a caller exceeded its request rate.
+THROTTLING_ERROR_CODES = frozenset({
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+    'RequestThrottled', 'RequestLimitExceeded', 'TooManyRequestsException', 'SlowDown',
+    'ProvisionedThroughputExceededException', 'BandwidthLimitExceeded', 'EC2ThrottledException',
+    'PriorRequestNotComplete',
+})
+
+# Attempts per call (including the first) when the call keeps getting throttled.
+MAX_ATTEMPTS = 8
+# Exponential backoff with full jitter: a retry sleeps up to BASE * 2^(attempt - 1), capped.
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 20
+# The adaptive concurrency limit is halved at most once per window, so one burst of
+# throttled responses from calls that were already in flight counts as a single signal.
+DECREASE_WINDOW_SEC = 1.0
+
+
+def is_throttling_response(parsed, status_code=None):
+    """Returns True if a parsed botocore response is a throttling error."""
+    code = (parsed or {}).get('Error', {}).get('Code')
+    return code in THROTTLING_ERROR_CODES or status_code == 429
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE_SEC, cap=BACKOFF_MAX_SEC):
+    """Returns the sleep before the retry following the given (1-based) attempt."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class TokenBucket:
+    """
+    A blocking token bucket: acquire() takes one token, waiting for the bucket to refill
+    at `rate` tokens per second when it is empty.
+
+    Args:
+        rate: Tokens added per second.
+        capacity: Maximum burst size (defaults to one second's worth of tokens).
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps in-flight calls with a limit that adapts to throttling (AIMD): every successful
+    call raises the limit by 1/limit, a throttled call halves it, between min_limit and
+    max_limit. The limit starts at max_limit.
+    """
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self._limit = float(max_limit)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            if self._limit < self.max_limit:
+                previous = int(self._limit)
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                if int(self._limit) > previous:
+                    self._condition.notify()
+
+    def on_throttle(self):
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease >= DECREASE_WINDOW_SEC:
+                self._limit = max(self.min_limit, self._limit / 2)
+                self._last_decrease = now
+
+
+class ServiceCallStats:
+    """Thread-safe counters of API calls, retried attempts and throttled responses."""
+
+    FIELDS = ('calls', 'retries', 'throttles')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, field, count=1):
+        with self._lock:
+            self._counts[field] += count
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+class ThrottleGuard:
+    """
+    Rate limiting, adaptive concurrency and throttling retries for one botocore client,
+    attached through the client's event hooks so every call (including paginated ones)
+    goes through it without the checks having to change:
+
+    - before-call / after-call: take and release an adaptive concurrency slot. The request
+      context marks whether a slot was taken, so a call short-circuited by another
+      before-call handler never releases a slot it did not acquire.
+    - request-created (once per attempt): wait for a token from the rate bucket.
+    - needs-retry: throttled responses are retried with exponential backoff and jitter up
+      to max_attempts, and halve the concurrency limit. Other errors are left to botocore.
+
+    Args:
+        stats: The ServiceCallStats the client's calls are counted in.
+        max_concurrency: Upper bound of the adaptive concurrency limit.
+        rate: Optional requests per second for the token bucket.
+        max_attempts: Attempts per throttled call, including the first.
+    """
+    _SLOT = 'cloudguard_concurrency_slot'
+
+    def __init__(self, stats, max_concurrency, rate=None, max_attempts=MAX_ATTEMPTS):
+        self.stats = stats
+        self.limiter = AdaptiveConcurrencyLimiter(max_concurrency)
+        self.bucket = TokenBucket(rate) if rate else None
+        self.max_attempts = max_attempts
+
+    def _before_call(self, context, **kwargs):
+        self.limiter.acquire()
+        context[self._SLOT] = True
+        self.stats.add('calls')
+
+    def _after_call(self, context, http_response=None, **kwargs):
+        if context.pop(self._SLOT, False):
+            self.limiter.release()
+        if http_response is not None and http_response.status_code < 400:
+            self.limiter.on_success()
+
+    def _after_call_error(self, context, **kwargs):
+        if context.pop(self._SLOT, False):
+            self.limiter.release()
+
+    def _request_created(self, request, **kwargs):
+        if request.context.get('retries', {}).get('attempt', 1) > 1:
+            self.stats.add('retries')
+        if self.bucket is not None:
+            self.bucket.acquire()
+
+    def _needs_retry(self, response=None, attempts=1, **kwargs):
+        if response is None:
+            return None
+        http_response, parsed = response
+        if not is_throttling_response(parsed, getattr(http_response, 'status_code', None)):
+            return None
+        self.stats.add('throttles')
+        self.limiter.on_throttle()
+        if attempts >= self.max_attempts:
+            # False (rather than None) also stops botocore's own retry handler.
+            return False
+        return backoff_delay(attempts)
+
+    def attach(self, client):
+        events = client.meta.events
+        service_id = client.meta.service_model.service_id.hyphenize()
+        events.register('before-call', self._before_call)
+        events.register('after-call', self._after_call)
+        events.register('after-call-error', self._after_call_error)
+        events.register('request-created', self._request_created)
+        # botocore's retry handler is registered on 'needs-retry.<service>'; handlers of the
+        # more specific event run first, so ours has to be registered there, ahead of it.
+        events.register_first(f'needs-retry.{service_id}', self._needs_retry)
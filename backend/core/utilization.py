@@ -0,0 +1,212 @@
+# core/utilization.py
+import os
+
+from botocore.exceptions import ClientError
+
+from core.metrics import MetricFetcher, MetricQuery, load_balancer_dimension, metric_window
+
+# Resources are judged on their daily metrics over the last IDLE_WINDOW_DAYS days. A
+# resource is idle only if it stayed below every threshold of its type on every day of the
+# window, so a weekly batch job or a quiet weekend does not make it idle.
+IDLE_WINDOW_DAYS = int(os.environ.get('IDLE_WINDOW_DAYS', 14))
+DAY_SEC = 86400
+BYTES_PER_MB = 1024 ** 2
+
+# Daily thresholds. Override with e.g. IDLE_THRESHOLDS="ec2_cpu_percent=5,elb_requests_per_day=100".
+DEFAULT_IDLE_THRESHOLDS = {
+    # Application Load Balancers: requests; Network Load Balancers: new flows.
+    'elb_requests_per_day': 10,
+    # EC2 instances: the daily average CPU and the bytes sent and received.
+    'ec2_cpu_percent': 2.0,
+    'ec2_network_mb_per_day': 5.0,
+    # RDS instances: the peak number of connections.
+    'rds_connections': 0,
+    # In-use EBS volumes: read and write operations.
+    'ebs_ops_per_day': 1,
+}
+
+
+def _parse_thresholds(value):
+    thresholds = {}
+    for item in value.split(','):
+        name, _, limit = item.partition('=')
+        if name.strip() and limit.strip():
+            thresholds[name.strip()] = float(limit)
+    return thresholds
+
+IDLE_THRESHOLDS = {
+    **DEFAULT_IDLE_THRESHOLDS,
+    **_parse_thresholds(os.environ.get('IDLE_THRESHOLDS', ''))
+}
+
+_LOAD_BALANCER_TRAFFIC = {
+    'application': ('AWS/ApplicationELB', 'RequestCount'),
+    'network': ('AWS/NetworkELB', 'NewFlowCount'),
+}
+
+
+def _daily_peak(totals, *queries):
+    """
+    Returns the highest daily value of the sum of several metrics, or 0 if none has
+    datapoints. Count metrics such as RequestCount have no datapoints on days without traffic.
+    """
+    by_day = {}
+    for query in queries:
+        for timestamp, value in totals.get(query, ()):
+            by_day[timestamp] = by_day.get(timestamp, 0) + value
+    return max(by_day.values(), default=0)
+
+
+def _older_than(created, window_start):
+    """Returns True if a resource existed for the whole window (True if its creation time is unknown)."""
+    return created is None or created <= window_start
+
+
+def _idle_load_balancers(load_balancers, window_start):
+    queries = {}
+    for lb in load_balancers:
+        if lb.get('Type') not in _LOAD_BALANCER_TRAFFIC or not _older_than(lb.get('CreatedTime'), window_start):
+            continue
+        namespace, metric_name = _LOAD_BALANCER_TRAFFIC[lb['Type']]
+        queries[lb['LoadBalancerArn']] = (lb, MetricQuery(
+            namespace, metric_name, {'LoadBalancer': load_balancer_dimension(lb['LoadBalancerArn'])}
+        ))
+
+    def classify(datapoints, thresholds):
+        for lb, query in queries.values():
+            requests = _daily_peak(datapoints, query)
+            if requests < thresholds['elb_requests_per_day']:
+                yield {
+                    'ResourceType': 'LoadBalancer',
+                    'ResourceId': lb['LoadBalancerArn'],
+                    'Name': lb.get('LoadBalancerName'),
+                    'Type': lb.get('Type'),
+                    'PeakDailyRequests': requests,
+                    'Reason': f"At most {int(requests)} requests per day.",
+                }
+    return [query for _, query in queries.values()], classify
+
+
+def _idle_ec2_instances(instances, window_start):
+    queries = {}
+    for instance in instances:
+        if instance.get('State', {}).get('Name') != 'running' or not _older_than(instance.get('LaunchTime'), window_start):
+            continue
+        dimensions = {'InstanceId': instance['InstanceId']}
+        queries[instance['InstanceId']] = (instance, (
+            MetricQuery('AWS/EC2', 'CPUUtilization', dimensions, stat='Average'),
+            MetricQuery('AWS/EC2', 'NetworkIn', dimensions),
+            MetricQuery('AWS/EC2', 'NetworkOut', dimensions),
+        ))
+
+    def classify(datapoints, thresholds):
+        for instance, (cpu, network_in, network_out) in queries.values():
+            if not datapoints.get(cpu):
+                # No CPU datapoints: the instance was not running long enough to judge.
+                continue
+            peak_cpu = max(value for _, value in datapoints[cpu])
+            peak_network_mb = _daily_peak(datapoints, network_in, network_out) / BYTES_PER_MB
+            if peak_cpu < thresholds['ec2_cpu_percent'] and peak_network_mb < thresholds['ec2_network_mb_per_day']:
+                yield {
+                    'ResourceType': 'EC2Instance',
+                    'ResourceId': instance['InstanceId'],
+                    'InstanceType': instance.get('InstanceType'),
+                    'PeakDailyCpuPercent': round(peak_cpu, 2),
+                    'PeakDailyNetworkMB': round(peak_network_mb, 2),
+                    'Reason': f"Daily average CPU at most {peak_cpu:.1f}% and at most {peak_network_mb:.1f} MB of network traffic per day.",
+                }
+    return [query for _, instance_queries in queries.values() for query in instance_queries], classify
+
+
+def _idle_rds_instances(db_instances, window_start):
+    queries = {}
+    for db in db_instances:
+        if db.get('DBInstanceStatus') != 'available' or not _older_than(db.get('InstanceCreateTime'), window_start):
+            continue
+        queries[db['DBInstanceIdentifier']] = (db, MetricQuery(
+            'AWS/RDS', 'DatabaseConnections', {'DBInstanceIdentifier': db['DBInstanceIdentifier']}, stat='Maximum'
+        ))
+
+    def classify(datapoints, thresholds):
+        for db, query in queries.values():
+            if not datapoints.get(query):
+                continue
+            connections = max(value for _, value in datapoints[query])
+            if connections <= thresholds['rds_connections']:
+                yield {
+                    'ResourceType': 'RDSInstance',
+                    'ResourceId': db['DBInstanceIdentifier'],
+                    'DBInstanceClass': db.get('DBInstanceClass'),
+                    'Engine': db.get('Engine'),
+                    'PeakConnections': int(connections),
+                    'Reason': f"At most {int(connections)} database connections.",
+                }
+    return [query for _, query in queries.values()], classify
+
+
+def _idle_ebs_volumes(volumes, window_start):
+    queries = {}
+    for volume in volumes:
+        # Unattached volumes are reported by the unattached_ebs_volumes check.
+        if volume.get('State') != 'in-use' or not _older_than(volume.get('CreateTime'), window_start):
+            continue
+        dimensions = {'VolumeId': volume['VolumeId']}
+        queries[volume['VolumeId']] = (volume, (
+            MetricQuery('AWS/EBS', 'VolumeReadOps', dimensions),
+            MetricQuery('AWS/EBS', 'VolumeWriteOps', dimensions),
+        ))
+
+    def classify(datapoints, thresholds):
+        for volume, (reads, writes) in queries.values():
+            operations = _daily_peak(datapoints, reads, writes)
+            if operations < thresholds['ebs_ops_per_day']:
+                yield {
+                    'ResourceType': 'EBSVolume',
+                    'ResourceId': volume['VolumeId'],
+                    'Size': volume.get('Size'),
+                    'VolumeType': volume.get('VolumeType'),
+                    'PeakDailyOperations': int(operations),
+                    'Reason': f"At most {int(operations)} read and write operations per day.",
+                }
+    return [query for _, volume_queries in queries.values() for query in volume_queries], classify
+
+
+def find_idle_resources(session=None, load_balancers=(), ec2_instances=(), rds_instances=(), ebs_volumes=(),
+                        window_days=IDLE_WINDOW_DAYS, thresholds=None, now=None):
+    """
+    Finds load balancers, EC2 instances, RDS instances and EBS volumes whose daily
+    utilization stayed below the idle thresholds over the whole window. Unlike a health
+    check, this catches resources that are up and healthy but receive no work.
+
+    The metrics of every resource are fetched together (see core.metrics.MetricFetcher),
+    up to 500 per GetMetricData request. Resources created during the window, stopped
+    instances and unavailable databases are not judged.
+
+    Args:
+        session: Optional session; its region's CloudWatch is queried (pooled client otherwise).
+        load_balancers, ec2_instances, rds_instances, ebs_volumes: Discovered resources.
+        window_days: How many days of metrics to look at.
+        thresholds: Overrides for IDLE_THRESHOLDS, e.g. {'ec2_cpu_percent': 5}.
+        now: The end of the window (defaults to now).
+
+    Returns:
+        A list of dictionaries, one per idle resource, with its 'ResourceType', its peak
+        daily utilization and the 'Reason' it is considered idle, or an error dictionary.
+    """
+    thresholds = {**IDLE_THRESHOLDS, **(thresholds or {})}
+    window_start, end = metric_window(days=window_days, period=DAY_SEC, now=now)
+
+    detectors = [
+        _idle_load_balancers(load_balancers, window_start),
+        _idle_ec2_instances(ec2_instances, window_start),
+        _idle_rds_instances(rds_instances, window_start),
+        _idle_ebs_volumes(ebs_volumes, window_start),
+    ]
+    queries = [query for detector_queries, _ in detectors for query in detector_queries]
+    try:
+        datapoints = MetricFetcher(session).fetch(queries, window_start, end, period=DAY_SEC)
+    except ClientError as e:
+        print(f"Error fetching utilization metrics: {e}")
+        return {"error": "Failed to fetch utilization metrics", "details": str(e)}
+
+    return [idle for _, classify in detectors for idle in classify(datapoints, thresholds)]
@@ -0,0 +1,114 @@
+# cost/cidr_index.py
+import ipaddress
+import socket
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+
+def _flatten(networks):
+    """
+    Turns possibly nested (network, label) pairs into sorted, disjoint integer intervals,
+    each labelled by the most specific network covering it.
+    """
+    if not networks:
+        return [], [], []
+    bounds = sorted({int(network.network_address) for network, _ in networks}
+                    | {int(network.broadcast_address) + 1 for network, _ in networks})
+    labels = [None] * (len(bounds) - 1)
+    # Paint from the largest network to the smallest, so more specific networks win.
+    for network, label in sorted(networks, key=lambda item: item[0].prefixlen):
+        lo = bisect_left(bounds, int(network.network_address))
+        hi = bisect_left(bounds, int(network.broadcast_address) + 1)
+        labels[lo:hi] = [label] * (hi - lo)
+
+    starts, ends, merged = [], [], []
+    for i, label in enumerate(labels):
+        if label is None:
+            continue
+        start, end = bounds[i], bounds[i + 1] - 1
+        if merged and merged[-1] == label and ends[-1] + 1 == start:
+            ends[-1] = end
+        else:
+            starts.append(start)
+            ends.append(end)
+            merged.append(label)
+    return starts, ends, merged
+
+
+class CidrIndex:
+    """
+    Maps IP addresses to the label of the most specific CIDR containing them.
+
+    The CIDRs are flattened into sorted, disjoint intervals, so a lookup is one binary
+    search (O(log n)) regardless of how many CIDRs there are. lookup_many() classifies
+    whole arrays of IPv4 addresses with numpy; IPv6 and malformed values fall back to
+    per-address lookups.
+
+    Args:
+        entries: An iterable of (cidr, label) pairs, e.g. ('10.0.0.0/8', 'private').
+        default: The label of addresses no CIDR contains, and of unparsable values.
+    """
+    def __init__(self, entries, default=None):
+        self.default = default
+        by_version = {4: [], 6: []}
+        for cidr, label in entries:
+            network = ipaddress.ip_network(cidr, strict=False)
+            by_version[network.version].append((network, label))
+        self._tables = {version: _flatten(networks) for version, networks in by_version.items()}
+        starts, ends, labels = self._tables[4]
+        self._v4_starts = np.array(starts, dtype=np.int64)
+        self._v4_ends = np.array(ends, dtype=np.int64)
+        self._v4_labels = np.array(labels + [default], dtype=object)
+
+    def lookup(self, address):
+        """Returns the label of a single address."""
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return self.default
+        starts, ends, labels = self._tables[ip.version]
+        value = int(ip)
+        i = bisect_right(starts, value) - 1
+        return labels[i] if i >= 0 and value <= ends[i] else self.default
+
+    def lookup_many(self, addresses):
+        """
+        Returns a numpy object array with the label of every address in a sequence of
+        address strings. Callers with many repeated addresses should pass the unique
+        values (see lookup_column).
+        """
+        addresses = list(addresses)
+        result = np.full(len(addresses), self.default, dtype=object)
+        if not len(addresses):
+            return result
+
+        values = np.zeros(len(addresses), dtype=np.int64)
+        is_v4 = np.zeros(len(addresses), dtype=bool)
+        for i, address in enumerate(addresses):
+            try:
+                values[i] = int.from_bytes(socket.inet_pton(socket.AF_INET, address), 'big')
+                is_v4[i] = True
+            except (OSError, TypeError):
+                pass
+
+        if is_v4.any():
+            values = values[is_v4]
+            positions = np.searchsorted(self._v4_starts, values, side='right') - 1
+            inside = positions >= 0
+            inside[inside] &= values[inside] <= self._v4_ends[positions[inside]]
+            # Index len(labels) - 1 is the default label.
+            positions[~inside] = len(self._v4_labels) - 1
+            result[is_v4] = self._v4_labels[positions]
+
+        for i in np.flatnonzero(~is_v4):
+            result[i] = self.lookup(addresses[i]) if isinstance(addresses[i], str) else self.default
+        return result
+
+    def lookup_column(self, addresses):
+        """Returns a pandas Series with the label of every address in a column, classifying each distinct address once."""
+        codes, uniques = pd.factorize(addresses)
+        labels = np.append(self.lookup_many(uniques), self.default)
+        # Missing values have code -1, which picks the appended default.
+        return pd.Series(labels[codes], index=getattr(addresses, 'index', None))
@@ -1,24 +1,90 @@
 # cost/cloudwatch_analyzer.py
-import boto3
 import datetime
 
-def get_data_transfer_cost():
-    # This is your original function
-    cw = boto3.client('cloudwatch')
-    end = datetime.datetime.utcnow()
-    start = end - datetime.timedelta(days=7)
-    result = {}
-    for metric in ['NetworkOut', 'BytesDownloaded']:
-        res = cw.get_metric_statistics(
-            Namespace='AWS/EC2' if metric == 'NetworkOut' else 'AWS/S3',
-            MetricName=metric,
-            StartTime=start,
-            EndTime=end,
-            Period=86400,
-            Statistics=['Sum']
-        )
-        gb = sum([pt['Sum'] for pt in res['Datapoints']]) / (1024 ** 3)
-        result[metric] = round(gb, 2)
+from botocore.exceptions import ClientError
+
+from core import discovery
+from core.bucket_configs import BucketConfigSnapshot
+from core.client_pool import get_session
+from core.metrics import MetricFetcher, MetricQuery, load_balancer_dimension, metric_window
+from core.regions import regional_session
+
+BYTES_PER_GB = 1024 ** 3
+LOAD_BALANCER_NAMESPACES = {'application': 'AWS/ApplicationELB', 'network': 'AWS/NetworkELB'}
+
+def get_data_transfer_cost(session=None):
+    """
+    Returns the account-wide NetworkOut (EC2) and BytesDownloaded (S3) of the last 7 days,
+    in GB, or an error dictionary.
+    """
+    queries = {
+        'NetworkOut': MetricQuery('AWS/EC2', 'NetworkOut'),
+        'BytesDownloaded': MetricQuery('AWS/S3', 'BytesDownloaded'),
+    }
+    start, end = metric_window(days=7, period=86400)
+    try:
+        totals = MetricFetcher(session).aggregate(queries.values(), start, end, period=86400)
+    except ClientError as e:
+        print(f"Could not fetch data transfer metrics: {e}")
+        return {"error": "Failed to fetch data transfer metrics", "details": str(e)}
+    return {metric: round((totals[query] or 0) / BYTES_PER_GB, 2) for metric, query in queries.items()}
+
+def get_data_transfer_by_resource(session=None, days=7, period=86400, bucket_configs=None):
+    """
+    Returns the data transferred out by every resource over the last days, in GB, with
+    all metrics fetched in a handful of GetMetricData requests:
+    NetworkOut per EC2 instance, ProcessedBytes per load balancer, and BytesDownloaded per
+    S3 bucket (only reported for buckets with an 'EntireBucket' request metrics filter).
+
+    S3 request metrics are published in the bucket's own region, so buckets are queried
+    through one fetcher per region. A bucket whose list_buckets entry has no BucketRegion
+    is located with bucket_configs (a private BucketConfigSnapshot if not given).
+
+    Returns:
+        {'ec2_instances': {instance_id: GB}, 'load_balancers': {name: GB},
+         's3_buckets': {bucket: GB}, 'metric_requests': GetMetricData requests made},
+        or an error dictionary.
+    """
+    session = session or get_session()
+    home_region = session.region_name
+    # {region: {query: (kind, name)}}; EC2 and load balancer metrics are in the session's region.
+    queries = {home_region: {}}
+    for instance in discovery.iter_ec2_instances(session):
+        queries[home_region][MetricQuery('AWS/EC2', 'NetworkOut', {'InstanceId': instance['InstanceId']})] = \
+            ('ec2_instances', instance['InstanceId'])
+    for lb in discovery.iter_load_balancers(session):
+        namespace = LOAD_BALANCER_NAMESPACES.get(lb.get('Type'))
+        if namespace:
+            queries[home_region][MetricQuery(namespace, 'ProcessedBytes', {'LoadBalancer': load_balancer_dimension(lb['LoadBalancerArn'])})] = \
+                ('load_balancers', lb['LoadBalancerName'])
+
+    buckets = list(discovery.iter_s3_buckets(session))
+    unlocated = [bucket for bucket in buckets if not bucket.get('BucketRegion')]
+    located = {}
+    if unlocated:
+        bucket_configs = bucket_configs or BucketConfigSnapshot(session)
+        located = {name: config.region for name, config in bucket_configs.fetch(unlocated).items()}
+    for bucket in buckets:
+        region = bucket.get('BucketRegion') or located.get(bucket['Name']) or home_region
+        queries.setdefault(region, {})[
+            MetricQuery('AWS/S3', 'BytesDownloaded', {'BucketName': bucket['Name'], 'FilterId': 'EntireBucket'})
+        ] = ('s3_buckets', bucket['Name'])
+
+    start, end = metric_window(days=days, period=period)
+    result = {'ec2_instances': {}, 'load_balancers': {}, 's3_buckets': {}}
+    metric_requests = 0
+    for region, region_queries in queries.items():
+        fetcher = MetricFetcher(session if region == home_region else regional_session(session, region))
+        try:
+            totals = fetcher.aggregate(region_queries, start, end, period)
+        except ClientError as e:
+            print(f"Could not fetch data transfer metrics in {region}: {e}")
+            return {"error": "Failed to fetch data transfer metrics", "details": str(e)}
+        metric_requests += fetcher.requests_made
+        for query, (kind, name) in region_queries.items():
+            if totals[query] is not None:
+                result[kind][name] = round(totals[query] / BYTES_PER_GB, 2)
+    result['metric_requests'] = metric_requests
     return result
 
 # --- NEW FUNCTION TO GET REAL THROTTLING DATA ---
@@ -0,0 +1,177 @@
+# cost/flow_log_ingest.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import boto3
+from botocore.exceptions import ClientError
+import numpy as np
+import pandas as pd
+
+from cost.vpc_log_parser import (
+    CHUNK_ROWS, COST_PER_GB, DEFAULT_CLASSIFIER, billable_records, classify_records, open_flow_log, read_flow_log,
+    transfer_costs
+)
+
+# Flow logs are attributed to the VPC and subnet they were captured in. Formats without
+# those fields (e.g. the default version 2 format) are attributed to the network interface.
+SOURCE_FIELDS = ['vpc-id', 'subnet-id']
+FALLBACK_SOURCE_FIELD = 'interface-id'
+HOUR_SEC = 3600
+KEY_FIELDS = SOURCE_FIELDS + [FALLBACK_SOURCE_FIELD, 'category', 'hour']
+
+# Shards per worker process. More, smaller shards keep workers busy when file sizes vary.
+SHARDS_PER_WORKER = 4
+
+
+def list_flow_log_sources(location, s3_client=None):
+    """
+    Lists the flow log files under a local directory (recursively) or an 's3://bucket/prefix'.
+
+    Returns:
+        A list of (source, size_in_bytes) tuples, where source is a path or an s3:// URL.
+    """
+    if location.startswith('s3://'):
+        bucket, _, prefix = location[len('s3://'):].partition('/')
+        s3_client = s3_client or boto3.client('s3')
+        sources = []
+        for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                if not obj['Key'].endswith('/'):
+                    sources.append((f"s3://{bucket}/{obj['Key']}", obj['Size']))
+        return sources
+
+    sources = []
+    for root, _, files in os.walk(location):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            sources.append((path, os.path.getsize(path)))
+    return sources
+
+
+def shard_sources(sources, shard_count):
+    """Splits (source, size) tuples into shard_count lists of similar total size (largest first)."""
+    shards = [[] for _ in range(max(1, min(shard_count, len(sources))))]
+    sizes = [0] * len(shards)
+    for source, size in sorted(sources, key=lambda item: item[1], reverse=True):
+        smallest = sizes.index(min(sizes))
+        shards[smallest].append(source)
+        sizes[smallest] += size
+    return shards
+
+
+def aggregate_flow_logs(sources, log_format=None, classifier=None, chunk_rows=CHUNK_ROWS):
+    """
+    Streams a shard of flow log files and totals their bytes per
+    (vpc-id, subnet-id, interface-id, destination category, hour).
+
+    Runs in a worker process. Files are decompressed while they are read and processed in
+    chunks, so memory stays bounded by chunk_rows plus the size of the aggregate.
+
+    Returns:
+        A partial aggregate: {'files', 'rows', 'skipped_rows', 'failed': [(source, error)],
+        'bytes': {key tuple: total bytes}}.
+    """
+    classifier = classifier or DEFAULT_CLASSIFIER
+    s3_client = None
+    if any(source.startswith('s3://') for source in sources):
+        # Worker processes must not share the parent's clients (and their connections).
+        s3_client = boto3.session.Session().client('s3')
+
+    partial = {'files': 0, 'rows': 0, 'skipped_rows': 0, 'failed': [], 'bytes': {}}
+    columns = SOURCE_FIELDS + [FALLBACK_SOURCE_FIELD, 'start', 'srcaddr']
+    for source in sources:
+        try:
+            with open_flow_log(source, s3_client) as stream:
+                for chunk in read_flow_log(stream, columns, log_format, chunk_rows):
+                    records = billable_records(chunk)
+                    partial['rows'] += len(chunk)
+                    partial['skipped_rows'] += len(chunk) - len(records)
+                    _add_chunk(partial['bytes'], records, classifier)
+        except (OSError, ValueError, ClientError) as e:
+            partial['failed'].append((source, str(e)))
+            continue
+        partial['files'] += 1
+    return partial
+
+
+def _add_chunk(totals, chunk, classifier):
+    """Adds one chunk's bytes to the {key tuple: bytes} totals."""
+    keys = pd.DataFrame(index=chunk.index)
+    for field in SOURCE_FIELDS:
+        keys[field] = chunk[field] if field in chunk else None
+    use_fallback = FALLBACK_SOURCE_FIELD in chunk and not any(field in chunk for field in SOURCE_FIELDS)
+    keys[FALLBACK_SOURCE_FIELD] = chunk[FALLBACK_SOURCE_FIELD] if use_fallback else None
+    keys['category'] = classify_records(classifier, chunk)
+    keys['hour'] = chunk['start'] // HOUR_SEC * HOUR_SEC if 'start' in chunk else np.nan
+    keys['bytes'] = chunk['bytes']
+    grouped = keys.groupby(KEY_FIELDS, dropna=False)['bytes'].sum()
+    for key, total in grouped.items():
+        key = tuple(None if pd.isna(value) else value for value in key)
+        totals[key] = totals.get(key, 0) + int(total)
+
+
+def reduce_aggregates(partials):
+    """Merges the partial aggregates of aggregate_flow_logs."""
+    merged = {'files': 0, 'rows': 0, 'skipped_rows': 0, 'failed': [], 'bytes': {}}
+    for partial in partials:
+        for field in ('files', 'rows', 'skipped_rows'):
+            merged[field] += partial[field]
+        merged['failed'].extend(partial['failed'])
+        for key, total in partial['bytes'].items():
+            merged['bytes'][key] = merged['bytes'].get(key, 0) + total
+    return merged
+
+
+def ingest_flow_logs(location, log_format=None, max_workers=None, s3_client=None, classifier=None):
+    """
+    Ingests every flow log file under a local directory or an 's3://bucket/prefix'.
+
+    Files are sharded by size across a pool of worker processes. Each worker streams its
+    files and returns a partial aggregate, and the partials are reduced at the end.
+
+    Args:
+        location: A directory or an s3:// prefix.
+        log_format: The format of files without a header line (see vpc_log_parser.parse_log_format).
+        max_workers: Worker processes (defaults to the number of cores).
+        s3_client: Optional S3 client for listing the prefix.
+        classifier: Optional classifier (see vpc_log_parser.classify_records), e.g. a
+            cost.ip_index.IpClassificationIndex for same-AZ / cross-AZ / cross-region attribution.
+
+    Returns:
+        A dictionary with 'files', 'rows', 'skipped_rows', 'failed' (files that could not be
+        read, with the error), 'bytes' and 'cost' per category, and 'aggregates': one
+        entry per (vpc-id, subnet-id, interface-id, category, hour) with its bytes and
+        estimated cost, largest first. The hour is a Unix timestamp (None if the format
+        has no 'start' field).
+    """
+    sources = list_flow_log_sources(location, s3_client)
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(sources) or 1))
+    shards = shard_sources(sources, max_workers * SHARDS_PER_WORKER)
+    if max_workers == 1:
+        partials = [aggregate_flow_logs(shard, log_format, classifier) for shard in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            partials = list(executor.map(
+                aggregate_flow_logs, shards, [log_format] * len(shards), [classifier] * len(shards)
+            ))
+    merged = reduce_aggregates(partials)
+
+    aggregates = []
+    bytes_by_category = {}
+    for (vpc_id, subnet_id, interface_id, category, hour), total in merged.pop('bytes').items():
+        aggregates.append({
+            'vpc_id': vpc_id,
+            'subnet_id': subnet_id,
+            'interface_id': interface_id,
+            'category': category,
+            'hour': int(hour) if hour is not None else None,
+            'bytes': total,
+            'cost': round(total / (1024 ** 3) * COST_PER_GB.get(category, 0), 4),
+        })
+        bytes_by_category[category] = bytes_by_category.get(category, 0) + total
+    aggregates.sort(key=lambda entry: entry['bytes'], reverse=True)
+    merged['failed'] = [{'source': source, 'error': error} for source, error in merged['failed']]
+    merged['bytes'] = bytes_by_category
+    merged['cost'] = transfer_costs(bytes_by_category)
+    merged['aggregates'] = aggregates
+    return merged
@@ -0,0 +1,178 @@
+# cost/ip_index.py
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cost.cidr_index import CidrIndex
+from core import client_pool, discovery
+from core.regions import regional_session
+
+# A local copy of https://ip-ranges.amazonaws.com/ip-ranges.json (set AWS_IP_RANGES_PATH).
+DEFAULT_IP_RANGES_PATH = os.environ.get(
+    'AWS_IP_RANGES_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ip-ranges.json')
+)
+
+PRIVATE_NETWORKS = ['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16', 'fc00::/7']
+
+# Transfer categories, from the perspective of the flow's source.
+INTERNET = 'internet'
+SAME_AZ = 'same_az'
+CROSS_AZ = 'cross_az'
+CROSS_REGION = 'cross_region'
+
+# Location kinds. Index 0 is the default location (the internet).
+_KIND_INTERNET, _KIND_SUBNET, _KIND_AWS, _KIND_PRIVATE = range(4)
+
+
+def load_ip_ranges(path=DEFAULT_IP_RANGES_PATH):
+    """
+    Reads a local copy of the AWS ip-ranges JSON.
+
+    Returns:
+        A list of (cidr, region) pairs, IPv4 and IPv6. Prefixes listed under several
+        services appear once.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    ranges = {}
+    for prefix in data.get('prefixes', []):
+        ranges[prefix['ip_prefix']] = prefix['region']
+    for prefix in data.get('ipv6_prefixes', []):
+        ranges[prefix['ipv6_prefix']] = prefix['region']
+    return list(ranges.items())
+
+
+def subnet_cidrs(subnets, region):
+    """Returns (cidr, availability zone, region) for the IPv4 and IPv6 CIDRs of discovered subnets."""
+    cidrs = []
+    for subnet in subnets:
+        az = subnet.get('AvailabilityZone')
+        if subnet.get('CidrBlock'):
+            cidrs.append((subnet['CidrBlock'], az, region))
+        for association in subnet.get('Ipv6CidrBlockAssociationSet', []):
+            if association.get('Ipv6CidrBlock'):
+                cidrs.append((association['Ipv6CidrBlock'], az, region))
+    return cidrs
+
+
+class IpClassificationIndex:
+    """
+    Classifies flows by where their addresses are: the account's subnets (with their
+    availability zone), AWS public ranges (with their region), other private space, or
+    the internet.
+
+    The parsers in vpc_log_parser and flow_log_ingest accept it in place of their default
+    destination-only classifier.
+
+    Every CIDR is loaded into one CidrIndex, so locating an address is a binary search
+    (O(log n)); classify_columns() locates each distinct address of a column once and
+    compares locations with numpy.
+
+    A flow is classified as:
+        same_az / cross_az / cross_region: between two subnets (by AZ and region);
+        cross_az: to AWS public addresses or unknown private space in the source's region
+            (billed like inter-AZ traffic);
+        cross_region: to AWS public addresses of another region;
+        internet: to anything else, or from outside the account's subnets into them.
+
+    Args:
+        ip_ranges: (cidr, region) pairs of AWS public ranges (see load_ip_ranges).
+        subnets: (cidr, availability zone, region) triples of the account's subnets.
+        home_region: The region of sources outside the known subnets.
+    """
+    def __init__(self, ip_ranges=(), subnets=(), home_region=None):
+        self._regions = {}
+        self._azs = {}
+        # Parallel arrays describing each location; location 0 is the internet.
+        kinds, regions, azs = [_KIND_INTERNET], [-1], [-1]
+        location_ids = {}
+        entries = []
+
+        def location(kind, region, az=None):
+            key = (kind, region, az)
+            if key not in location_ids:
+                location_ids[key] = len(kinds)
+                kinds.append(kind)
+                regions.append(self._id(self._regions, region))
+                azs.append(self._id(self._azs, az))
+            return location_ids[key]
+
+        for cidr, region in ip_ranges:
+            # GLOBAL ranges (e.g. CloudFront) are not tied to a region; they count as internet.
+            if region and region != 'GLOBAL':
+                entries.append((cidr, location(_KIND_AWS, region)))
+        for cidr in PRIVATE_NETWORKS:
+            entries.append((cidr, location(_KIND_PRIVATE, None)))
+        for cidr, az, region in subnets:
+            entries.append((cidr, location(_KIND_SUBNET, region, az)))
+
+        self._index = CidrIndex(entries, default=0)
+        self._kinds = np.array(kinds)
+        self._region_ids = np.array(regions)
+        self._az_ids = np.array(azs)
+        self._home_region = self._id(self._regions, home_region)
+
+    @staticmethod
+    def _id(ids, value):
+        if value is None:
+            return -1
+        return ids.setdefault(value, len(ids))
+
+    def _classify_locations(self, src, dst):
+        """Classifies arrays of source and destination location IDs."""
+        src_kind, dst_kind = self._kinds[src], self._kinds[dst]
+        src_region = np.where(src_kind == _KIND_SUBNET, self._region_ids[src], self._home_region)
+        dst_region = self._region_ids[dst]
+        same_region = src_region == dst_region
+
+        result = np.full(len(src), INTERNET, dtype=object)
+        from_subnet = src_kind == _KIND_SUBNET
+        to_subnet = dst_kind == _KIND_SUBNET
+
+        between_subnets = from_subnet & to_subnet
+        result[between_subnets & ~same_region] = CROSS_REGION
+        result[between_subnets & same_region] = CROSS_AZ
+        result[between_subnets & same_region & (self._az_ids[src] == self._az_ids[dst])] = SAME_AZ
+
+        from_private = from_subnet | (src_kind == _KIND_PRIVATE)
+        result[from_private & (dst_kind == _KIND_PRIVATE)] = CROSS_AZ
+        result[(src_kind == _KIND_PRIVATE) & to_subnet] = CROSS_AZ
+
+        to_aws = from_private & (dst_kind == _KIND_AWS)
+        result[to_aws & same_region] = CROSS_AZ
+        result[to_aws & ~same_region] = CROSS_REGION
+        return result
+
+    def locate(self, address):
+        """Returns the location ID of a single address (0 for the internet)."""
+        return self._index.lookup(address)
+
+    def classify(self, src, dst):
+        """Classifies a single flow from src to dst."""
+        return self._classify_locations(np.array([self.locate(src)]), np.array([self.locate(dst)]))[0]
+
+    def classify_columns(self, src, dst):
+        """Classifies whole columns of source and destination addresses at once (returns a numpy array)."""
+        src_ids = self._index.lookup_column(pd.Series(src)).to_numpy(dtype=np.int64)
+        dst_ids = self._index.lookup_column(pd.Series(dst)).to_numpy(dtype=np.int64)
+        return self._classify_locations(src_ids, dst_ids)
+
+
+def build_ip_index(session=None, ip_ranges_path=DEFAULT_IP_RANGES_PATH, regions=None):
+    """
+    Builds an IpClassificationIndex from the local ip-ranges JSON and the account's subnets.
+
+    Args:
+        session: The session to discover subnets with (defaults to the pooled ambient session).
+        ip_ranges_path: The local ip-ranges JSON.
+        regions: Regions whose subnets are loaded (defaults to the session's region).
+    """
+    session = session or client_pool.get_session()
+    home_region = session.region_name
+    subnets = []
+    for region in regions or [home_region]:
+        subnets.extend(subnet_cidrs(discovery.list_subnets(regional_session(session, region)), region))
+    return IpClassificationIndex(load_ip_ranges(ip_ranges_path), subnets, home_region)
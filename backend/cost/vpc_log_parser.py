@@ -1,26 +1,235 @@
 import gzip
-import csv
-from collections import defaultdict
-
-COST_PER_GB = {'internet': 0.09, 'inter_az': 0.01, 'intra_vpc': 0.00}
-
-PUBLIC_PREFIXES = ['3.', '13.', '15.']
-PRIVATE_PREFIXES = ['10.', '172.16.', '192.168.']
-
-def analyze_vpc_transfer_cost(flowlog_path):
-    summary = defaultdict(int)
-    with gzip.open(flowlog_path, 'rt') as f:
-        reader = csv.reader(f, delimiter=' ')
-        for row in reader:
-            try:
-                dstaddr = row[4]
-                bytes_sent = int(row[10])
-                if any(dstaddr.startswith(p) for p in PUBLIC_PREFIXES):
-                    summary['internet'] += bytes_sent
-                elif any(dstaddr.startswith(p) for p in PRIVATE_PREFIXES):
-                    summary['intra_vpc'] += bytes_sent
-                else:
-                    summary['inter_az'] += bytes_sent
-            except:
-                continue
-    return {k: round(v / (1024 ** 3) * COST_PER_GB[k], 2) for k, v in summary.items()}
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cost.cidr_index import CidrIndex
+
+COST_PER_GB = {
+    'internet': 0.09, 'inter_az': 0.01, 'intra_vpc': 0.00,
+    # Categories of cost.ip_index.IpClassificationIndex
+    'same_az': 0.00, 'cross_az': 0.01, 'cross_region': 0.02,
+}
+
+PRIVATE_NETWORKS = ['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16']
+
+# Private destinations are billed as traffic inside the VPC and public ones as internet
+# traffic. Telling cross-AZ and cross-region traffic apart needs the account's subnets and
+# the AWS ip-ranges: pass cost.ip_index.build_ip_index() as the classifier for that.
+DEFAULT_CLASSIFIER = CidrIndex([(cidr, 'intra_vpc') for cidr in PRIVATE_NETWORKS], default='internet')
+
+# The default (version 2) flow log format. Logs with a custom format either start with
+# a header line naming their fields or need the format passed in as log_format.
+DEFAULT_LOG_FORMAT = [
+    'version', 'account-id', 'interface-id', 'srcaddr', 'dstaddr', 'srcport', 'dstport',
+    'protocol', 'packets', 'bytes', 'start', 'end', 'action', 'log-status'
+]
+REQUIRED_FIELDS = ['dstaddr', 'bytes']
+
+# Rows parsed per chunk; bounds memory per file regardless of its size.
+CHUNK_ROWS = 500_000
+
+_GZIP_MAGIC = b'\x1f\x8b'
+# Enough bytes to see a whole header line without consuming it.
+_HEADER_PEEK_BYTES = 64 * 1024
+
+
+def parse_log_format(log_format):
+    """
+    Returns the field names of a flow log format given as a list, as a format string
+    ('${srcaddr} ${dstaddr} ${bytes}') or as a header line ('srcaddr dstaddr bytes').
+    """
+    if log_format is None:
+        return list(DEFAULT_LOG_FORMAT)
+    if isinstance(log_format, str):
+        log_format = log_format.split()
+    return [field.strip('${}') for field in log_format]
+
+
+def open_flow_log(source, s3_client=None):
+    """
+    Opens a flow log for streaming: a local path or an 's3://bucket/key' URL. Gzip content
+    is recognized by its magic bytes and decompressed on the fly.
+
+    Returns:
+        A buffered binary stream supporting peek().
+    """
+    if source.startswith('s3://'):
+        bucket, _, key = source[len('s3://'):].partition('/')
+        raw = io.BufferedReader(s3_client.get_object(Bucket=bucket, Key=key)['Body'])
+    else:
+        raw = open(source, 'rb')
+    if raw.peek(len(_GZIP_MAGIC))[:len(_GZIP_MAGIC)] == _GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=raw)
+    return raw
+
+
+def _flow_log_fields(stream, log_format):
+    """Returns (fields, has_header), reading the header line (if any) without consuming it."""
+    first_line = stream.peek(_HEADER_PEEK_BYTES).split(b'\n', 1)[0].decode('utf-8', 'replace').split()
+    if any(field in first_line for field in REQUIRED_FIELDS):
+        return first_line, True
+    return parse_log_format(log_format), False
+
+
+def read_flow_log(stream, columns, log_format=None, chunk_rows=CHUNK_ROWS):
+    """
+    Yields the records of an open flow log as DataFrame chunks of at most chunk_rows rows.
+
+    Args:
+        stream: A stream from open_flow_log.
+        columns: The fields to read. Fields the log's format does not have are left out of
+            the chunks, except for the required dstaddr and bytes.
+        log_format: The log's format if it has no header line (see parse_log_format).
+        chunk_rows: Rows per chunk.
+
+    Chunks hold 'bytes' (and 'start'/'end', if requested) as floats, with NaN for the '-'
+    of NODATA/SKIPDATA records; every other field is a string.
+
+    Raises:
+        ValueError: If the format lacks the dstaddr or bytes field.
+    """
+    fields, has_header = _flow_log_fields(stream, log_format)
+    missing = [field for field in REQUIRED_FIELDS if field not in fields]
+    if missing:
+        raise ValueError(f"Flow log format lacks the fields {missing}")
+    columns = [field for field in dict.fromkeys(list(columns) + REQUIRED_FIELDS) if field in fields]
+    numeric = {'bytes', 'start', 'end'}
+    yield from pd.read_csv(
+        stream, sep=' ', header=None, names=fields, usecols=columns,
+        skiprows=1 if has_header else 0, chunksize=chunk_rows,
+        dtype={field: (np.float64 if field in numeric else str) for field in columns},
+        na_values={field: ['-'] for field in columns}, keep_default_na=False, on_bad_lines='skip'
+    )
+
+
+def billable_records(chunk):
+    """
+    Returns the records of a chunk that have both a byte count and a destination address,
+    leaving out NODATA/SKIPDATA records and records whose dstaddr is '-'.
+    """
+    return chunk[chunk['bytes'].notna() & chunk['dstaddr'].notna()]
+
+
+def classify_records(classifier, chunk):
+    """
+    Returns the transfer category of every record of a chunk, as a numpy array. A
+    CidrIndex classifies by destination only; classifiers with classify_columns() (such as
+    cost.ip_index.IpClassificationIndex) classify by source and destination.
+
+    Raises:
+        ValueError: If the classifier needs source addresses and the log has no srcaddr field.
+    """
+    if not hasattr(classifier, 'classify_columns'):
+        return classifier.lookup_column(chunk['dstaddr']).to_numpy()
+    if 'srcaddr' not in chunk:
+        raise ValueError("Classifying by source and destination needs the srcaddr field")
+    return classifier.classify_columns(chunk['srcaddr'], chunk['dstaddr'])
+
+
+def summarize_flow_log(path, log_format=None, classifier=None, chunk_rows=CHUNK_ROWS, s3_client=None):
+    """
+    Totals the bytes of one flow log file (gzip or plain text) per transfer category.
+
+    The file is streamed in chunks of chunk_rows with pandas. Per chunk, bytes are summed
+    per distinct destination address and each distinct address is classified once.
+
+    Args:
+        path: The flow log file, or an 's3://bucket/key' URL (read with s3_client).
+        log_format: The file's format if it has no header line (see parse_log_format).
+        classifier: A CidrIndex labelling destination addresses (DEFAULT_CLASSIFIER by
+            default), or a source-and-destination classifier (see classify_records).
+        chunk_rows: Rows per chunk.
+        s3_client: The S3 client for s3:// URLs.
+
+    Returns:
+        A dictionary with 'files', 'rows', 'skipped_rows' (records without a byte count or
+        a destination address, e.g. NODATA/SKIPDATA) and 'bytes' ({category: total bytes}).
+
+    Raises:
+        ValueError: If the format lacks the dstaddr or bytes field.
+    """
+    classifier = classifier or DEFAULT_CLASSIFIER
+    if hasattr(classifier, 'classify_columns'):
+        return _summarize_by_flow(path, log_format, classifier, chunk_rows, s3_client)
+
+    bytes_by_address = pd.Series(dtype=np.float64)
+    rows = skipped = 0
+    with open_flow_log(path, s3_client) as stream:
+        for chunk in read_flow_log(stream, REQUIRED_FIELDS, log_format, chunk_rows):
+            sizes = chunk['bytes'].to_numpy()
+            codes, uniques = pd.factorize(chunk['dstaddr'].to_numpy())
+            # factorize gives a missing ('-') address the code -1.
+            billable = ~np.isnan(sizes) & (codes >= 0)
+            rows += len(chunk)
+            skipped += int((~billable).sum())
+            chunk_totals = np.bincount(codes[billable], weights=sizes[billable], minlength=len(uniques))
+            bytes_by_address = bytes_by_address.add(pd.Series(chunk_totals, index=uniques), fill_value=0)
+
+    categories = classifier.lookup_many(bytes_by_address.index.to_numpy())
+    totals = bytes_by_address.groupby(categories).sum()
+    totals = {category: int(total) for category, total in totals.items()}
+    return {'files': 1, 'rows': rows, 'skipped_rows': skipped, 'bytes': totals}
+
+
+def _summarize_by_flow(path, log_format, classifier, chunk_rows, s3_client):
+    """summarize_flow_log for classifiers that need both the source and destination address."""
+    totals = {}
+    rows = skipped = 0
+    with open_flow_log(path, s3_client) as stream:
+        for chunk in read_flow_log(stream, ['srcaddr'], log_format, chunk_rows):
+            records = billable_records(chunk)
+            rows += len(chunk)
+            skipped += len(chunk) - len(records)
+            chunk_totals = records['bytes'].groupby(classify_records(classifier, records)).sum()
+            for category, total in chunk_totals.items():
+                totals[category] = totals.get(category, 0) + int(total)
+    return {'files': 1, 'rows': rows, 'skipped_rows': skipped, 'bytes': totals}
+
+
+def merge_summaries(summaries):
+    """Adds up the results of summarize_flow_log for several files."""
+    merged = {'files': 0, 'rows': 0, 'skipped_rows': 0, 'bytes': {}}
+    for summary in summaries:
+        for key in ('files', 'rows', 'skipped_rows'):
+            merged[key] += summary[key]
+        for category, total in summary['bytes'].items():
+            merged['bytes'][category] = merged['bytes'].get(category, 0) + total
+    return merged
+
+
+def transfer_costs(bytes_by_category):
+    """Returns the estimated USD cost per transfer category."""
+    return {k: round(v / (1024 ** 3) * COST_PER_GB.get(k, 0), 2) for k, v in bytes_by_category.items()}
+
+
+def analyze_vpc_transfer_cost(flowlog_path, log_format=None):
+    """Returns the estimated data transfer cost per category of one flow log file."""
+    return transfer_costs(summarize_flow_log(flowlog_path, log_format)['bytes'])
+
+
+def analyze_vpc_transfer_costs(flowlog_paths, log_format=None, max_workers=None):
+    """
+    Summarizes many flow log files in parallel, one worker process per core.
+
+    Args:
+        flowlog_paths: The flow log files.
+        log_format: The format of files without a header line.
+        max_workers: Worker processes (defaults to the number of cores).
+
+    Returns:
+        The merged summary (see summarize_flow_log) plus 'cost' per category.
+    """
+    flowlog_paths = list(flowlog_paths)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(flowlog_paths) or 1)
+    if max_workers == 1:
+        summaries = [summarize_flow_log(path, log_format) for path in flowlog_paths]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            summaries = list(executor.map(summarize_flow_log, flowlog_paths, [log_format] * len(flowlog_paths)))
+    merged = merge_summaries(summaries)
+    merged['cost'] = transfer_costs(merged['bytes'])
+    return merged
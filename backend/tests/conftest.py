@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+# The backend modules are imported as top-level packages (core, cost), as app.py does.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing app opens the result store; keep it out of the source tree.
+os.environ.setdefault('RESULT_STORE', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'results.db')}")
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import pytest
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """Runs a test against moto's in-memory AWS with fake credentials."""
+    moto = pytest.importorskip('moto')
+    for name, value in {'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+                        'AWS_SESSION_TOKEN': 'testing', 'AWS_DEFAULT_REGION': 'us-east-1'}.items():
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        yield
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.client_pool import ClientPool, PooledSession
+
+ROLE_ARN = 'arn:aws:iam::123456789012:role/scanner'
+
+
+@pytest.fixture
+def pool(aws):
+    return ClientPool()
+
+
+@pytest.fixture
+def assume_role_calls(pool):
+    """Counts the AssumeRole calls made through the pool's own STS client."""
+    calls = []
+    pool.get_client('sts').meta.events.register('before-call.sts.AssumeRole', lambda **kwargs: calls.append(1))
+    return calls
+
+
+def _credentials(pool, role_arn=ROLE_ARN):
+    with pool._lock:
+        return pool._get_session_locked(role_arn).get_credentials()
+
+
+def test_clients_are_cached_per_role_region_and_service(pool):
+    iam = pool.get_client('iam')
+    assert pool.get_client('iam') is iam
+    assert PooledSession(pool=pool).client('iam') is iam
+    assert pool.get_client('ec2', region_name='us-east-1') is not pool.get_client('ec2', region_name='eu-west-1')
+    assert pool.get_client('iam', role_arn=ROLE_ARN) is not iam
+
+
+def test_a_role_is_assumed_once_for_all_its_clients(pool, assume_role_calls):
+    session = PooledSession(role_arn=ROLE_ARN, region_name='us-east-1', pool=pool)
+    session.client('iam').list_users()
+    session.client('s3').list_buckets()
+    session.client('ec2', region_name='eu-west-1').describe_vpcs()
+
+    assert len(assume_role_calls) == 1
+    assert pool.call_stats(ROLE_ARN)['iam']['calls'] == 1
+    assert 'iam' not in pool.call_stats()
+
+
+def test_credentials_are_refreshed_before_they_expire(pool, assume_role_calls):
+    client = pool.get_client('iam', role_arn=ROLE_ARN)
+    credentials = _credentials(pool)
+    first_key = credentials.get_frozen_credentials().access_key
+    assert len(assume_role_calls) == 1
+
+    # Inside botocore's mandatory refresh window: the next use assumes the role again.
+    credentials._expiry_time = datetime.now(timezone.utc) + timedelta(minutes=5)
+    client.list_users()
+    assert len(assume_role_calls) == 2
+    assert credentials.get_frozen_credentials().access_key != first_key
+    assert credentials.method == 'cloudguard-assume-role'
+
+
+def test_clearing_a_role_assumes_it_again(pool, assume_role_calls):
+    pool.get_client('iam', role_arn=ROLE_ARN).list_users()
+    iam = pool.get_client('iam')
+    pool.clear(ROLE_ARN)
+    pool.get_client('iam', role_arn=ROLE_ARN).list_users()
+
+    assert len(assume_role_calls) == 2
+    assert pool.get_client('iam') is iam
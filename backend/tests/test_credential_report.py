@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import pytest
+from botocore.exceptions import EndpointConnectionError
+from botocore.stub import Stubber
+
+from core.credential_report import CredentialReport, build_credential_report
+from core.orchestrator import run_task_graph
+from core.registry import GLOBAL, build_tasks, select_checks
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def _row(user, mfa='false', key_rotated='N/A', key_active='false'):
+    return {'user': user, 'arn': f"arn:aws:iam::123456789012:user/{user}", 'user_creation_time': '2020-01-01T00:00:00+00:00',
+            'password_enabled': 'true', 'password_last_changed': '2024-05-01T00:00:00+00:00', 'mfa_active': mfa,
+            'access_key_1_active': key_active, 'access_key_1_last_rotated': key_rotated, 'access_key_2_active': 'false'}
+
+
+def test_records_are_read_from_the_report_rows():
+    report = CredentialReport([_row('alice', mfa='true'),
+                               _row('bob', key_active='true', key_rotated='2023-01-01T00:00:00+00:00')], now=NOW)
+    assert len(report) == 2 and 'alice' in report
+    assert report.get('alice')['MfaActive'] and not report.get('bob')['MfaActive']
+    assert report.password_age_days('alice') == 31
+    assert [key['Slot'] for key in report.access_keys_older_than('bob', 90)] == [1]
+    assert report.access_keys_older_than('alice', 90) == []
+
+
+class _Session:
+    """Hands out one prepared IAM client."""
+    def __init__(self, iam):
+        self.iam = iam
+
+    def client(self, service_name, region_name=None):
+        return self.iam
+
+
+@pytest.fixture
+def iam(aws):
+    client = boto3.client('iam')
+    for user in ('alice', 'bob'):
+        client.create_user(UserName=user)
+    return client
+
+
+def _fail_report_calls(iam, exception):
+    def fail(**kwargs):
+        raise exception
+    iam.meta.events.register('before-call.iam.GenerateCredentialReport', fail)
+
+
+def test_a_connection_error_gives_no_report(iam):
+    _fail_report_calls(iam, EndpointConnectionError(endpoint_url='https://iam.amazonaws.com'))
+    assert build_credential_report(_Session(iam)) is None
+
+
+def test_a_malformed_report_gives_no_report(iam):
+    with Stubber(iam) as stubber:
+        stubber.add_response('generate_credential_report', {'State': 'COMPLETE'})
+        stubber.add_response('get_credential_report', {'Content': b'user,arn\n\xff\xfe\n',
+                                                       'GeneratedTime': NOW - timedelta(minutes=1)})
+        assert build_credential_report(_Session(iam)) is None
+
+
+def test_iam_checks_fall_back_to_per_user_calls_without_a_report(iam):
+    _fail_report_calls(iam, EndpointConnectionError(endpoint_url='https://iam.amazonaws.com'))
+    tasks = build_tasks(_Session(iam), GLOBAL, select_checks(['users_without_mfa', 'aged_iam_keys']))
+    results, timings = run_task_graph(tasks)
+
+    assert timings['credential_report']['status'] == 'ok'
+    assert sorted(results['users_without_mfa']) == ['alice', 'bob']
+    assert results['aged_iam_keys'] == []
@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
+from core import compliance, discovery
+from core.orchestrator import ScanTask, run_task_graph
+
+
+class _Session:
+    """Hands out one prepared IAM client."""
+    def __init__(self, iam):
+        self.iam = iam
+
+    def client(self, service_name, region_name=None):
+        return self.iam
+
+
+def _users(*names):
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [{'UserName': name, 'UserId': f"AIDA{name.upper():0<12}", 'Path': '/',
+             'Arn': f"arn:aws:iam::123456789012:user/{name}", 'CreateDate': created} for name in names]
+
+
+@pytest.fixture
+def iam(aws):
+    client = boto3.client('iam')
+    with Stubber(client) as stubber:
+        yield client, stubber
+
+
+def test_every_page_is_listed(iam):
+    client, stubber = iam
+    stubber.add_response('list_users', {'Users': _users('alice'), 'IsTruncated': True, 'Marker': 'm1'})
+    stubber.add_response('list_users', {'Users': _users('bob'), 'IsTruncated': False}, {'Marker': 'm1'})
+    assert [user['UserName'] for user in discovery.list_iam_users(_Session(client))] == ['alice', 'bob']
+
+
+def test_a_failed_first_page_is_an_empty_listing(iam):
+    client, stubber = iam
+    stubber.add_client_error('list_users', 'AccessDenied')
+    assert discovery.list_iam_users(_Session(client)) == []
+
+
+def test_a_listing_cut_short_raises(iam):
+    client, stubber = iam
+    stubber.add_response('list_users', {'Users': _users('alice'), 'IsTruncated': True, 'Marker': 'm1'})
+    stubber.add_client_error('list_users', 'Throttling')
+    users = discovery.iter_iam_users(_Session(client))
+    assert next(users)['UserName'] == 'alice'
+    with pytest.raises(ClientError):
+        next(users)
+
+
+def test_checks_on_a_listing_cut_short_are_not_reported_as_complete(iam):
+    client, stubber = iam
+    stubber.add_response('list_users', {'Users': _users('alice'), 'IsTruncated': True, 'Marker': 'm1'})
+    stubber.add_client_error('list_users', 'AccessDenied')
+    session = _Session(client)
+    results, timings = run_task_graph([
+        ScanTask('iam_users', discovery.list_iam_users, args=(session,)),
+        ScanTask('users_without_mfa', compliance.check_mfa, ['iam_users'], (session,)),
+    ])
+
+    assert timings['iam_users']['status'] == 'error'
+    assert 'AccessDenied' in results['iam_users']['details']
+    assert timings['users_without_mfa']['status'] == 'skipped'
@@ -0,0 +1,151 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from core import compliance
+
+
+class _Clock:
+    """Stands in for the time module: sleep() advances time() instead of waiting."""
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _error(code, message='', operation='DetectStackDrift'):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+class _CloudFormation:
+    """
+    A CloudFormation client whose drift detection of each stack finishes a given number of
+    seconds after it was started (never, for None).
+    """
+    def __init__(self, clock, durations, drifted=(), throttled_starts=0, throttled_polls=0, unsupported=()):
+        self.clock = clock
+        self.durations = durations
+        self.drifted = set(drifted)
+        self.throttled_starts = throttled_starts
+        self.throttled_polls = throttled_polls
+        self.unsupported = set(unsupported)
+        self.started = {}
+        self.start_times = []
+        self.polls = []
+
+    def detect_stack_drift(self, StackName):
+        if self.throttled_starts:
+            self.throttled_starts -= 1
+            raise _error('Throttling', 'Rate exceeded')
+        if StackName in self.unsupported:
+            raise _error('ValidationError', 'Drift detection is not supported for this stack')
+        self.start_times.append(self.clock.now)
+        self.started[f"detection-{StackName}"] = (StackName, self.clock.now)
+        return {'StackDriftDetectionId': f"detection-{StackName}"}
+
+    def describe_stack_drift_detection_status(self, StackDriftDetectionId):
+        if self.throttled_polls:
+            self.throttled_polls -= 1
+            raise _error('Throttling', 'Rate exceeded', 'DescribeStackDriftDetectionStatus')
+        stack_name, started_at = self.started[StackDriftDetectionId]
+        self.polls.append((self.clock.now, stack_name))
+        duration = self.durations[stack_name]
+        if duration is None or self.clock.now < started_at + duration:
+            return {'DetectionStatus': 'DETECTION_IN_PROGRESS'}
+        return {'DetectionStatus': 'DETECTION_COMPLETE',
+                'StackDriftStatus': 'DRIFTED' if stack_name in self.drifted else 'IN_SYNC'}
+
+
+class _Session:
+    def __init__(self, cfn):
+        self.cfn = cfn
+
+    def client(self, service_name, region_name=None):
+        return self.cfn
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(compliance, 'time', clock)
+    return clock
+
+
+def _stacks(count):
+    return [{'StackName': f"stack-{i}"} for i in range(count)]
+
+
+def test_detections_run_together_instead_of_one_after_another(clock):
+    stacks = _stacks(100)
+    cfn = _CloudFormation(clock, {stack['StackName']: 10 for stack in stacks}, drifted={'stack-7', 'stack-42'})
+
+    result = compliance.check_cloudformation_drift(stacks, _Session(cfn), start_rate_per_sec=50)
+
+    assert sorted(result, key=lambda item: item['StackName']) == [
+        {'StackName': 'stack-42', 'DriftStatus': 'DRIFTED'}, {'StackName': 'stack-7', 'DriftStatus': 'DRIFTED'}]
+    # Every detection is started before the first poll, and each one is polled only a few times.
+    assert max(cfn.start_times) <= min(time for time, _ in cfn.polls)
+    assert len(cfn.polls) < 5 * len(stacks)
+    # Bounded by the starts (2s at 50/s) plus one detection, not by the sum of all detections.
+    assert clock.now - 1000.0 < 20
+
+
+def test_detection_starts_are_rate_limited(clock):
+    stacks = _stacks(10)
+    cfn = _CloudFormation(clock, dict.fromkeys((stack['StackName'] for stack in stacks), 0))
+
+    compliance.check_cloudformation_drift(stacks, _Session(cfn), start_rate_per_sec=2)
+
+    gaps = [later - earlier for earlier, later in zip(cfn.start_times, cfn.start_times[1:])]
+    assert len(gaps) == 9 and min(gaps) >= 0.5
+
+
+def test_stacks_still_running_at_the_deadline_are_reported_as_pending(clock):
+    stacks = _stacks(3)
+    cfn = _CloudFormation(clock, {'stack-0': 5, 'stack-1': None, 'stack-2': None}, drifted={'stack-0'})
+
+    result = compliance.check_cloudformation_drift(stacks, _Session(cfn), max_wait_sec=60, start_rate_per_sec=10)
+
+    assert result == [{'StackName': 'stack-0', 'DriftStatus': 'DRIFTED'},
+                      {'StackName': 'stack-1', 'DriftStatus': 'DETECTION_PENDING'},
+                      {'StackName': 'stack-2', 'DriftStatus': 'DETECTION_PENDING'}]
+    assert clock.now - 1000.0 <= 60
+
+
+def test_stacks_not_started_before_the_deadline_are_reported_as_pending(clock):
+    stacks = _stacks(5)
+    cfn = _CloudFormation(clock, dict.fromkeys((stack['StackName'] for stack in stacks), 0))
+
+    result = compliance.check_cloudformation_drift(stacks, _Session(cfn), max_wait_sec=2, start_rate_per_sec=1)
+
+    # The budget ran out while starting detections, so none of them was polled either.
+    assert len(cfn.start_times) < 5 and not cfn.polls
+    assert [item['DriftStatus'] for item in result] == ['DETECTION_PENDING'] * 5
+    assert {item['StackName'] for item in result} == {stack['StackName'] for stack in stacks}
+
+
+def test_the_poll_interval_backs_off_while_nothing_completes(clock):
+    stacks = _stacks(1)
+    cfn = _CloudFormation(clock, {'stack-0': 100}, throttled_polls=1)
+
+    assert compliance.check_cloudformation_drift(stacks, _Session(cfn), start_rate_per_sec=10) == []
+
+    poll_sleeps = [seconds for seconds in clock.sleeps if seconds >= compliance.DRIFT_POLL_MIN_INTERVAL_SEC]
+    assert poll_sleeps[:5] == [2, 4, 8, 16, 30]
+    assert max(poll_sleeps) == compliance.DRIFT_POLL_MAX_INTERVAL_SEC
+
+
+def test_throttled_starts_are_retried_and_unsupported_stacks_skipped(clock):
+    stacks = _stacks(2)
+    cfn = _CloudFormation(clock, {'stack-0': 0, 'stack-1': 0}, drifted={'stack-0'}, throttled_starts=2,
+                          unsupported={'stack-1'})
+
+    result = compliance.check_cloudformation_drift(stacks, _Session(cfn), start_rate_per_sec=10)
+
+    assert result == [{'StackName': 'stack-0', 'DriftStatus': 'DRIFTED'}]
+    assert list(cfn.started) == ['detection-stack-0']
@@ -0,0 +1,91 @@
+import gzip
+
+import pytest
+
+from cost import flow_log_ingest, vpc_log_parser
+from cost.ip_index import CROSS_AZ, CROSS_REGION, INTERNET, SAME_AZ, IpClassificationIndex
+
+HEADER = ' '.join(vpc_log_parser.DEFAULT_LOG_FORMAT)
+
+
+def _record(src, dst, size, status='OK'):
+    return f"2 123456789012 eni-1 {src} {dst} 1024 443 6 1 {size} 1700000000 1700000060 ACCEPT {status}"
+
+
+RECORDS = [
+    _record('10.0.0.1', '8.8.8.8', 700),
+    _record('10.0.0.1', '10.0.1.5', 300),
+    _record('10.0.0.1', '8.8.8.8', 50),
+    # Bytes without a destination, and a NODATA record.
+    _record('10.0.0.1', '-', 500),
+    "2 123456789012 eni-1 - - - - - - - 1700000000 1700000060 - NODATA",
+]
+
+
+@pytest.fixture
+def flow_log(tmp_path):
+    def write(records, header=True, compress=False, chunk_rows=None):
+        path = tmp_path / ('flow.log.gz' if compress else 'flow.log')
+        text = '\n'.join(([HEADER] if header else []) + records) + '\n'
+        if compress:
+            with gzip.open(path, 'wt') as f:
+                f.write(text)
+        else:
+            path.write_text(text)
+        return str(path)
+    return write
+
+
+@pytest.mark.parametrize('header, compress', [(True, False), (False, False), (True, True)])
+def test_bytes_are_totalled_per_category(flow_log, header, compress):
+    summary = vpc_log_parser.summarize_flow_log(flow_log(RECORDS, header, compress), chunk_rows=2)
+    assert summary == {'files': 1, 'rows': 5, 'skipped_rows': 2, 'bytes': {'internet': 750, 'intra_vpc': 300}}
+
+
+def test_a_log_of_only_unbillable_records_has_no_bytes(flow_log):
+    summary = vpc_log_parser.summarize_flow_log(flow_log(RECORDS[3:]))
+    assert summary == {'files': 1, 'rows': 2, 'skipped_rows': 2, 'bytes': {}}
+
+
+def test_a_custom_format_without_the_required_fields_is_rejected(flow_log):
+    path = flow_log(['10.0.0.1 443'], header=False)
+    with pytest.raises(ValueError, match='dstaddr'):
+        vpc_log_parser.summarize_flow_log(path, log_format='${srcaddr} ${dstport}')
+
+
+def test_flows_are_classified_by_subnet_az_and_region(flow_log):
+    index = IpClassificationIndex(
+        ip_ranges=[('52.95.0.0/16', 'us-east-1'), ('3.5.0.0/16', 'eu-west-1')],
+        subnets=[('10.0.0.0/24', 'use1-az1', 'us-east-1'), ('10.0.1.0/24', 'use1-az2', 'us-east-1'),
+                 ('10.0.2.0/24', 'use1-az1', 'us-east-1'), ('10.1.0.0/24', 'euw1-az1', 'eu-west-1')],
+        home_region='us-east-1',
+    )
+    assert index.classify('10.0.0.1', '10.0.2.1') == SAME_AZ
+    assert index.classify('10.0.0.1', '10.0.1.1') == CROSS_AZ
+    assert index.classify('10.0.0.1', '10.1.0.1') == CROSS_REGION
+    assert index.classify('10.0.0.1', '52.95.1.1') == CROSS_AZ
+    assert index.classify('10.0.0.1', '3.5.1.1') == CROSS_REGION
+    assert index.classify('10.0.0.1', '8.8.8.8') == INTERNET
+
+    summary = vpc_log_parser.summarize_flow_log(flow_log(RECORDS), classifier=index)
+    assert summary['skipped_rows'] == 2
+    assert summary['bytes'] == {INTERNET: 750, CROSS_AZ: 300}
+
+
+def test_ingest_aggregates_per_interface_and_hour(flow_log):
+    partial = flow_log_ingest.aggregate_flow_logs([flow_log(RECORDS), 'missing.log'])
+    assert partial['files'] == 1 and partial['skipped_rows'] == 2
+    assert [source for source, _ in partial['failed']] == ['missing.log']
+    assert partial['bytes'] == {
+        (None, None, 'eni-1', 'internet', 1699999200.0): 750,
+        (None, None, 'eni-1', 'intra_vpc', 1699999200.0): 300,
+    }
+
+
+def test_costs_are_per_gigabyte():
+    merged = vpc_log_parser.merge_summaries([
+        {'files': 1, 'rows': 2, 'skipped_rows': 0, 'bytes': {'internet': 1024 ** 3}},
+        {'files': 1, 'rows': 1, 'skipped_rows': 1, 'bytes': {'internet': 1024 ** 3, 'intra_vpc': 5}},
+    ])
+    assert merged == {'files': 2, 'rows': 3, 'skipped_rows': 1, 'bytes': {'internet': 2 * 1024 ** 3, 'intra_vpc': 5}}
+    assert vpc_log_parser.transfer_costs(merged['bytes']) == {'internet': 0.18, 'intra_vpc': 0.0}
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.incremental import IncrementalScan
+from core.result_store import SQLiteResultStore
+from core.snapshot_index import SnapshotIndex
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteResultStore(str(tmp_path / 'results.db'))
+
+
+class _DriftCheck:
+    """Stands in for check_cloudformation_drift, recording which stacks it was asked to detect."""
+    __name__ = 'check_cloudformation_drift'
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.detected = []
+
+    def __call__(self, stacks, session=None):
+        names = [stack['StackName'] for stack in stacks]
+        self.detected.append(names)
+        return [{'StackName': name, 'DriftStatus': self.statuses[name]} for name in names if self.statuses.get(name)]
+
+
+def _stack(name, updated='2024-01-01'):
+    return {'StackId': f"arn:aws:cloudformation:us-east-1:123456789012:stack/{name}/1", 'StackName': name,
+            'StackStatus': 'UPDATE_COMPLETE', 'LastUpdatedTime': updated}
+
+
+def _rescan(store, check, stacks, region='us-east-1', full=False):
+    incremental = IncrementalScan(store, '123456789012', force_full=full)
+    findings = incremental.wrap('cloudformation_drift_status', check, region)(stacks)
+    incremental.save()
+    return findings, incremental.metadata()
+
+
+def test_unchanged_stacks_reuse_their_drift_result_without_detection(store):
+    check = _DriftCheck({'app': 'DRIFTED'})
+    stacks = [_stack('app'), _stack('db')]
+    _rescan(store, check, stacks)
+
+    findings, metadata = _rescan(store, check, [_stack('app'), _stack('db', updated='2024-02-01'), _stack('new')])
+    assert check.detected == [['app', 'db'], ['db', 'new']]
+    assert findings == [{'StackName': 'app', 'DriftStatus': 'DRIFTED'}]
+    assert metadata['checks']['cloudformation_drift_status@us-east-1'] == {
+        'evaluated': 2, 'reused': 1, 'saves_api_calls': True
+    }
+    assert metadata['api_call_reuse_ratio'] == metadata['reuse_ratio'] == 0.333
+
+
+def test_a_pending_detection_is_not_reused(store):
+    check = _DriftCheck({'app': 'DETECTION_PENDING'})
+    _rescan(store, check, [_stack('app')])
+    _rescan(store, check, [_stack('app')])
+    assert check.detected == [['app'], ['app']]
+
+
+def test_state_is_kept_per_region_and_a_full_scan_ignores_it(store):
+    check = _DriftCheck({})
+    _rescan(store, check, [_stack('app')], region='us-east-1')
+    _rescan(store, check, [_stack('app')], region='eu-west-1')
+    _rescan(store, check, [_stack('app')], region='us-east-1', full=True)
+    assert check.detected == [['app'], ['app'], ['app']]
+    _rescan(store, check, [_stack('app')], region='eu-west-1')
+    assert len(check.detected) == 3
+
+
+def test_reuse_that_still_reads_state_is_not_counted_as_saving_calls(store):
+    now = datetime.now(timezone.utc)
+    index = SnapshotIndex([{'SnapshotId': 'snap-1', 'VolumeId': 'vol-1', 'StartTime': now - timedelta(days=1)}])
+    volumes = [{'VolumeId': 'vol-1', 'Size': 8}, {'VolumeId': 'vol-2', 'Size': 8}]
+
+    def check_backups(ebs_volumes, session=None, snapshot_index=None):
+        return [{'VolumeId': vol['VolumeId']} for vol in ebs_volumes if not snapshot_index.has_recent_snapshot(
+            vol['VolumeId'], 7)]
+
+    for _ in range(2):
+        incremental = IncrementalScan(store, '123456789012')
+        findings = incremental.wrap('ebs_volumes_without_backup', check_backups, 'us-east-1')(
+            volumes, snapshot_index=index)
+        incremental.save()
+
+    assert findings == [{'VolumeId': 'vol-2'}]
+    metadata = incremental.metadata()
+    assert metadata['reuse_ratio'] == 1.0
+    assert metadata['resources_reused_without_api_calls'] == 0
+    assert metadata['api_call_reuse_ratio'] == 0.0
@@ -0,0 +1,45 @@
+import boto3
+import pytest
+
+from core.client_pool import ClientPool
+from core.instrumentation import ApiMetrics, CallRecorder, ScanProfile
+
+
+@pytest.fixture
+def s3(aws):
+    client = boto3.client('s3', region_name='us-east-1')
+    client.create_bucket(Bucket='flow-logs')
+    client.put_object(Bucket='flow-logs', Key='flow.log', Body=b'hello world')
+    return client
+
+
+def test_a_pooled_streaming_body_is_left_for_the_caller(s3):
+    client = ClientPool().get_client('s3', region_name='us-east-1')
+    assert client.get_object(Bucket='flow-logs', Key='flow.log')['Body'].read() == b'hello world'
+
+
+def test_calls_are_recorded_per_task_and_operation(s3):
+    metrics = ApiMetrics()
+    CallRecorder(metrics).attach(s3)
+    profile = ScanProfile()
+    with profile.task('vpc_flow_logs'):
+        body = s3.get_object(Bucket='flow-logs', Key='flow.log')['Body'].read()
+    s3.list_objects_v2(Bucket='flow-logs')
+
+    assert body == b'hello world'
+    profiled = profile.as_dict()
+    assert list(profiled['checks']) == ['vpc_flow_logs']
+    get_object = profiled['operations']['s3.GetObject']
+    assert get_object['calls'] == 1
+    # Taken from Content-Length without reading the body.
+    assert get_object['bytes_received'] == len(b'hello world')
+    assert get_object['errors'] == 0
+
+
+def test_failed_calls_record_the_error_code(s3):
+    profile = ScanProfile()
+    CallRecorder(ApiMetrics()).attach(s3)
+    with profile.task('public_s3_buckets'), pytest.raises(s3.exceptions.NoSuchKey):
+        s3.get_object(Bucket='flow-logs', Key='missing')
+    operation = profile.as_dict()['operations']['s3.GetObject']
+    assert operation['calls'] == 1 and operation['errors'] == 1
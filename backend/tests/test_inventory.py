@@ -0,0 +1,90 @@
+from datetime import datetime, timezone
+
+import boto3
+import pandas as pd
+import pytest
+
+from core.inventory import (
+    ARROW, JSONL, PARQUET, inventory_format, iter_resources, open_inventory, query_inventory, write_inventory
+)
+
+pytest.importorskip('pyarrow')
+
+CREATED = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+
+def _resources():
+    for i in range(7):
+        yield 'ebs_volume', 'us-east-1' if i % 2 else 'eu-west-1', {
+            'VolumeId': f"vol-{i}", 'State': 'available', 'VolumeType': 'gp3', 'Size': 8 * (i + 1),
+            'CreateTime': CREATED, 'Tags': [{'Key': 'Name', 'Value': f"data-{i}"}, {'Key': 'team', 'Value': 'core'}],
+        }
+    yield 'ec2_instance', 'us-east-1', {'InstanceId': 'i-1', 'State': {'Name': 'running'}, 'VpcId': 'vpc-1',
+                                        'InstanceType': 't3.micro', 'LaunchTime': CREATED}
+    yield 's3_bucket', 'eu-west-1', {'Name': 'flow-logs', 'CreationDate': CREATED}
+    yield 'iam_user', None, {'UserName': 'alice', 'Arn': 'arn:aws:iam::123456789012:user/alice', 'Path': '/'}
+
+
+@pytest.fixture(params=[ARROW, PARQUET, JSONL])
+def inventory(request, tmp_path):
+    path = str(tmp_path / f"inventory.{ {ARROW: 'arrow', PARQUET: 'parquet', JSONL: 'jsonl.gz'}[request.param] }")
+    # Small batches, so the volumes span several record batches (and dictionary deltas), and
+    # vpc_id is all null in the first one.
+    return path, write_inventory(_resources(), path, batch_rows=3)
+
+
+def test_every_resource_is_written_and_counted(inventory):
+    path, summary = inventory
+    assert summary['format'] == inventory_format(path)
+    assert summary['resources'] == {'ebs_volume': 7, 'ec2_instance': 1, 's3_bucket': 1, 'iam_user': 1}
+    assert len(query_inventory(path)) == 10
+
+
+def test_queries_filter_by_type_and_region_and_keep_column_values(inventory):
+    path, _ = inventory
+    volumes = query_inventory(path, resource_type='ebs_volume', region='us-east-1')
+    assert list(volumes['resource_id']) == ['vol-1', 'vol-3', 'vol-5']
+    assert list(volumes['size']) == [16, 32, 48]
+    assert volumes['tags'].iloc[0] == {'Name': 'data-1', 'team': 'core'}
+    assert set(volumes['kind']) == {'gp3'}
+    assert pd.Timestamp(volumes['created_at'].iloc[0]) == pd.Timestamp(CREATED)
+
+    user = query_inventory(path, resource_type='iam_user', columns=['resource_id', 'region', 'size', 'tags'])
+    assert list(user.columns) == ['resource_id', 'region', 'size', 'tags']
+    assert user['resource_id'].tolist() == ['alice']
+    assert user[['region', 'size', 'tags']].isna().all(axis=None)
+
+
+def test_arrow_inventories_are_memory_mapped_with_dictionary_encoded_columns(tmp_path):
+    import pyarrow as pa
+
+    path = str(tmp_path / 'inventory.arrow')
+    write_inventory(_resources(), path, batch_rows=3)
+    table = open_inventory(path, columns=['resource_type', 'region', 'resource_id'])
+
+    assert pa.types.is_dictionary(table.schema.field('resource_type').type)
+    assert table.num_rows == 10
+    assert table.column('resource_type').to_pylist().count('ebs_volume') == 7
+    assert table.column('region').to_pylist()[-1] is None
+
+
+def test_unknown_suffixes_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        write_inventory(_resources(), str(tmp_path / 'inventory.csv'))
+
+
+def test_discovered_resources_go_straight_into_the_inventory(aws, tmp_path):
+    session = boto3.Session(region_name='us-east-1')
+    session.client('iam').create_user(UserName='alice')
+    session.client('s3').create_bucket(Bucket='flow-logs')
+    ec2 = session.client('ec2')
+    ec2.create_volume(AvailabilityZone='us-east-1a', Size=20, VolumeType='gp3',
+                      TagSpecifications=[{'ResourceType': 'volume', 'Tags': [{'Key': 'Name', 'Value': 'data'}]}])
+
+    path = str(tmp_path / 'inventory.parquet')
+    summary = write_inventory(iter_resources(session, resource_types={'iam_user', 's3_bucket', 'ebs_volume'}), path)
+
+    assert summary['resources'] == {'iam_user': 1, 's3_bucket': 1, 'ebs_volume': 1}
+    volume = query_inventory(path, resource_type='ebs_volume').iloc[0]
+    assert (volume['region'], volume['size'], volume['name']) == ('us-east-1', 20, 'data')
+    assert query_inventory(path, resource_type='iam_user')['arn'].iloc[0].endswith(':user/alice')
@@ -0,0 +1,50 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """Records the scan jobs the endpoint submits instead of running them."""
+    calls = []
+
+    def submit(scope, **params):
+        calls.append(dict(params, scope=scope))
+        return {'job_id': 'job-1', 'status': 'queued'}, True
+
+    monkeypatch.setattr(app.scan_jobs, 'submit', submit)
+    return calls
+
+
+def test_body_strings_are_parsed_as_the_query_string_is(submitted):
+    client = app.app.test_client()
+    response = client.post('/api/scan/jobs', json={'full': 'false', 'region_concurrency': '4', 'regions': 'us-east-1'})
+    assert response.status_code == 202
+    client.post('/api/scan/jobs', query_string={'full': 'false', 'region_concurrency': '4', 'regions': 'us-east-1'})
+    assert submitted[0] == submitted[1] == {'scope': 'all_findings:us-east-1', 'regions': 'us-east-1',
+                                            'region_concurrency': 4, 'full': False, 'checks': None}
+
+
+def test_body_values_override_the_query_string(submitted):
+    client = app.app.test_client()
+    client.post('/api/scan/jobs', query_string={'full': 'false', 'checks': 'cloudtrail_status'},
+                json={'full': True, 'checks': ['users_without_mfa', 'aged_iam_keys'], 'regions': ['eu-west-1']})
+    assert submitted == [{'scope': 'all_findings:eu-west-1|checks=aged_iam_keys,users_without_mfa',
+                          'regions': 'eu-west-1', 'region_concurrency': None, 'full': True,
+                          'checks': ['aged_iam_keys', 'users_without_mfa']}]
+
+
+@pytest.mark.parametrize('body', [
+    {'full': 1},
+    {'region_concurrency': 'four'},
+    {'region_concurrency': True},
+    {'region_concurrency': 2.5},
+    {'checks': {'users_without_mfa': True}},
+    {'regions': ['us-east-1', 2]},
+    ['full'],
+])
+def test_wrongly_typed_body_values_are_rejected(submitted, body):
+    response = app.app.test_client().post('/api/scan/jobs', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert submitted == []
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from core.orchestrator import ScanTask, run_task_graph
+
+
+def _fail():
+    raise RuntimeError('boom')
+
+
+def test_results_are_passed_to_dependents():
+    tasks = [
+        ScanTask('users', lambda: ['alice', 'bob']),
+        ScanTask('config', lambda: {'max': 1}),
+        ScanTask('check', lambda users, suffix, config=None: [u + suffix for u in users][:config['max']],
+                 inputs=['users'], args=['!'], kwarg_inputs={'config': 'config'}),
+    ]
+    results, timings = run_task_graph(tasks, max_workers=2)
+    assert results['check'] == ['alice!']
+    assert {name: timing['status'] for name, timing in timings.items()} == {
+        'users': 'ok', 'config': 'ok', 'check': 'ok'
+    }
+
+
+def test_dependents_of_a_failed_task_are_skipped():
+    ran = []
+    tasks = [
+        ScanTask('discovery', _fail),
+        ScanTask('check', lambda items: ran.append('check'), inputs=['discovery']),
+        ScanTask('downstream', lambda result: ran.append('downstream'), inputs=['check']),
+        ScanTask('independent', lambda: 'ok'),
+    ]
+    results, timings = run_task_graph(tasks)
+
+    assert ran == []
+    assert timings['discovery']['status'] == 'error'
+    assert results['discovery']['details'] == 'boom'
+    assert timings['check']['status'] == 'skipped'
+    assert results['check']['details'] == 'Dependency failed: discovery'
+    # A skipped task fails its own dependents in turn.
+    assert timings['downstream']['status'] == 'skipped'
+    assert results['independent'] == 'ok'
+
+
+def test_tasks_not_started_by_the_deadline_time_out():
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return 'slow'
+
+    def open_gate():
+        time.sleep(0.2)
+        release.set()
+
+    deadline = time.time() + 0.1
+    tasks = [
+        ScanTask('slow', slow),
+        ScanTask('after_slow', lambda value: value, inputs=['slow']),
+    ]
+    threading.Thread(target=open_gate).start()
+    results, timings = run_task_graph(tasks, deadline=deadline)
+
+    # The running task finishes; the one that would start after the deadline does not run.
+    assert results['slow'] == 'slow'
+    assert timings['after_slow'] == {'status': 'timeout'}
+    assert results['after_slow']['error'] == 'Timed out before running check: after_slow'
+
+
+def test_on_task_done_sees_every_task_with_its_result():
+    seen = {}
+    tasks = [ScanTask('a', lambda: 1), ScanTask('b', lambda a: a + 1, inputs=['a'])]
+    run_task_graph(tasks, on_task_done=lambda name, timing, result: seen.setdefault(name, (timing['status'], result)))
+    assert seen == {'a': ('ok', 1), 'b': ('ok', 2)}
+
+
+@pytest.mark.parametrize('tasks, message', [
+    ([ScanTask('a', lambda b: b, inputs=['b']), ScanTask('b', lambda a: a, inputs=['a'])], 'cycle'),
+    ([ScanTask('a', lambda a: a, kwarg_inputs={'a': 'a'})], 'cycle'),
+    ([ScanTask('a', lambda x: x, inputs=['missing'])], 'unknown task missing'),
+    ([ScanTask('a', lambda: 1), ScanTask('a', lambda: 2)], 'Duplicate'),
+])
+def test_invalid_graphs_are_rejected_before_anything_runs(tasks, message):
+    with pytest.raises(ValueError, match=message):
+        run_task_graph(tasks)
@@ -0,0 +1,133 @@
+import itertools
+
+import pytest
+
+from app import decode_cursor, encode_cursor
+from core.result_store import FINDING_SORT_KEYS, SQLiteResultStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteResultStore(str(tmp_path / 'results.db'))
+
+
+def _volume(i, region):
+    volume = {'VolumeId': f"vol-{i % 4}", 'Region': region}
+    # Repeated resource IDs and missing creation times make ties and NULL sort values.
+    if i % 3:
+        volume['CreateTime'] = f"2024-01-{1 + i % 5:02d}T00:00:00+00:00"
+    return volume
+
+
+@pytest.fixture
+def scan_ids(store):
+    ids = []
+    for scan in range(2):
+        volumes = [_volume(i, ['us-east-1', 'eu-west-1', None][i % 3]) for i in range(scan, scan + 11)]
+        ids.append(store.save_scan({'scan_metadata': {}, 'cost_optimization': {'unattached_ebs_volumes': volumes}},
+                                   'all_findings', account_id='111', region='us-west-2'))
+    return ids
+
+
+def _pages(store, scan_ids, sort, descending, limit):
+    after, pages = None, []
+    while True:
+        rows, total = store.query_finding_items('unattached_ebs_volumes', scan_ids, sort=sort,
+                                                descending=descending, after=after, limit=limit)
+        if not rows:
+            return pages, total
+        pages.append(rows)
+        # The cursor makes the same round trip as through the API.
+        after = decode_cursor(encode_cursor(sort, descending, rows[-1]['cursor']), sort, descending)
+
+
+@pytest.mark.parametrize('sort, descending', list(itertools.product(FINDING_SORT_KEYS, [False, True])))
+def test_pages_cover_every_finding_once_in_order(store, scan_ids, sort, descending):
+    everything, total = store.query_finding_items('unattached_ebs_volumes', scan_ids, sort=sort,
+                                                  descending=descending, limit=1000)
+    assert total == len(everything) == 22
+
+    pages, page_total = _pages(store, scan_ids, sort, descending, limit=3)
+    paged = [row for page in pages for row in page]
+    assert page_total == total
+    assert [len(page) for page in pages] == [3] * 7 + [1]
+    assert [(row['scan_id'], row['item']) for row in paged] == [(row['scan_id'], row['item']) for row in everything]
+
+
+def test_pages_do_not_shift_when_findings_are_added(store, scan_ids):
+    first, _ = store.query_finding_items('unattached_ebs_volumes', scan_ids[:1], sort='resource_id', limit=4)
+    rest, _ = store.query_finding_items('unattached_ebs_volumes', scan_ids[:1], sort='resource_id',
+                                        after=first[-1]['cursor'], limit=100)
+    # A later scan with findings sorting before the cursor does not move the next page.
+    later = store.save_scan({'scan_metadata': {}, 'cost_optimization': {'unattached_ebs_volumes': [
+        {'VolumeId': 'vol-0'}, {'VolumeId': 'vol-00'}]}}, 'all_findings', account_id='111')
+    after_insert, _ = store.query_finding_items('unattached_ebs_volumes', [scan_ids[0], later], sort='resource_id',
+                                                after=first[-1]['cursor'], limit=100)
+    assert [row['item'] for row in after_insert if row['scan_id'] == scan_ids[0]] == [row['item'] for row in rest]
+
+
+def test_filters_apply_to_every_page(store, scan_ids):
+    rows, total = store.query_finding_items('unattached_ebs_volumes', scan_ids, regions=['eu-west-1'], limit=2)
+    assert total == 8
+    assert all(row['region'] == 'eu-west-1' for row in rows)
+    # Findings without a region of their own get the region of a single-region scan.
+    _, total = store.query_finding_items('unattached_ebs_volumes', scan_ids, regions=['us-west-2'])
+    assert total == 7
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('created_at', True, [1704067200.0, 3, 7])
+    assert '=' not in cursor
+    assert decode_cursor(cursor, 'created_at', True) == [1704067200.0, 3, 7]
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor!', encode_cursor('region', False, ['us-east-1', 1, 0])[:-3]])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_cursor(cursor, 'region', False)
+
+
+def test_a_cursor_of_another_sort_order_is_rejected():
+    cursor = encode_cursor('region', False, ['us-east-1', 1, 0])
+    with pytest.raises(ValueError, match='another sort order'):
+        decode_cursor(cursor, 'region', True)
+    with pytest.raises(ValueError, match='another sort order'):
+        decode_cursor(cursor, 'resource_id', False)
+
+
+def test_list_results_are_stored_once_and_read_back_whole(store):
+    instances = [{'DBInstanceIdentifier': 'db-1', 'IsMultiAZ': True},
+                 {'DBInstanceIdentifier': 'db-2', 'IsMultiAZ': False}]
+    data = {'scan_metadata': {}, 'reliability': {'rds_multi_az_status': instances},
+            'security': {'users_without_mfa': []}}
+    scan_id = store.save_scan(data, 'all_findings', account_id='111')
+
+    assert store.get_scan(scan_id)['data'] == data
+    assert list(store.iter_check_results(scan_id, {'rds_multi_az_status'})) == [
+        ('reliability', 'rds_multi_az_status', 1, instances)]
+    # Only the items that are findings are listed.
+    rows, total = store.query_finding_items('rds_multi_az_status', [scan_id])
+    assert total == 1 and [row['item'] for row in rows] == instances[1:]
+    assert store._conn.execute("SELECT COUNT(*) FROM findings WHERE result IS NOT NULL").fetchone()[0] == 0
+
+
+def test_the_dashboard_endpoints_page_findings_without_the_whole_scan(store, scan_ids, monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'result_store', store)
+    client = app.app.test_client()
+
+    summary = client.get('/api/findings/summary').get_json()
+    assert summary['checks']['unattached_ebs_volumes']['finding_count'] == 11
+    assert summary['scan_metadata'] == {}
+
+    items, cursor = [], None
+    while True:
+        page = client.get('/api/checks/unattached_ebs_volumes/findings',
+                          query_string={'limit': 4, **({'cursor': cursor} if cursor else {})}).get_json()
+        items += page['items']
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    # Only the latest scan of the account is read.
+    assert page['total'] == len(items) == 11
+    assert {item['AccountId'] for item in items} == {'111'}
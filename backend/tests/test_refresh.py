@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+import app
+from core import registry
+from core.jobs import ScanJobManager, ScanProgress
+
+CHECKS = ['cloudtrail_status', 'users_without_mfa']
+
+
+def _data(results, refreshed_at):
+    data = {'scan_metadata': {'checks': list(results), 'check_refreshed_at': dict.fromkeys(results, refreshed_at)}}
+    for name, result in results.items():
+        data.setdefault(registry.CHECKS[name].pillar, {})[name] = result
+    return data
+
+
+def _stored(results, finished_at):
+    return {'scan_id': 1, 'finished_at': finished_at, 'data': _data(results, finished_at)}
+
+
+def test_check_expiry_uses_each_checks_ttl():
+    now = time.time()
+    stored = _stored({'cloudtrail_status': [], 'users_without_mfa': []}, now)
+    assert app.check_expiry(stored) == {
+        'cloudtrail_status': now + registry.CHECKS['cloudtrail_status'].ttl,
+        'users_without_mfa': now + app.CACHE_TTL,
+    }
+    # A failed check is retried after CACHE_TTL whatever its own TTL.
+    stored['data']['security']['cloudtrail_status'] = {'error': 'Failed to run check: cloudtrail_status'}
+    assert app.check_expiry(stored)['cloudtrail_status'] == now + app.CACHE_TTL
+
+
+def test_merge_refresh_carries_unexpired_checks_with_their_refresh_time():
+    previous = _data({'cloudtrail_status': [{'IsLogging': True}], 'users_without_mfa': ['alice']}, 100.0)
+    refreshed = _data({'users_without_mfa': ['bob']}, 200.0)
+    merged = app.merge_refresh(previous, refreshed, CHECKS)
+
+    assert merged['security'] == {'cloudtrail_status': [{'IsLogging': True}], 'users_without_mfa': ['bob']}
+    assert merged['scan_metadata']['checks'] == CHECKS
+    assert merged['scan_metadata']['refreshed_checks'] == ['users_without_mfa']
+    assert merged['scan_metadata']['check_refreshed_at'] == {'cloudtrail_status': 100.0, 'users_without_mfa': 200.0}
+    # Refreshing again keeps the time the carried result was produced.
+    again = app.merge_refresh(merged, _data({'users_without_mfa': []}, 300.0), CHECKS)
+    assert again['scan_metadata']['check_refreshed_at']['cloudtrail_status'] == 100.0
+
+
+def test_merge_refresh_leaves_out_checks_outside_the_selection():
+    previous = _data({'cloudtrail_status': [], 'users_without_mfa': ['alice']}, 100.0)
+    merged = app.merge_refresh(previous, _data({'users_without_mfa': []}, 200.0), ['users_without_mfa'])
+    assert merged['security'] == {'users_without_mfa': []}
+
+
+@pytest.fixture
+def refresh_scan(monkeypatch):
+    """Runs run_scan_job with refresh against a stored scan finished an hour and a minute ago."""
+    finished_at = time.time() - app.CACHE_TTL - 60
+    previous = _stored({'cloudtrail_status': [{'IsLogging': True}], 'users_without_mfa': ['alice']}, finished_at)
+    scanned, saved = [], []
+
+    def run_scan(session, checks=None, **kwargs):
+        scanned.extend(check.name for check in checks)
+        return _data({check.name: ['bob'] for check in checks}, time.time())
+
+    monkeypatch.setattr(app, 'load_latest_scan', lambda scope: previous)
+    monkeypatch.setattr(app, 'get_aws_session', lambda: None)
+    monkeypatch.setattr(app, 'resolve_scan_regions', lambda session, regions: regions)
+    monkeypatch.setattr(app, 'run_scan', run_scan)
+    monkeypatch.setattr(app, 'save_scan', lambda scope, data: saved.append(data) or 2)
+
+    progress = ScanProgress()
+    scan_id = app.run_scan_job('all_findings', progress, checks=CHECKS, refresh=True)
+    return scan_id, scanned, saved, progress.events
+
+
+def test_refresh_scans_only_expired_checks(refresh_scan):
+    scan_id, scanned, saved, events = refresh_scan
+    assert scan_id == 2
+    assert scanned == ['users_without_mfa']
+    assert saved[0]['security'] == {'cloudtrail_status': [{'IsLogging': True}], 'users_without_mfa': ['bob']}
+    # The carried result is streamed before the refresh.
+    first, _ = events.read(0)
+    assert first[0]['check'] == 'cloudtrail_status'
+
+
+def test_full_scans_do_not_join_refresh_jobs():
+    release = threading.Event()
+
+    def run_job(scope, progress, **options):
+        release.wait(5)
+        return 1
+
+    jobs = ScanJobManager(run_job, max_workers=3, queue_size=0)
+    refresh, created = jobs.submit('all_findings', refresh=True)
+    assert created
+    joined, created = jobs.submit('all_findings', refresh=True)
+    assert not created and joined['job_id'] == refresh['job_id']
+    full, created = jobs.submit('all_findings', full=True)
+    assert created and full['job_id'] != refresh['job_id']
+    plain, created = jobs.submit('all_findings')
+    assert created and plain['job_id'] not in (refresh['job_id'], full['job_id'])
+    release.set()
+    for job in (refresh, full, plain):
+        assert jobs.wait(job['job_id'], timeout=5)['status'] == 'complete'
@@ -0,0 +1,58 @@
+from core.findings import count_findings, iter_finding_items
+from core.regions import merge_regional_results, run_per_region
+
+
+def test_list_results_are_concatenated_and_tagged_with_their_region():
+    merged, errors = merge_regional_results({
+        'us-east-1': {'vpcs_without_flow_logs': ['vpc-1'], 'unattached_ebs_volumes': [{'VolumeId': 'vol-1'}]},
+        'eu-west-1': {'vpcs_without_flow_logs': ['vpc-2'], 'unattached_ebs_volumes': []},
+    })
+    assert errors == {}
+    assert merged['vpcs_without_flow_logs'] == [{'ResourceId': 'vpc-1', 'Region': 'us-east-1'},
+                                                {'ResourceId': 'vpc-2', 'Region': 'eu-west-1'}]
+    assert merged['unattached_ebs_volumes'] == [{'VolumeId': 'vol-1', 'Region': 'us-east-1'}]
+    # The region of every finding reaches the finding index.
+    assert [region for region, _ in iter_finding_items('vpcs_without_flow_logs', merged['vpcs_without_flow_logs'])] \
+        == ['us-east-1', 'eu-west-1']
+
+
+def test_other_results_are_kept_per_region():
+    status = {'status': 'Active'}
+    merged, _ = merge_regional_results({'us-east-1': {'compute_optimizer_status': status},
+                                        'eu-west-1': {'compute_optimizer_status': status}})
+    assert merged['compute_optimizer_status'] == {'us-east-1': status, 'eu-west-1': status}
+
+
+def test_mixed_result_types_are_kept_per_region_in_either_order():
+    for regions in (['us-east-1', 'eu-west-1'], ['eu-west-1', 'us-east-1']):
+        results = {'us-east-1': {'idle_resources': [{'ResourceId': 'i-1'}]},
+                   'eu-west-1': {'idle_resources': {'skipped': 'no metrics'}}}
+        merged, _ = merge_regional_results({region: results[region] for region in regions})
+        assert merged['idle_resources'] == {region: results[region]['idle_resources'] for region in regions}
+        assert count_findings('idle_resources', merged['idle_resources']) == 1
+
+
+def test_a_failed_region_does_not_hide_the_others():
+    error = {'error': 'Failed to run check: rds_multi_az_status', 'details': 'AccessDenied'}
+    merged, errors = merge_regional_results({
+        'us-east-1': {'rds_multi_az_status': error},
+        'eu-west-1': {'rds_multi_az_status': [{'DBInstanceIdentifier': 'db-1', 'IsMultiAZ': False}]},
+    })
+    assert merged['rds_multi_az_status'] == [{'DBInstanceIdentifier': 'db-1', 'IsMultiAZ': False,
+                                              'Region': 'eu-west-1'}]
+    assert errors == {'rds_multi_az_status': {'us-east-1': error}}
+
+
+def test_a_check_failed_in_every_region_is_an_error():
+    merged, _ = merge_regional_results({
+        'us-east-1': {'rds_multi_az_status': {'error': 'Failed', 'details': 'AccessDenied'}},
+        'eu-west-1': {'rds_multi_az_status': {'error': 'Failed'}},
+    })
+    assert merged['rds_multi_az_status'] == {
+        'error': 'Failed in every scanned region: rds_multi_az_status',
+        'details': {'us-east-1': 'AccessDenied', 'eu-west-1': 'Failed'},
+    }
+
+
+def test_run_per_region_returns_every_regions_result():
+    assert run_per_region(['a', 'b', 'c'], str.upper, max_concurrency=2) == {'a': 'A', 'b': 'B', 'c': 'C'}
@@ -0,0 +1,64 @@
+import pytest
+
+from core import registry
+from core.registry import CHECKS, GLOBAL, REGIONAL, build_tasks, pillar_checks, select_checks
+
+
+def test_select_checks_by_name_or_pillar_keeps_registry_order():
+    selected = select_checks(['cloudtrail_status'], ['reliability'])
+    assert [check.name for check in selected] == [
+        'cloudtrail_status', 'rds_multi_az_status', 'ebs_volumes_without_backup'
+    ]
+    assert select_checks() == list(CHECKS.values())
+
+
+def test_select_checks_rejects_unknown_names():
+    with pytest.raises(ValueError, match='no_such_check, no_such_pillar'):
+        select_checks(['no_such_check'], ['no_such_pillar'])
+
+
+def test_pillar_checks_groups_in_pillar_order():
+    grouped = pillar_checks(select_checks(['ec2_without_detailed_monitoring', 'users_without_mfa']))
+    assert grouped == {'security': ['users_without_mfa'],
+                       'performance_efficiency': ['ec2_without_detailed_monitoring']}
+
+
+@pytest.mark.parametrize('scope', [GLOBAL, REGIONAL])
+def test_build_tasks_loads_every_needed_dataset_once(scope):
+    tasks = build_tasks(None, scope)
+    names = [task.name for task in tasks]
+    assert len(names) == len(set(names))
+
+    checks = [check for check in CHECKS.values() if check.scope == scope]
+    assert {check.name for check in checks} <= set(names)
+    for task in tasks:
+        for dep in task.inputs:
+            assert dep in names
+    # Only datasets some check needs are loaded.
+    needed = {name for check in checks for name in check.required_datasets}
+    assert {name for name in names if name in registry.DATASETS} <= needed
+
+
+def test_a_dataset_with_one_streaming_consumer_is_streamed_into_it():
+    tasks = {task.name: task for task in build_tasks(None, REGIONAL, select_checks(['vpcs_without_flow_logs']))}
+    assert set(tasks) == {'vpcs_without_flow_logs'}
+    assert tasks['vpcs_without_flow_logs'].inputs == []
+
+    # Shared by two checks: loaded once as its own task.
+    tasks = {task.name: task for task in build_tasks(
+        None, REGIONAL, select_checks(['rds_multi_az_status', 'idle_resources']))}
+    assert 'rds_instances' in tasks
+    assert tasks['rds_multi_az_status'].inputs == ['rds_instances']
+
+
+def test_checks_are_declared_most_expensive_first():
+    checks = [task.name for task in build_tasks(None, GLOBAL) if task.name in CHECKS]
+    costs = [CHECKS[name].api_cost for name in checks]
+    assert costs == sorted(costs, reverse=True)
+
+
+def test_check_rejects_unknown_pillar_and_severity():
+    with pytest.raises(ValueError, match='pillar'):
+        registry.Check('x', 'nope', GLOBAL, lambda: None)
+    with pytest.raises(ValueError, match='severity'):
+        registry.Check('x', 'security', GLOBAL, lambda: None, severity='critical')
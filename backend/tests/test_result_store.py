@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from core.result_store import SQLiteResultStore, create_result_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    # The scans below finish at small timestamps, which the age limit would prune.
+    return SQLiteResultStore(str(tmp_path / 'results.db'), retention_days=0)
+
+
+def _scan(**pillars):
+    return {'scan_metadata': {'status': 'Healthy'}, **pillars}
+
+
+def test_a_saved_scan_is_read_back_whole_and_per_check(store):
+    data = _scan(security={'users_without_mfa': ['alice', 'bob'], 'public_s3_buckets': []},
+                 reliability={'rds_multi_az_status': {'error': 'Failed to run check: rds_multi_az_status'}})
+    scan_id = store.save_scan(data, 'all_findings', account_id='111', region='us-east-1',
+                              started_at=100.0, finished_at=110.0)
+
+    scan = store.get_scan(scan_id)
+    assert scan['data'] == data
+    assert scan['duration_sec'] == 10.0
+    assert store.get_scan_metadata(scan_id)['scan_metadata'] == {'status': 'Healthy'}
+    assert 'data' not in store.get_scan_metadata(scan_id)
+    # Failed checks have no finding count.
+    assert store.get_finding_counts(scan_id) == {
+        'security': {'users_without_mfa': 2, 'public_s3_buckets': 0},
+        'reliability': {'rds_multi_az_status': None},
+    }
+    assert list(store.iter_check_results(scan_id, {'users_without_mfa'})) == [
+        ('security', 'users_without_mfa', 2, ['alice', 'bob'])
+    ]
+
+
+def test_latest_scan_and_history_follow_finish_time(store):
+    first = store.save_scan(_scan(security={'users_without_mfa': ['a']}), 'all_findings', '111', finished_at=200.0)
+    second = store.save_scan(_scan(security={'users_without_mfa': []}), 'all_findings', '111', finished_at=100.0)
+
+    assert store.latest_scan('all_findings', '111')['scan_id'] == first
+    assert [scan['scan_id'] for scan in store.list_scans(account_id='111')] == [first, second]
+    assert [entry['finding_count'] for entry in store.check_history('users_without_mfa')] == [1, 0]
+    assert store.latest_per_account()['111']['scan_id'] == first
+
+
+def test_resource_state_is_replaced_per_account_and_check(store):
+    store.save_resource_state('111', 'users_without_mfa', {
+        'alice': {'fingerprint': 'f1', 'findings': ['alice'], 'evaluated_at': 1.0},
+        'bob': {'fingerprint': 'f2', 'findings': [], 'evaluated_at': 1.0},
+    })
+    store.save_resource_state('111', 'users_without_mfa', {
+        'bob': {'fingerprint': 'f3', 'findings': ['bob'], 'evaluated_at': 2.0},
+    })
+    assert store.load_resource_state('111', 'users_without_mfa') == {
+        'bob': {'fingerprint': 'f3', 'findings': ['bob'], 'evaluated_at': 2.0}
+    }
+    assert store.load_resource_state('222', 'users_without_mfa') == {}
+
+
+def test_only_the_newest_scans_of_each_scope_and_account_are_kept(tmp_path):
+    store = SQLiteResultStore(str(tmp_path / 'results.db'), retention_count=2, retention_days=0)
+    ids = [store.save_scan(_scan(security={'users_without_mfa': ['alice']}), 'all_findings', '111',
+                           finished_at=100.0 + i) for i in range(4)]
+    other = store.save_scan(_scan(), 'all_findings', '222', finished_at=50.0)
+
+    assert [scan['scan_id'] for scan in store.list_scans(account_id='111')] == ids[:1:-1]
+    assert store.get_scan(ids[0]) is None
+    assert store.get_finding_counts(ids[0]) == {}
+    assert store.query_finding_items('users_without_mfa', [ids[0]]) == ([], 0)
+    assert store.get_scan(other) is not None
+
+
+def test_scans_past_the_age_limit_are_deleted_except_the_newest(tmp_path):
+    store = SQLiteResultStore(str(tmp_path / 'results.db'), retention_count=0, retention_days=1)
+    now = time.time()
+    old = [store.save_scan(_scan(), 'all_findings', '111', finished_at=now - 3 * 86400 + i) for i in range(2)]
+    recent = store.save_scan(_scan(), 'all_findings:reliability', '111', finished_at=now)
+
+    assert store.get_scan(old[0]) is None
+    # Still the newest scan of its scope.
+    assert store.get_scan(old[1]) is not None
+    assert store.get_scan(recent) is not None
+
+
+def test_create_result_store_parses_sqlite_urls(tmp_path):
+    path = tmp_path / 'scans.db'
+    store = create_result_store(f"sqlite:///{path}")
+    store.save_scan(_scan(), 'all_findings')
+    assert path.exists()
+    with pytest.raises(ValueError, match='Unsupported result store'):
+        create_result_store('postgres://db/scans')
+
+
+def test_latest_finding_counts_are_per_check(store):
+    store.save_scan(_scan(security={'users_without_mfa': ['a', 'b']}, reliability={'rds_multi_az_status': []}),
+                    'all_findings', '111', finished_at=100.0)
+    # A later scan of one pillar only replaces that pillar's checks.
+    store.save_scan(_scan(reliability={'rds_multi_az_status': [{'IsMultiAZ': False}]}),
+                    'all_findings', '111', finished_at=200.0)
+    # A scan saved later but finished earlier does not replace newer results.
+    store.save_scan(_scan(security={'users_without_mfa': []}), 'all_findings', '111', finished_at=50.0)
+
+    assert store.latest_finding_counts() == {'111': {
+        'security': {'users_without_mfa': 2},
+        'reliability': {'rds_multi_az_status': 1},
+    }}
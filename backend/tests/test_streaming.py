@@ -0,0 +1,106 @@
+import json
+import threading
+
+import pytest
+
+from core.result_store import SQLiteResultStore
+from core.streaming import ScanEventLog, parse_event_id, stream_job_events, stream_stored_scan
+
+
+def _events(chunks):
+    """Parses SSE text into (id, event, data) tuples, skipping retry lines and comments."""
+    events = []
+    for chunk in chunks:
+        fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['id'], fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteResultStore(str(tmp_path / 'results.db'))
+
+
+DATA = {
+    'scan_metadata': {'status': 'Healthy'},
+    'security': {'users_without_mfa': ['alice'], 'public_s3_buckets': []},
+    'reliability': {'rds_multi_az_status': {'us-east-1': [{'IsMultiAZ': False}], 'eu-west-1': []}},
+}
+
+
+def _finished_log(store):
+    log = ScanEventLog()
+    log.publish_check('security', 'users_without_mfa', ['alice'])
+    log.publish_check('security', 'public_s3_buckets', [])
+    log.publish_check('reliability', 'rds_multi_az_status', [{'IsMultiAZ': False}], region='us-east-1')
+    log.publish_check('reliability', 'rds_multi_az_status', [], region='eu-west-1')
+    scan_id = store.save_scan(DATA, 'all_findings', account_id='111')
+    log.finish(scan_id, summary={'status': 'Healthy'})
+    return log, scan_id
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('job-abc:4', ('job-abc', 4)),
+    ('scan-12:0', ('scan-12', 0)),
+    ('job-a:b:7', ('job-a:b', 7)),
+    ('job-abc', (None, 0)),
+    ('job-abc:-1', (None, 0)),
+    (':3', (None, 0)),
+    (None, (None, 0)),
+])
+def test_parse_event_id(value, expected):
+    assert parse_event_id(value) == expected
+
+
+def test_live_job_events_are_sent_as_published():
+    log = ScanEventLog()
+    log.publish_check('security', 'users_without_mfa', ['alice'])
+    stream = stream_job_events('job-1', log, 0, load_results=None)
+    assert next(stream).startswith('retry:')
+    assert _events([next(stream)]) == [('job-1:1', 'check', {
+        'pillar': 'security', 'check': 'users_without_mfa', 'region': None, 'result': ['alice']})]
+
+    threading.Timer(0.05, log.finish, kwargs={'scan_id': 5, 'summary': {'status': 'Healthy'}}).start()
+    assert _events(stream) == [('job-1:2', 'summary', {'status': 'Healthy', 'scan_id': 5})]
+
+
+def test_resuming_a_finished_job_loads_released_results_from_the_store(store):
+    log, scan_id = _finished_log(store)
+    _, position = parse_event_id('job-1:1')
+    events = _events(stream_job_events('job-1', log, position, store.iter_check_results))
+
+    # The per-region events of a check are replaced by its merged stored result, once.
+    assert events == [
+        ('job-1:2', 'check', {'pillar': 'security', 'check': 'public_s3_buckets', 'region': None, 'result': []}),
+        ('job-1:3', 'check', {'pillar': 'reliability', 'check': 'rds_multi_az_status', 'region': None,
+                              'result': DATA['reliability']['rds_multi_az_status']}),
+        ('job-1:5', 'summary', {'status': 'Healthy', 'scan_id': scan_id}),
+    ]
+
+
+def test_resuming_after_the_final_event_sends_nothing(store):
+    log, _ = _finished_log(store)
+    assert _events(stream_job_events('job-1', log, 5, store.iter_check_results)) == []
+
+
+def test_a_failed_job_ends_with_an_error_event():
+    log = ScanEventLog()
+    log.finish(error='Scan failed')
+    assert _events(stream_job_events('job-1', log, 0, None)) == [('job-1:1', 'error', {'error': 'Scan failed'})]
+
+
+def test_stored_scan_resumes_after_the_last_event_id(store):
+    scan_id = store.save_scan(DATA, 'all_findings', account_id='111')
+    scan = store.get_scan_metadata(scan_id)
+    stream = f"scan-{scan_id}"
+
+    full = _events(stream_stored_scan(stream, scan, 0, store.iter_check_results))
+    assert [event[0] for event in full] == [f"{stream}:{i}" for i in range(1, 5)]
+    assert full[-1][1] == 'summary'
+    assert full[-1][2]['finding_counts'] == {'security': {'users_without_mfa': 1, 'public_s3_buckets': 0},
+                                             'reliability': {'rds_multi_az_status': 1}}
+
+    _, position = parse_event_id(full[1][0])
+    resumed = _events(stream_stored_scan(stream, scan, position, store.iter_check_results))
+    assert resumed == full[2:]
@@ -0,0 +1,129 @@
+import random
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from core import throttling
+from core.throttling import AdaptiveConcurrencyLimiter, ServiceCallStats, ThrottleGuard, backoff_delay
+
+_THROTTLED = (b'<ErrorResponse><Error><Type>Sender</Type><Code>Throttling</Code>'
+              b'<Message>Rate exceeded</Message></Error></ErrorResponse>')
+_IDENTITY = (b'<GetCallerIdentityResponse><GetCallerIdentityResult><Arn>arn:aws:iam::123456789012:user/test</Arn>'
+             b'<UserId>AIDA</UserId><Account>123456789012</Account></GetCallerIdentityResult>'
+             b'</GetCallerIdentityResponse>')
+
+
+class _Raw:
+    def __init__(self, body):
+        self._body = body
+
+    def stream(self, **kwargs):
+        yield self._body
+
+
+class _ScriptedEndpoint:
+    """Answers every request attempt with the next (status, body) of a script, without any network call."""
+    def __init__(self, script):
+        self.script = list(script)
+        self.attempts = 0
+
+    def __call__(self, request, **kwargs):
+        status, body = self.script[min(self.attempts, len(self.script) - 1)]
+        self.attempts += 1
+        return AWSResponse(request.url, status, {}, _Raw(body))
+
+
+@pytest.fixture
+def sts_client():
+    return boto3.client('sts', region_name='us-east-1', aws_access_key_id='testing',
+                        aws_secret_access_key='testing', config=Config(retries={'mode': 'standard'}))
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    recorded = []
+
+    def no_sleep(attempt):
+        recorded.append(attempt)
+        return 0
+
+    monkeypatch.setattr(throttling, 'backoff_delay', no_sleep)
+    return recorded
+
+
+def _attach(client, script, max_attempts=throttling.MAX_ATTEMPTS):
+    endpoint = _ScriptedEndpoint(script)
+    client.meta.events.register_first('before-send', endpoint)
+    stats = ServiceCallStats()
+    guard = ThrottleGuard(stats, max_concurrency=4, max_attempts=max_attempts)
+    guard.attach(client)
+    return endpoint, stats, guard
+
+
+def test_throttled_calls_are_retried_with_backoff(sts_client, delays):
+    endpoint, stats, guard = _attach(sts_client, [(400, _THROTTLED), (400, _THROTTLED), (200, _IDENTITY)])
+
+    assert sts_client.get_caller_identity()['Account'] == '123456789012'
+    assert endpoint.attempts == 3
+    # One backoff per throttled attempt, growing with the attempt number.
+    assert delays == [1, 2]
+    assert stats.as_dict() == {'calls': 1, 'retries': 2, 'throttles': 2}
+    assert guard.limiter.limit == 2
+
+
+def test_retries_stop_after_max_attempts(sts_client, delays):
+    endpoint, stats, _ = _attach(sts_client, [(400, _THROTTLED)], max_attempts=3)
+
+    with pytest.raises(ClientError) as error:
+        sts_client.get_caller_identity()
+    assert error.value.response['Error']['Code'] == 'Throttling'
+    assert endpoint.attempts == 3
+    assert stats.as_dict()['throttles'] == 3
+
+
+def test_the_concurrency_slot_is_released_after_every_call(sts_client, delays):
+    _, _, guard = _attach(sts_client, [(200, _IDENTITY)])
+    for _ in range(10):
+        sts_client.get_caller_identity()
+    assert guard.limiter._in_flight == 0
+
+
+def test_backoff_delay_uses_full_jitter_up_to_the_cap():
+    random.seed(0)
+    samples = [backoff_delay(attempt, base=0.5, cap=4) for attempt in range(1, 10) for _ in range(50)]
+    assert all(0 <= delay <= 4 for delay in samples)
+    assert max(backoff_delay(1, base=0.5, cap=4) for _ in range(200)) <= 0.5
+
+
+def test_limiter_halves_on_throttle_at_most_once_per_window(monkeypatch):
+    limiter = AdaptiveConcurrencyLimiter(max_limit=16, min_limit=2)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 8
+
+    monkeypatch.setattr(throttling, 'DECREASE_WINDOW_SEC', 0)
+    for _ in range(5):
+        limiter.on_throttle()
+    assert limiter.limit == 2
+
+
+def test_limiter_increases_additively_on_success_up_to_max(monkeypatch):
+    monkeypatch.setattr(throttling, 'DECREASE_WINDOW_SEC', 0)
+    limiter = AdaptiveConcurrencyLimiter(max_limit=8)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 2
+
+    # +1/limit per success: 2 -> 2.5 -> 2.9 -> 3.24.
+    limiter.on_success()
+    limiter.on_success()
+    assert limiter.limit == 2
+    limiter.on_success()
+    assert limiter.limit == 3
+
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.limit == 8
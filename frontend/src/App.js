@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useContext, createContext } from 'react';
 import { Shield, DollarSign, BarChart2, HardDrive, LogOut, AlertTriangle, CheckCircle, Bell, User, ChevronsRight, Zap, Layers, Activity, RefreshCw, UserX, Lock, Key, ShieldOff, FileText, WifiOff, Archive, Database, Disc, GaugeCircle, GitBranch, Trash2, Network } from 'lucide-react';
 import { Radar, Doughnut } from 'react-chartjs-2';
 import { Chart as ChartJS, CategoryScale, LinearScale, BarElement, Title, Tooltip, Legend, ArcElement, RadialLinearScale, PointElement, LineElement, Filler } from 'chart.js';
@@ -32,9 +32,18 @@ const animationStyles = `
 
 
 // --- Caching Configuration ---
-const CACHE_KEY = 'awsWarDashboardData';
+// Only the findings summary (counts per check) is cached; the findings themselves are
+// paged from the API by each table.
+const CACHE_KEY = 'awsWarDashboardSummary';
 const CACHE_DURATION_MS = 60 * 60 * 1000; // 1 hour
 
+const API_BASE = 'http://127.0.0.1:5001';
+// How often a running scan job is polled.
+const SCAN_POLL_INTERVAL_MS = 3000;
+
+// The findings summary (/api/findings/summary) of the dashboard, for the finding tables.
+const SummaryContext = createContext(null);
+
 // --- AWS Logo Component ---
 const AwsLogo = (props) => (
   <svg
@@ -126,8 +135,67 @@ const Header = ({ title, onRefresh }) => (
 
 const SummaryCard = ({ title, value, icon, color }) => { const Icon = icon; return ( <div className="bg-white p-6 rounded-lg shadow-md flex items-center transition-transform hover:scale-105"> <div className={`p-3 rounded-full bg-${color}-100 text-${color}-600 mr-4`}> <Icon className="w-6 h-6" /> </div> <div> <p className="text-sm text-gray-500">{title}</p> <p className="text-2xl font-bold text-gray-800">{value}</p> </div> </div> ); };
 
-const FindingTable = ({ icon, title, columns, data, renderRow }) => {
+// Findings a table loads at first and per "Show more" click. Findings are paged from
+// /api/checks/<check>/findings, so checks with tens of thousands of findings are never
+// downloaded (or rendered) all at once.
+const FINDING_TABLE_PAGE_SIZE = 50;
+
+const FindingTable = ({ icon, title, columns, check, renderRow }) => {
     const Icon = icon;
+    const summary = useContext(SummaryContext);
+    const [items, setItems] = useState([]);
+    const [total, setTotal] = useState(0);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loading, setLoading] = useState(true);
+    const [error, setError] = useState(null);
+
+    const loadPage = useCallback(async (cursor) => {
+        setLoading(true);
+        try {
+            const params = new URLSearchParams({ limit: FINDING_TABLE_PAGE_SIZE });
+            if (cursor) params.set('cursor', cursor);
+            const response = await fetch(`${API_BASE}/api/checks/${check}/findings?${params}`);
+            if (!response.ok) throw new Error(`API request failed with status ${response.status}`);
+            const page = await response.json();
+            setItems(previous => cursor ? [...previous, ...page.items] : page.items);
+            setTotal(page.total);
+            setNextCursor(page.next_cursor);
+            setError(null);
+        } catch (err) {
+            console.error(`Error fetching findings of ${check}:`, err);
+            setError('Failed to load findings.');
+        } finally {
+            setLoading(false);
+        }
+    }, [check]);
+
+    useEffect(() => {
+        loadPage(null);
+    }, [loadPage]);
+
+    // A check whose last run failed has no finding count.
+    const failed = summary?.checks?.[check]?.finding_count === null;
+    const hiddenRows = total - items.length;
+    let emptyState;
+    if (loading) {
+        emptyState = <span className="text-gray-500">Loading findings...</span>;
+    } else if (error || failed) {
+        emptyState = (
+            <div className="flex flex-col items-center justify-center text-yellow-600">
+                <AlertTriangle className="w-12 h-12 mb-2" />
+                <span className="font-semibold text-lg">{error || 'Check failed'}</span>
+                {failed && <p className="text-sm text-gray-500">This check could not run in the last scan.</p>}
+            </div>
+        );
+    } else {
+        emptyState = (
+            <div className="flex flex-col items-center justify-center text-green-600">
+                <CheckCircle className="w-12 h-12 mb-2" />
+                <span className="font-semibold text-lg">All Clear!</span>
+                <p className="text-sm text-gray-500">No issues found for this check.</p>
+            </div>
+        );
+    }
     return (
         <div className="bg-white rounded-xl shadow-lg overflow-hidden transition-all hover:shadow-xl finding-card">
             <div className="p-6 border-b border-gray-200">
@@ -148,22 +216,25 @@ const FindingTable = ({ icon, title, columns, data, renderRow }) => {
                         </tr>
                     </thead>
                     <tbody>
-                        {data && data.length > 0 ? (
-                            data.map((item, index) => renderRow(item, index))
+                        {items.length > 0 ? (
+                            items.map((item, index) => renderRow(item, index))
                         ) : (
                             <tr>
                                 <td colSpan={columns.length} className="px-6 py-10 text-center">
-                                    <div className="flex flex-col items-center justify-center text-green-600">
-                                        <CheckCircle className="w-12 h-12 mb-2" />
-                                        <span className="font-semibold text-lg">All Clear!</span>
-                                        <p className="text-sm text-gray-500">No issues found for this check.</p>
-                                    </div>
+                                    {emptyState}
                                 </td>
                             </tr>
                         )}
                     </tbody>
                 </table>
             </div>
+            {nextCursor && (
+                <div className="p-4 border-t border-gray-200 text-center">
+                    <button onClick={() => loadPage(nextCursor)} disabled={loading} className="px-4 py-2 text-sm font-semibold text-blue-600 hover:bg-blue-50 rounded-md transition-colors disabled:opacity-50">
+                        {loading ? 'Loading...' : `Show more (${hiddenRows} not shown)`}
+                    </button>
+                </div>
+            )}
         </div>
     );
 };
@@ -223,15 +294,14 @@ const ApiHealthCard = ({ metadata }) => {
 }
 
 // --- CHART COMPONENTS ---
-const PillarRatingChart = ({ data }) => {
+const PillarRatingChart = ({ byPillar }) => {
     const calculateScore = (findings) => Math.max(1, 5 - Math.floor(findings / 5));
-    const getFindingCount = (pillarData) => pillarData ? Object.values(pillarData).flat().length : 0;
     const scores = { 
-        Security: calculateScore(getFindingCount(data.security)), 
-        Cost: calculateScore(getFindingCount(data.cost_optimization)), 
-        Reliability: calculateScore(getFindingCount(data.reliability)), 
-        Performance: calculateScore(getFindingCount(data.performance_efficiency)), 
-        Operations: calculateScore(getFindingCount(data.operational_excellence)), 
+        Security: calculateScore(byPillar.security || 0), 
+        Cost: calculateScore(byPillar.cost_optimization || 0), 
+        Reliability: calculateScore(byPillar.reliability || 0), 
+        Performance: calculateScore(byPillar.performance_efficiency || 0), 
+        Operations: calculateScore(byPillar.operational_excellence || 0), 
     };
     const chartData = { 
         labels: Object.keys(scores), 
@@ -267,12 +337,12 @@ const PillarRatingChart = ({ data }) => {
         </div>
     );
 };
-const SecurityDoughnutChart = ({ data }) => {
+const SecurityDoughnutChart = ({ checks }) => {
     const findings = {
-        'Users without MFA': data?.users_without_mfa?.length || 0,
-        'Public S3 Buckets': data?.public_s3_buckets?.length || 0,
-        'Aged IAM Keys': data?.aged_iam_keys?.length || 0,
-        'Open Security Groups': data?.unrestricted_security_groups?.length || 0,
+        'Users without MFA': checks?.users_without_mfa?.finding_count || 0,
+        'Public S3 Buckets': checks?.public_s3_buckets?.finding_count || 0,
+        'Aged IAM Keys': checks?.aged_iam_keys?.finding_count || 0,
+        'Open Security Groups': checks?.unrestricted_security_groups?.finding_count || 0,
     };
     const chartData = {
         labels: Object.keys(findings),
@@ -296,35 +366,35 @@ const SecurityDoughnutChart = ({ data }) => {
 
 // --- DETAILED PAGE COMPONENTS ---
 
-const DashboardPage = ({ data }) => {
-    const getFindingCount = (pillarData) => pillarData ? Object.values(pillarData).flat().length : 0;
+const DashboardPage = ({ summary }) => {
+    const byPillar = summary.by_pillar || {};
     return (
         <div className="space-y-8">
             <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-8">
-                <SummaryCard title="Security Findings" value={getFindingCount(data.security)} icon={AlertTriangle} color="red" />
-                <SummaryCard title="Cost Opportunities" value={getFindingCount(data.cost_optimization)} icon={DollarSign} color="yellow" />
-                <SummaryCard title="Reliability Risks" value={getFindingCount(data.reliability)} icon={HardDrive} color="orange" />
-                <SummaryCard title="Performance Gaps" value={getFindingCount(data.performance_efficiency)} icon={Zap} color="blue" />
+                <SummaryCard title="Security Findings" value={byPillar.security || 0} icon={AlertTriangle} color="red" />
+                <SummaryCard title="Cost Opportunities" value={byPillar.cost_optimization || 0} icon={DollarSign} color="yellow" />
+                <SummaryCard title="Reliability Risks" value={byPillar.reliability || 0} icon={HardDrive} color="orange" />
+                <SummaryCard title="Performance Gaps" value={byPillar.performance_efficiency || 0} icon={Zap} color="blue" />
             </div>
             <div className="grid grid-cols-1 lg:grid-cols-3 gap-8">
-                <PillarRatingChart data={data} />
-                <SecurityDoughnutChart data={data.security} />
-                <ApiHealthCard metadata={data.scan_metadata} />
+                <PillarRatingChart byPillar={byPillar} />
+                <SecurityDoughnutChart checks={summary.checks} />
+                <ApiHealthCard metadata={summary.scan_metadata} />
             </div>
         </div>
     );
 };
 
-const SecurityPage = ({ data }) => (
+const SecurityPage = () => (
     <div className="space-y-8">
         <FindingTable 
             icon={UserX}
             title="Users without MFA" 
             columns={['Username']} 
-            data={data?.users_without_mfa || []} 
+            check="users_without_mfa" 
             renderRow={(item, index) => (
-                <tr key={item} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-red-100`}>
-                    <td className="px-6 py-4 font-medium text-gray-900">{item}</td>
+                <tr key={item.ResourceId} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-red-100`}>
+                    <td className="px-6 py-4 font-medium text-gray-900">{item.ResourceId}</td>
                 </tr>
             )}
         />
@@ -332,7 +402,7 @@ const SecurityPage = ({ data }) => (
             icon={Lock}
             title="Public S3 Buckets" 
             columns={['Bucket Name', 'Reason']} 
-            data={data?.public_s3_buckets || []} 
+            check="public_s3_buckets" 
             renderRow={(item, index) => (
                 <tr key={item.Bucket} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-red-100`}>
                     <td className="px-6 py-4 font-mono text-gray-800">{item.Bucket}</td>
@@ -344,7 +414,7 @@ const SecurityPage = ({ data }) => (
             icon={Key}
             title="Aged IAM Access Keys (> 90 days)" 
             columns={['Username', 'Access Key ID']} 
-            data={data?.aged_iam_keys || []} 
+            check="aged_iam_keys" 
             renderRow={(item, index) => (
                 <tr key={item.AccessKeyId} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-red-100`}>
                     <td className="px-6 py-4 text-gray-900">{item.UserName}</td>
@@ -356,7 +426,7 @@ const SecurityPage = ({ data }) => (
             icon={ShieldOff}
             title="Unrestricted Security Groups (0.0.0.0/0)" 
             columns={['Group Name', 'Group ID', 'Port']} 
-            data={data?.unrestricted_security_groups || []} 
+            check="unrestricted_security_groups" 
             renderRow={(item, index) => (
                 <tr key={item.GroupId+item.PortRange} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-red-100`}>
                     <td className="px-6 py-4">{item.GroupName}</td>
@@ -369,10 +439,10 @@ const SecurityPage = ({ data }) => (
             icon={WifiOff}
             title="VPCs without Flow Logs" 
             columns={['VPC ID']} 
-            data={data?.vpcs_without_flow_logs || []} 
+            check="vpcs_without_flow_logs" 
             renderRow={(item, index) => (
-                <tr key={item} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-red-100`}>
-                    <td className="px-6 py-4 font-mono">{item}</td>
+                <tr key={`${item.Region}/${item.ResourceId}`} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-red-100`}>
+                    <td className="px-6 py-4 font-mono">{item.ResourceId}</td>
                 </tr>
             )} 
         />
@@ -380,7 +450,7 @@ const SecurityPage = ({ data }) => (
             icon={FileText}
             title="CloudTrail Status" 
             columns={['Trail Name', 'Status']} 
-            data={data?.cloudtrail_status?.filter(t => !t.IsLogging) || []} 
+            check="cloudtrail_status" 
             renderRow={(item, index) => (
                 <tr key={item.Name} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-red-100`}>
                     <td className="px-6 py-4">{item.Name}</td>
@@ -388,61 +458,76 @@ const SecurityPage = ({ data }) => (
                 </tr>
             )} 
         />
+        <FindingTable
+            icon={Key}
+            title="Secrets without Rotation"
+            columns={['Secret Name']}
+            check="secrets_rotation_status"
+            renderRow={(item, index) => (
+                <tr key={item.Name} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-red-100`}>
+                    <td className="px-6 py-4 font-mono">{item.Name}</td>
+                </tr>
+            )}
+        />
     </div>
 );
 
-const ComputeOptimizerCard = ({ data }) => (
-    <div className="bg-white rounded-xl shadow-lg overflow-hidden finding-card">
-        <div className="p-6">
-            <div className="flex items-center">
-                <DollarSign className="w-6 h-6 text-gray-500 mr-3" />
-                <h3 className="text-xl font-bold text-gray-800">Compute Optimizer Status</h3>
-            </div>
-            <div className="mt-4">
-                {data?.error ? (
-                    <div className="bg-yellow-50 border-l-4 border-yellow-400 p-4">
-                        <div className="flex">
-                            <div className="flex-shrink-0">
-                                <AlertTriangle className="h-5 w-5 text-yellow-400" aria-hidden="true" />
-                            </div>
-                            <div className="ml-3">
-                                <p className="text-sm text-yellow-700">
-                                    Not Enabled. {' '}
-                                    <span className="font-medium text-yellow-800">You must opt-in to get cost-saving recommendations for EC2.</span>
-                                </p>
+const ComputeOptimizerCard = () => {
+    // Counted as one finding unless Compute Optimizer is active.
+    const status = useContext(SummaryContext)?.checks?.compute_optimizer_status;
+    return (
+        <div className="bg-white rounded-xl shadow-lg overflow-hidden finding-card">
+            <div className="p-6">
+                <div className="flex items-center">
+                    <DollarSign className="w-6 h-6 text-gray-500 mr-3" />
+                    <h3 className="text-xl font-bold text-gray-800">Compute Optimizer Status</h3>
+                </div>
+                <div className="mt-4">
+                    {status?.finding_count !== 0 ? (
+                        <div className="bg-yellow-50 border-l-4 border-yellow-400 p-4">
+                            <div className="flex">
+                                <div className="flex-shrink-0">
+                                    <AlertTriangle className="h-5 w-5 text-yellow-400" aria-hidden="true" />
+                                </div>
+                                <div className="ml-3">
+                                    <p className="text-sm text-yellow-700">
+                                        Not Enabled. {' '}
+                                        <span className="font-medium text-yellow-800">You must opt-in to get cost-saving recommendations for EC2.</span>
+                                    </p>
+                                </div>
                             </div>
                         </div>
-                    </div>
-                ) : (
-                    <div className="bg-green-50 border-l-4 border-green-400 p-4">
-                        <div className="flex">
-                            <div className="flex-shrink-0">
-                                <CheckCircle className="h-5 w-5 text-green-400" aria-hidden="true" />
-                            </div>
-                            <div className="ml-3">
-                                <p className="text-sm text-green-700">
-                                    Enabled. {' '}
-                                    <span className="font-medium text-green-800">Check the Compute Optimizer console for recommendations.</span>
-                                </p>
+                    ) : (
+                        <div className="bg-green-50 border-l-4 border-green-400 p-4">
+                            <div className="flex">
+                                <div className="flex-shrink-0">
+                                    <CheckCircle className="h-5 w-5 text-green-400" aria-hidden="true" />
+                                </div>
+                                <div className="ml-3">
+                                    <p className="text-sm text-green-700">
+                                        Enabled. {' '}
+                                        <span className="font-medium text-green-800">Check the Compute Optimizer console for recommendations.</span>
+                                    </p>
+                                </div>
                             </div>
                         </div>
-                    </div>
-                )}
+                    )}
+                </div>
             </div>
         </div>
-    </div>
-);
+    );
+};
 
-const CostPage = ({ data }) => (
+const CostPage = () => (
     <div className="space-y-8">
         <FindingTable 
             icon={Archive}
             title="S3 Buckets without Lifecycle Policies" 
             columns={['Bucket Name']} 
-            data={data?.s3_buckets_without_lifecycle || []} 
+            check="s3_buckets_without_lifecycle" 
             renderRow={(item, index) => (
-                <tr key={item} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-yellow-100`}>
-                    <td className="px-6 py-4 font-mono">{item}</td>
+                <tr key={item.ResourceId} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-yellow-100`}>
+                    <td className="px-6 py-4 font-mono">{item.ResourceId}</td>
                 </tr>
             )}
         />
@@ -450,7 +535,7 @@ const CostPage = ({ data }) => (
             icon={Disc}
             title="Unattached EBS Volumes" 
             columns={['Volume ID', 'Size (GiB)', 'Creation Date']} 
-            data={data?.unattached_ebs_volumes || []} 
+            check="unattached_ebs_volumes" 
             renderRow={(item, index) => (
                 <tr key={item.VolumeId} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-yellow-100`}>
                     <td className="px-6 py-4 font-mono">{item.VolumeId}</td>
@@ -463,7 +548,7 @@ const CostPage = ({ data }) => (
             icon={Network}
             title="Idle Load Balancers" 
             columns={['Load Balancer Name', 'Type', 'Reason']} 
-            data={data?.idle_load_balancers || []} 
+            check="idle_load_balancers" 
             renderRow={(item, index) => (
                 <tr key={item.Name} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-yellow-100`}>
                     <td className="px-6 py-4">{item.Name}</td>
@@ -472,11 +557,24 @@ const CostPage = ({ data }) => (
                 </tr>
             )}
         />
-         <FindingTable 
+        <FindingTable
+            icon={Activity}
+            title="Idle Resources (low utilization)"
+            columns={['Resource Type', 'Resource ID', 'Reason']}
+            check="idle_resources"
+            renderRow={(item, index) => (
+                <tr key={item.ResourceId} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-yellow-100`}>
+                    <td className="px-6 py-4"><span className="px-2 py-1 text-xs font-semibold text-gray-800 bg-gray-100 rounded-full">{item.ResourceType}</span></td>
+                    <td className="px-6 py-4 font-mono">{item.Name || item.ResourceId}</td>
+                    <td className="px-6 py-4">{item.Reason}</td>
+                </tr>
+            )}
+        />
+         <FindingTable
             icon={Trash2}
             title="Old EBS Snapshots (>1 year)" 
             columns={['Snapshot ID', 'Volume ID', 'Creation Date']} 
-            data={data?.old_ebs_snapshots || []} 
+            check="old_ebs_snapshots" 
             renderRow={(item, index) => (
                 <tr key={item.SnapshotId} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-yellow-100`}>
                     <td className="px-6 py-4 font-mono">{item.SnapshotId}</td>
@@ -485,18 +583,31 @@ const CostPage = ({ data }) => (
                 </tr>
             )}
         />
-        <ComputeOptimizerCard data={data?.compute_optimizer_status} />
+        <FindingTable
+            icon={GaugeCircle}
+            title="Over-provisioned EC2 Instances"
+            columns={['Instance ARN', 'Current Type', 'Recommended Type']}
+            check="ec2_rightsizing_recommendations"
+            renderRow={(item, index) => (
+                <tr key={item.instanceArn} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-yellow-100`}>
+                    <td className="px-6 py-4 font-mono">{item.instanceArn}</td>
+                    <td className="px-6 py-4">{item.current_instance_type}</td>
+                    <td className="px-6 py-4">{item.recommended_instance_type}</td>
+                </tr>
+            )}
+        />
+        <ComputeOptimizerCard />
     </div>
 );
 
 
-const ReliabilityPage = ({ data }) => (
+const ReliabilityPage = () => (
     <div className="space-y-8">
         <FindingTable 
             icon={Database}
             title="RDS Instances not Multi-AZ" 
             columns={['DB Identifier', 'Engine', 'Multi-AZ Status']}
-            data={data?.rds_multi_az_status?.filter(db => !db.IsMultiAZ) || []} 
+            check="rds_multi_az_status" 
             renderRow={(item, index) => (
                 <tr key={item.DBInstanceIdentifier} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-orange-100`}>
                     <td className="px-6 py-4 font-medium">{item.DBInstanceIdentifier}</td>
@@ -514,7 +625,7 @@ const ReliabilityPage = ({ data }) => (
             icon={Disc}
             title="EBS Volumes without Recent Backups" 
             columns={['Volume ID', 'Size (GiB)', 'Backup Status']}
-            data={data?.ebs_volumes_without_backup || []} 
+            check="ebs_volumes_without_backup" 
             renderRow={(item, index) => (
                 <tr key={item.VolumeId} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-orange-100`}>
                     <td className="px-6 py-4 font-mono">{item.VolumeId}</td>
@@ -531,13 +642,13 @@ const ReliabilityPage = ({ data }) => (
     </div>
 );
 
-const PerformancePage = ({ data }) => (
+const PerformancePage = () => (
     <div className="space-y-8">
         <FindingTable 
             icon={GaugeCircle}
             title="EC2 Instances without Detailed Monitoring" 
             columns={['Instance Name', 'Instance ID', 'Monitoring Level']}
-            data={data?.ec2_without_detailed_monitoring || []} 
+            check="ec2_without_detailed_monitoring" 
             renderRow={(item, index) => (
                 <tr key={item.InstanceId} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-blue-100`}>
                     <td className="px-6 py-4">{item.Name}</td>
@@ -554,13 +665,13 @@ const PerformancePage = ({ data }) => (
     </div>
 );
 
-const OperationsPage = ({ data }) => (
+const OperationsPage = () => (
     <div className="space-y-8">
         <FindingTable 
             icon={GitBranch}
             title="CloudFormation Stacks with Drift" 
             columns={['Stack Name', 'Drift Status']} 
-            data={data?.cloudformation_drift_status || []} 
+            check="cloudformation_drift_status" 
             renderRow={(item, index) => (
                 <tr key={item.StackName} className={`border-b transition-colors duration-200 ${index % 2 === 0 ? 'bg-gray-50' : 'bg-white'} hover:bg-indigo-100`}>
                     <td className="px-6 py-4">{item.StackName}</td>
@@ -575,10 +686,32 @@ const OperationsPage = ({ data }) => (
 // --- MAIN APP COMPONENT ---
 const App = () => {
     const [activeTab, setActiveTab] = useState('dashboard');
-    const [data, setData] = useState(null);
+    const [summary, setSummary] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [isSidebarOpen, setSidebarOpen] = useState(true);
+    // Bumped after every scan so that the finding tables reload their first page.
+    const [scanVersion, setScanVersion] = useState(0);
+
+    const fetchSummary = async () => {
+        const response = await fetch(`${API_BASE}/api/findings/summary`);
+        if (!response.ok) throw new Error(`API request failed with status ${response.status}`);
+        return response.json();
+    };
+
+    // Starts a scan job and waits until it is stored.
+    const runScan = async () => {
+        const response = await fetch(`${API_BASE}/api/scan/jobs`, { method: 'POST' });
+        if (!response.ok) throw new Error(`API request failed with status ${response.status}`);
+        let job = await response.json();
+        while (job.status === 'queued' || job.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, SCAN_POLL_INTERVAL_MS));
+            const poll = await fetch(`${API_BASE}/api/scan/jobs/${job.job_id}`);
+            if (!poll.ok) throw new Error(`API request failed with status ${poll.status}`);
+            job = await poll.json();
+        }
+        if (job.status !== 'complete') throw new Error(job.error || 'The scan failed');
+    };
 
     const fetchData = useCallback(async (forceRefresh = false) => {
         setLoading(true);
@@ -590,13 +723,13 @@ const App = () => {
                 if (cachedData) {
                     const { timestamp, data: parsedData } = JSON.parse(cachedData);
                     if (Date.now() - timestamp < CACHE_DURATION_MS) {
-                        console.log("Loading data from fresh cache.");
-                        setData(parsedData);
+                        console.log("Loading summary from fresh cache.");
+                        setSummary(parsedData);
                         setLoading(false);
                         return; // Exit if fresh cache is available
                     }
                     console.log("Stale cache found, will use it and refetch in background.");
-                    setData(parsedData); // Show stale data immediately
+                    setSummary(parsedData); // Show stale data immediately
                 }
             } catch (e) {
                 console.error("Failed to read from cache", e);
@@ -604,12 +737,16 @@ const App = () => {
         }
         
         try {
-            const response = await fetch('http://127.0.0.1:5001/api/scan/all');
-            if (!response.ok) throw new Error(`API request failed with status ${response.status}`);
-            const result = await response.json();
+            let result = forceRefresh ? null : await fetchSummary();
+            // Nothing stored yet (or a refresh was asked for): scan first.
+            if (!result || Object.keys(result.checks).length === 0) {
+                await runScan();
+                result = await fetchSummary();
+            }
             
             // Set data and update cache
-            setData(result);
+            setSummary(result);
+            setScanVersion(version => version + 1);
             localStorage.setItem(CACHE_KEY, JSON.stringify({
                 timestamp: Date.now(),
                 data: result,
@@ -630,7 +767,7 @@ const App = () => {
     const handleRefresh = () => {
         console.log("Forcing data refresh...");
         localStorage.removeItem(CACHE_KEY);
-        setData(null); // Clear existing data to show loader
+        setSummary(null); // Clear existing data to show loader
         fetchData(true);
     };
 
@@ -644,18 +781,19 @@ const App = () => {
     };
 
     const renderContent = () => {
-        if (loading && !data) return <FullPageLoader />; // Only show full loader if no data (even stale) is available
-        if (error && !data) return ( <div className="p-8 text-center"><div className="max-w-md mx-auto bg-red-50 p-6 rounded-lg border border-red-200"><AlertTriangle className="w-12 h-12 text-red-500 mx-auto mb-4" /><h3 className="font-bold text-lg text-red-700 mb-2">Data Loading Error</h3><p className="text-red-600 mb-4">{error}</p><button onClick={handleRefresh} className="px-4 py-2 bg-red-600 text-white rounded-md hover:bg-red-700 transition-colors">Retry</button></div></div> );
-        if (!data) return <div className="p-8 text-center text-gray-500">No data available to display.</div>;
+        if (loading && !summary) return <FullPageLoader />; // Only show full loader if no data (even stale) is available
+        if (error && !summary) return ( <div className="p-8 text-center"><div className="max-w-md mx-auto bg-red-50 p-6 rounded-lg border border-red-200"><AlertTriangle className="w-12 h-12 text-red-500 mx-auto mb-4" /><h3 className="font-bold text-lg text-red-700 mb-2">Data Loading Error</h3><p className="text-red-600 mb-4">{error}</p><button onClick={handleRefresh} className="px-4 py-2 bg-red-600 text-white rounded-md hover:bg-red-700 transition-colors">Retry</button></div></div> );
+        if (!summary) return <div className="p-8 text-center text-gray-500">No data available to display.</div>;
 
+        // Keyed by scanVersion so that the finding tables reload after a scan.
         switch (activeTab) {
-            case 'dashboard': return <DashboardPage data={data} />;
-            case 'security': return <SecurityPage data={data.security} />;
-            case 'cost': return <CostPage data={data.cost_optimization} />;
-            case 'reliability': return <ReliabilityPage data={data.reliability} />;
-            case 'performance': return <PerformancePage data={data.performance_efficiency} />;
-            case 'operations': return <OperationsPage data={data.operational_excellence} />;
-            default: return <DashboardPage data={data} />;
+            case 'dashboard': return <DashboardPage summary={summary} />;
+            case 'security': return <SecurityPage key={scanVersion} />;
+            case 'cost': return <CostPage key={scanVersion} />;
+            case 'reliability': return <ReliabilityPage key={scanVersion} />;
+            case 'performance': return <PerformancePage key={scanVersion} />;
+            case 'operations': return <OperationsPage key={scanVersion} />;
+            default: return <DashboardPage summary={summary} />;
         }
     };
 
@@ -671,7 +809,9 @@ const App = () => {
             <div className={`transition-all duration-300 ${isSidebarOpen ? 'ml-64' : 'ml-20'}`}>
                 <Header title={pageTitles[activeTab]} onRefresh={handleRefresh} />
                 <main className="p-8">
-                    {renderContent()}
+                    <SummaryContext.Provider value={summary}>
+                        {renderContent()}
+                    </SummaryContext.Provider>
                 </main>
             </div>
         </div>